@@ -0,0 +1,162 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Tile-size auto-tuning of the conv2d and add kernels with a persisted JSON tuning log"""
+
+import json
+import os
+
+import numpy as np
+
+import pass_utils
+
+# the `tile` argument of the conv2d kernels indexes vanilla_accelerator_conv2d_tiles,
+# (oc, ow) register tile shapes in the same order
+conv2d_tiles = [(4, 8), (8, 4), (2, 16), (4, 4), (8, 8), (1, 16)]
+# candidates for the `chunk` argument of the add kernels, elements per thread pool task
+add_chunks = [4096, 16384, 65536, 262144]
+
+# dtype -> numpy dtype of the kernel operands
+np_dtypes = {"float32": "float32", "int32": "int32", "int8": "int8"}
+
+
+class TuningLog:
+    """
+    Best kernel parameters per workload, a JSON object mapping workload keys to
+    {"params": ..., "candidates": {candidate: time in us}}
+    """
+
+    def __init__(self, path):
+        self.path    = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return entry["params"] if entry is not None else None
+
+    def put(self, key, params, candidates):
+        self.entries[key] = {"params": params, "candidates": candidates}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+_logs = {}
+_lib  = None
+
+
+def get_log(path) -> TuningLog:
+    if path not in _logs:
+        _logs[path] = TuningLog(path)
+    return _logs[path]
+
+
+def get_lib():
+    """
+    The kernel sources compiled for the local machine, built on first use
+    """
+    global _lib
+    if _lib is None:
+        from bench_utils import build_kernels
+        _lib = build_kernels()
+    return _lib
+
+
+def workload_key(kernel, scalars, threads) -> str:
+    return f"{kernel}/{','.join(str(int(s)) for s in scalars)}/t{threads}"
+
+
+def measure(kernel, buffers, make_args, candidates) -> dict:
+    """
+    Time `kernel(*make_args(candidate))` for every candidate on random `buffers`,
+    in microseconds
+    """
+    from bench_utils import ptr, timeit
+
+    fn   = getattr(get_lib(), kernel)
+    ptrs = [ptr(b) for b in buffers]
+    return {c: timeit(fn, *make_args(ptrs, c), number=5, repeat=3) * 1e6 for c in candidates}
+
+
+def _buffer(dtype, size):
+    if dtype == "float32":
+        return np.random.uniform(0, 1, size).astype(dtype)
+    return np.random.randint(-8, 8, size).astype(np_dtypes[dtype])
+
+
+def _lookup(func, kernel, scalars, threads, tune):
+    """
+    Tuned parameter of a kernel call: from the `tuning_log` target attribute, measured now
+    and recorded there when `autotune` is set, 0 (the kernel default) otherwise
+    """
+    path = pass_utils.target_attr(func, "tuning_log", "")
+    if path == "":
+        return 0
+    log = get_log(path)
+    key = workload_key(kernel, scalars, threads)
+    params = log.get(key)
+    if params is None and bool(pass_utils.target_attr(func, "autotune", False)):
+        timings = tune()
+        best    = min(timings, key=timings.get)
+        params  = int(best)
+        log.put(key, params, {str(c): t for c, t in timings.items()})
+    return params if params is not None else 0
+
+
+def conv2d_tile(func, kernel, dtypes, offsets, threads) -> int:
+    """
+    Index into `conv2d_tiles` for a conv2d kernel call with the shape arguments `offsets`
+    (n, oc, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw, dh, dw, groups). `kernel` is the
+    plain conv2d kernel, the fused one uses the same tile since its epilogue does not depend
+    on it.
+    """
+    def _tune():
+        (n, oc, ow, oh, ic, kh, kw, iw, ih) = offsets[:9]
+        groups  = offsets[-1]
+        buffers = [_buffer(dtypes[0], n * ic * ih * iw),
+                   _buffer(dtypes[0], oc * (ic // groups) * kh * kw),
+                   _buffer(dtypes[1], n * oc * oh * ow)]
+        return measure(kernel, buffers, lambda p, t: p + list(offsets) + [t, threads],
+                       range(len(conv2d_tiles)))
+
+    return _lookup(func, kernel, offsets, threads, _tune)
+
+
+def add_chunk(func, kernel, dtype, scalars, lanes, threads) -> int:
+    """
+    `chunk` argument of an add kernel call, `scalars` are its width or its dims and strides
+    and `lanes` its vector width
+    """
+    if threads <= 1:
+        # a single task does the whole add, there is nothing to tune
+        return 0
+
+    def _tune():
+        if len(scalars) == 1:
+            sizes = [scalars[0]] * 3
+        else:
+            (dims, s1, s2) = (scalars[0:4], scalars[4:8], scalars[8:12])
+            extent = lambda s: sum((d - 1) * x for d, x in zip(dims, s)) + 1
+            sizes  = [extent(s1), extent(s2), int(np.prod(dims))]
+        buffers = [_buffer(dtype, s) for s in sizes]
+        return measure(kernel, buffers, lambda p, c: p + list(scalars) + [lanes, c, threads],
+                       add_chunks)
+
+    return _lookup(func, kernel, list(scalars) + [lanes], threads, _tune)
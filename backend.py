@@ -15,26 +15,76 @@
 # specific language governing permissions and limitations
 # under the License.
 """UMA backend for the vanilla_accelerator accelerator"""
+from tvm import relay
 from passes import VanillaAcceleratorTirPass
+from pass_injective import eltwise_ops
 from tvm.relay.backend.contrib.uma.api.utils import PassPhase
 from tvm.relay.backend.contrib.uma.backend import UMABackend
 from codegen import gen_includes
+from relay_passes import LiftConstants
+from relay_passes import WinogradWeights
+from strategies import conv2d_winograd_strategy
 from patterns import conv2d_pattern
-from patterns import gzadd_pattern
+from patterns import conv2d_add_pattern
+from patterns import conv2d_add_pool_pattern
+from patterns import pool2d_pattern
+from patterns import eltwise_pattern
+from patterns import dense_pattern
+from patterns import dense_add_pattern
+from patterns import requantize_pattern
 
 
 class VanillaAcceleratorBackend(UMABackend):
     """UMA backend for the VanillaAccelerator accelerator."""
 
-    def __init__(self):
+    def __init__(self, cost_model=None, layout=None, winograd=True):
+        """
+        cost_model: cost_model.CostModel consulted for every matched pattern, which is then
+        only offloaded when predicted faster than the host; None offloads every match
+        layout: "NCHW" or "NHWC" to convert every conv2d of the model to that data layout
+        before partitioning, so layout transforms are only left at the graph boundaries
+        instead of around each offloaded conv; None keeps the imported layouts
+        winograd: run the offloaded float 3x3 stride-1 convs with constant weights through the
+        Winograd F(2x2, 3x3) kernels, their weights transformed once while partitioning
+        """
         super().__init__()
+        self.cost_model = cost_model
+        self.layout     = layout
+        self.winograd   = winograd
 
         # Target configuration
+        # vector width (lanes) of the elementwise kernels, unset for the kernel default
         self._register_target_attr("dimension")
+        # memory scope of the scratchpad the elementwise calls are staged through, "" disables it
+        self._register_target_attr("scratchpad_scope", default="")
+        # scratchpad elements per staged operand and slot
+        self._register_target_attr("scratchpad_size", default=4096)
+        self._register_target_attr("fold_padding", default=True)
+        # >1 runs the kernels on a pool of num_threads threads
+        self._register_target_attr("num_threads", default=1)
+        # lowered PrimFuncs kept in memory, and an optional directory persisting them across runs
+        self._register_target_attr("cache_size", default=128)
+        self._register_target_attr("cache_dir", default="")
+        # JSON log of tuned kernel parameters; with autotune, workloads missing from it are
+        # measured on this machine while compiling and added
+        self._register_target_attr("tuning_log", default="")
+        self._register_target_attr("autotune", default=False)
 
         # Relay Pattern registration
-        self._register_pattern("conv2d", conv2d_pattern())
-        self._register_pattern("add", gzadd_pattern())
+        # (fused patterns first, MergeComposite matches in registration order)
+        self._register_offload_pattern("conv2d_add_pool", conv2d_add_pool_pattern())
+        self._register_offload_pattern("conv2d_add", conv2d_add_pattern())
+        self._register_offload_pattern("conv2d_nhwc_add", conv2d_add_pattern("NHWC", "HWIO"))
+        self._register_offload_pattern("dense_add", dense_add_pattern())
+        self._register_offload_pattern("requantize", requantize_pattern())
+        self._register_offload_pattern("conv2d", conv2d_pattern())
+        self._register_offload_pattern("conv2d_nhwc", conv2d_pattern("NHWC", "HWIO"))
+        self._register_offload_pattern("dense", dense_pattern())
+        self._register_offload_pattern("max_pool2d", pool2d_pattern("nn.max_pool2d"))
+        self._register_offload_pattern("avg_pool2d", pool2d_pattern("nn.avg_pool2d"))
+        for name, op in eltwise_ops.items():
+            self._register_offload_pattern(name, eltwise_pattern(op.relay_op, op.arity,
+                                                                     op.dtypes))
 
         # TIR pass registration
         #self._register_tir_pass(PassPhase.TIR_PHASE_0, VanillaAcceleratorConv2dPass())
@@ -43,10 +93,35 @@ class VanillaAcceleratorBackend(UMABackend):
         self._register_tir_pass(PassPhase.TIR_PHASE_0, VanillaAcceleratorTirPass())
 
         # Relay pass registration
+        if layout is not None:
+            # "default" picks the kernel layout the conv2d patterns expect (OIHW, HWIO)
+            desired = {op: [layout, "default"] for op in ["nn.conv2d", "qnn.conv2d"]}
+            self._register_relay_pass(PassPhase.PRE_PARTITIONING,
+                                      relay.transform.ConvertLayout(desired))
+        # lower qnn ops to int8/int32 nn ops (and bias_add to add) so the patterns see them
+        self._register_relay_pass(PassPhase.PRE_PARTITIONING, relay.qnn.transform.CanonicalizeOps())
+        self._register_relay_pass(PassPhase.PRE_PARTITIONING, relay.transform.CanonicalizeOps())
+        # with bound params, weight layout transforms and the like become constants
+        self._register_relay_pass(PassPhase.PRE_PARTITIONING, relay.transform.FoldConstant())
+        if winograd:
+            self._register_relay_pass(PassPhase.POST_PARTITIONING_0,
+                                      WinogradWeights(self.target_name))
+        # the partitions are lowered with their tensors as parameters
+        self._register_relay_pass(PassPhase.POST_PARTITIONING_0, LiftConstants(self.target_name))
+
+        # Operator strategy registration
+        self._register_operator_strategy("nn.contrib_conv2d_winograd_without_weight_transform",
+                                         conv2d_winograd_strategy)
 
         # TIR to runtime function registration
         self._register_codegen(fmt="c", includes=gen_includes)
 
+    def _register_offload_pattern(self, name, pattern):
+        if self.cost_model is None:
+            self._register_pattern(name, pattern)
+        else:
+            self._register_pattern(name, pattern, self.cost_model.predicate(name, pattern))
+
     @property
     def target_name(self):
         return "vanilla_accelerator"
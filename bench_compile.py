@@ -0,0 +1,145 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compile time of VanillaAcceleratorTirPass on synthetic PrimFuncs with hundreds of ops"""
+
+import argparse
+import importlib
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+import tvm
+from tvm import te, topi
+
+op_counts = [16, 64, 256, 512]
+
+
+def eltwise_graph(num_ops, shape=(1, 16, 14, 14)):
+    """
+    Alternating add/relu chain, every add also reads a fresh input
+    """
+    x   = te.placeholder(shape, name="x", dtype="float32")
+    ins = [x]
+    for i in range(num_ops // 2):
+        y = te.placeholder(shape, name=f"y{i}", dtype="float32")
+        ins.append(y)
+        x = topi.nn.relu(topi.add(x, y))
+    return te.create_prim_func(ins + [x])
+
+
+def conv2d_graph(num_ops, shape=(1, 8, 14, 14)):
+    """
+    Repeated conv2d + bias + relu, one third of `num_ops` each
+    """
+    x   = te.placeholder(shape, name="x", dtype="float32")
+    ins = [x]
+    for i in range(num_ops // 3):
+        w = te.placeholder((shape[1], shape[1], 3, 3), name=f"w{i}", dtype="float32")
+        b = te.placeholder((1, shape[1], 1, 1), name=f"b{i}", dtype="float32")
+        ins.extend([w, b])
+        x = topi.nn.relu(topi.add(topi.nn.conv2d_nchw(x, w, 1, 1, 1), b))
+    return te.create_prim_func(ins + [x])
+
+
+def partition(func, index):
+    """
+    `func` as UMA hands over the `index`-th partition: with its own global symbol, also
+    carried by the attributes of the Relay function it was lowered from
+    """
+    symbol = f"tvmgen_default_vanilla_accelerator_main_{index}"
+    relay_attrs = tvm.ir.make_node("DictAttrs", Compiler="vanilla_accelerator",
+                                   global_symbol=symbol)
+    return func.with_attr("global_symbol", symbol).with_attr("relay_attrs", relay_attrs)
+
+
+def check_partitions(tir_pass, lowering_cache, build=conv2d_graph, num_ops=3):
+    """
+    Two partitions of the same shape are lowered once
+    """
+    lowering_cache.clear()
+    for index in range(2):
+        tir_pass(tvm.IRModule({"main": partition(build(num_ops), index)}))
+    stats = lowering_cache.stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1), stats
+    print(f"identical partitions: {stats['misses']} miss, {stats['hits']} hit")
+
+
+def load_passes(rev=None):
+    """
+    The passes module of the working tree, or of the git revision `rev` exported to a
+    temporary directory
+    """
+    if rev is not None:
+        topdir  = os.path.dirname(os.path.abspath(__file__))
+        export  = tempfile.mkdtemp(prefix="bench_compile_")
+        archive = subprocess.run(["git", "-C", topdir, "archive", rev],
+                                 check=True, capture_output=True).stdout
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(export)
+        sys.path.insert(0, export)
+    return importlib.import_module("passes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rev", default=None,
+                        help="time the passes of this git revision instead of the working "
+                             "tree, e.g. the lowering before the shared block index")
+    args = parser.parse_args()
+
+    passes = load_passes(args.rev)
+    # revisions before the lowering cache lower every PrimFunc
+    lowering_cache = getattr(passes, "lowering_cache", None)
+    tir_pass = passes.VanillaAcceleratorTirPass()
+    if lowering_cache is not None:
+        check_partitions(tir_pass, lowering_cache)
+    print(f"{'graph':<10} {'ops':>6} {'blocks':>7} {'time[ms]':>10} {'per op[us]':>11} "
+          f"{'cached[ms]':>11}")
+    for name, build in [("eltwise", eltwise_graph), ("conv2d", conv2d_graph)]:
+        for num_ops in op_counts:
+            func   = build(num_ops)
+            mod    = tvm.IRModule({"main": func})
+            blocks = []
+            tvm.tir.stmt_functor.post_order_visit(
+                func.body, lambda op: blocks.append(op) if isinstance(op, tvm.tir.Block) else None
+            )
+
+            best = float("inf")
+            for _ in range(args.repeat):
+                if lowering_cache is not None:
+                    lowering_cache.clear()
+                start = time.perf_counter()
+                tir_pass(mod)
+                best = min(best, time.perf_counter() - start)
+
+            # the same PrimFunc again is served by the lowering cache
+            start = time.perf_counter()
+            tir_pass(mod)
+            cached = time.perf_counter() - start
+            print(f"{name:<10} {num_ops:>6} {len(blocks):>7} {best * 1e3:>10.1f} "
+                  f"{best / num_ops * 1e6:>11.1f} {cached * 1e3:>11.1f}")
+    if lowering_cache is not None:
+        print(lowering_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compare the naive, cache-blocked and Winograd conv2d kernels"""
+
+import numpy as np
+
+from bench_utils import build_kernels, ptr, timeit
+from relay_passes import winograd_weights
+
+# (oc, ic, oh, ow, kh, kw)
+shapes = [
+    (16, 32, 12, 12, 3, 3),  # run_conv2d.py, padding (0, 0)
+    (32, 32, 14, 14, 3, 3),  # run_conv2d.py, padding (1, 1)
+    (8, 1, 28, 28, 5, 5),    # mnist-12 Convolution28
+    (16, 8, 14, 14, 5, 5),   # mnist-12 Convolution110
+]
+
+
+def main():
+    lib = build_kernels()
+
+    print(f"{'oc':>4} {'ic':>4} {'oh':>4} {'ow':>4} {'k':>4} {'naive[us]':>10} {'blocked[us]':>12} {'speedup':>8} {'winograd[us]':>13} {'speedup':>8} {'max rel err':>12}")
+    for oc, ic, oh, ow, kh, kw in shapes:
+        ih, iw  = oh + kh - 1, ow + kw - 1
+        ifmap   = np.random.uniform(0, 1, (ic, ih, iw)).astype("float32")
+        weights = np.random.uniform(0, 1, (oc, ic, kh, kw)).astype("float32")
+        ref     = np.zeros((oc, oh, ow), dtype="float32")
+        out     = np.zeros((oc, oh, ow), dtype="float32")
+
+        args = (ptr(ifmap), ptr(weights))
+        naive = timeit(lib.vanilla_accelerator_conv2dnchw, *args, ptr(ref), oc, ow, oh, ic, kh, kw)
+        blocked = timeit(lib.vanilla_accelerator_conv2dnchw_blocked, *args, ptr(out), 1, oc, ow, oh, ic, kh, kw, iw, ih, 0, 0, 1, 1, 1, 1, 1, 0, 1)
+        np.testing.assert_allclose(out, ref, rtol=1e-5)
+
+        line = f"{oc:>4} {ic:>4} {oh:>4} {ow:>4} {kh:>4} {naive * 1e6:>10.1f} {blocked * 1e6:>12.1f} {naive / blocked:>7.2f}x"
+        if (kh, kw) == (3, 3):
+            # the weights are transformed at compile time, the lowered PrimFuncs only run the conv
+            u    = winograd_weights(weights)
+            wino = timeit(lib.vanilla_accelerator_conv2dnchw_winograd, args[0], ptr(u), ptr(out), 1, oc, ow, oh, ic, iw, ih, 0, 0, 1)
+            err  = np.abs(out - ref).max() / np.abs(ref).max()
+            np.testing.assert_allclose(out, ref, rtol=1e-4, atol=1e-4 * np.abs(ref).max())
+            line += f" {wino * 1e6:>13.1f} {naive / wino:>7.2f}x {err:>12.1e}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
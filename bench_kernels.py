@@ -0,0 +1,173 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Shape sweep of the conv2d and add kernels against the TVM host-C lowering, as JSON"""
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+from bench_utils import build_kernels, ptr, timeit
+
+# conv2d sweep: channels (ic = oc), spatial size (oh = ow), kernel size
+conv_channels = [8, 32, 64]
+conv_sizes    = [14, 28, 56]
+conv_kernels  = [1, 3, 5]
+
+# add sweep: element count of the output, broadcast ratio = in2 elements / out elements
+add_shapes = [(1, 16, 14, 14), (1, 64, 56, 56), (8, 64, 56, 56)]
+add_broadcasts = {
+    "1": lambda n, c, h, w: (n, c, h, w),
+    "1/hw": lambda n, c, h, w: (1, c, 1, 1),
+    "1/nch": lambda n, c, h, w: (1, 1, 1, w),
+}
+# vector widths of the add kernels (the `dimension` target attribute), 1 is the scalar loop
+add_lanes = [1, 4, 8, 16]
+
+
+def host_c_time(func, inputs, number, repeat):
+    """
+    Best average run time in seconds of the Relay function `func` built for the plain "c"
+    target, the lowering TVM uses for the ops left on the host
+    """
+    import tvm
+    from tvm import relay
+    from tvm.contrib import graph_executor
+
+    mod = tvm.IRModule.from_expr(func)
+    with tvm.transform.PassContext(opt_level=3):
+        lib = relay.build(mod, target="c")
+    workdir = tempfile.mkdtemp(prefix="vanilla_accelerator_bench_")
+    path = os.path.join(workdir, "host.so")
+    lib.export_library(path, options=["-O2"])
+
+    dev = tvm.cpu()
+    gmod = graph_executor.GraphModule(tvm.runtime.load_module(path)["default"](dev))
+    for name, value in inputs.items():
+        gmod.set_input(name, value)
+    timer = gmod.module.time_evaluator("run", dev, number=number, repeat=repeat)
+    return min(timer().results)
+
+
+def conv_case(lib, ic, size, k, threads, host):
+    from_relay = None
+    oc, oh, ow = ic, size, size
+    ih, iw     = oh + k - 1, ow + k - 1
+    ifmap      = np.random.uniform(0, 1, (1, ic, ih, iw)).astype("float32")
+    weights    = np.random.uniform(0, 1, (oc, ic, k, k)).astype("float32")
+    out        = np.zeros((1, oc, oh, ow), dtype="float32")
+    shape      = (1, oc, ow, oh, ic, k, k, iw, ih, 0, 0, 1, 1, 1, 1, 1, 0, threads)
+
+    elapsed = timeit(lib.vanilla_accelerator_conv2dnchw_blocked, ptr(ifmap), ptr(weights),
+                     ptr(out), *shape)
+    if host:
+        from tvm import relay
+        data = relay.var("data", shape=ifmap.shape, dtype="float32")
+        weight = relay.var("weight", shape=weights.shape, dtype="float32")
+        func = relay.Function([data, weight], relay.nn.conv2d(data, weight, kernel_size=(k, k)))
+        from_relay = host_c_time(func, {"data": ifmap, "weight": weights}, 10, 5)
+
+    flops  = 2 * oc * oh * ow * ic * k * k
+    nbytes = (ifmap.size + weights.size + out.size) * 4
+    return result("conv2d", {"ic": ic, "oc": oc, "size": size, "kernel": k},
+                  elapsed, from_relay, flops, nbytes)
+
+
+def add_case(lib, shape, ratio, lanes, threads, host, host_times):
+    shape2 = add_broadcasts[ratio](*shape)
+    in1    = np.random.uniform(0, 1, shape).astype("float32")
+    in2    = np.random.uniform(0, 1, shape2).astype("float32")
+    out    = np.zeros(shape, dtype="float32")
+
+    if shape2 == shape:
+        elapsed = timeit(lib.vanilla_accelerator_addvec, ptr(in1), ptr(in2), ptr(out),
+                         out.size, lanes, 0, threads)
+    else:
+        strides1 = [s // 4 for s in in1.strides]
+        strides2 = [0 if d == 1 else s // 4 for d, s in zip(shape2, in2.strides)]
+        elapsed = timeit(lib.vanilla_accelerator_addvec_strided, ptr(in1), ptr(in2), ptr(out),
+                         *shape, *strides1, *strides2, lanes, 0, threads)
+    np.testing.assert_allclose(out, in1 + in2)
+    # the host-C baseline does not depend on the lanes, measured once per shape
+    from_relay = host_times.get((shape, ratio))
+    if host and from_relay is None:
+        from tvm import relay
+        a = relay.var("a", shape=shape, dtype="float32")
+        b = relay.var("b", shape=shape2, dtype="float32")
+        func = relay.Function([a, b], relay.add(a, b))
+        from_relay = host_c_time(func, {"a": in1, "b": in2}, 10, 5)
+        host_times[(shape, ratio)] = from_relay
+
+    nbytes = (in1.size + in2.size + out.size) * 4
+    return result("add", {"shape": list(shape), "broadcast": ratio, "lanes": lanes},
+                  elapsed, from_relay, out.size, nbytes)
+
+
+def result(kernel, params, elapsed, host_elapsed, flops, nbytes):
+    entry = {
+        "kernel": kernel,
+        "params": params,
+        "time_us": elapsed * 1e6,
+        "gflops": flops / elapsed * 1e-9,
+        "gbps": nbytes / elapsed * 1e-9,
+    }
+    if host_elapsed is not None:
+        entry["host_c_time_us"] = host_elapsed * 1e6
+        entry["host_c_gflops"]  = flops / host_elapsed * 1e-9
+        entry["speedup"]        = host_elapsed / elapsed
+    return entry
+
+
+def revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--no-host", action="store_true",
+                        help="skip the TVM host-C baseline")
+    parser.add_argument("--output", default="bench_kernels.json")
+    args = parser.parse_args()
+
+    lib     = build_kernels()
+    host    = not args.no_host
+    results = []
+    for ic, size, k in itertools.product(conv_channels, conv_sizes, conv_kernels):
+        results.append(conv_case(lib, ic, size, k, args.threads, host))
+        print(json.dumps(results[-1]))
+    host_times = {}
+    for shape, ratio, lanes in itertools.product(add_shapes, add_broadcasts, add_lanes):
+        results.append(add_case(lib, shape, ratio, lanes, args.threads, host, host_times))
+        print(json.dumps(results[-1]))
+
+    with open(args.output, "w") as f:
+        json.dump({"revision": revision(), "threads": args.threads, "results": results}, f,
+                  indent=2)
+    print(f"Results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Scaling of the conv2d and add kernels from 1 to N threads"""
+
+import argparse
+import os
+
+import numpy as np
+
+from bench_utils import build_kernels, ptr, timeit
+
+# (n, oc, ic, oh, ow, kh, kw)
+conv_shapes = [
+    (1, 32, 32, 14, 14, 3, 3),   # run_conv2d.py, padding (1, 1)
+    (1, 64, 64, 56, 56, 3, 3),   # resnet stage 1
+    (8, 16, 8, 14, 14, 5, 5),    # mnist-12 Convolution110, batch 8
+]
+
+add_sizes = [1 << 16, 1 << 20, 1 << 22]
+
+
+def thread_counts(max_threads):
+    counts = [1]
+    while counts[-1] * 2 <= max_threads:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_threads:
+        counts.append(max_threads)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    lib = build_kernels()
+    counts = thread_counts(args.max_threads)
+
+    print(f"{'conv2d':<28} {'threads':>7} {'time[us]':>10} {'speedup':>8}")
+    for n, oc, ic, oh, ow, kh, kw in conv_shapes:
+        ih, iw  = oh + kh - 1, ow + kw - 1
+        ifmap   = np.random.uniform(0, 1, (n, ic, ih, iw)).astype("float32")
+        weights = np.random.uniform(0, 1, (oc, ic, kh, kw)).astype("float32")
+        ref     = np.zeros((n, oc, oh, ow), dtype="float32")
+        out     = np.zeros((n, oc, oh, ow), dtype="float32")
+        conv    = lib.vanilla_accelerator_conv2dnchw_blocked
+        shape   = (n, oc, ow, oh, ic, kh, kw, iw, ih, 0, 0, 1, 1, 1, 1, 1, 0)
+
+        conv(ptr(ifmap), ptr(weights), ptr(ref), *shape, 1)
+        base = None
+        for t in counts:
+            elapsed = timeit(conv, ptr(ifmap), ptr(weights), ptr(out), *shape, t)
+            np.testing.assert_allclose(out, ref, rtol=1e-5)
+            base = base or elapsed
+            name = f"{n}x{ic}x{ih}x{iw} -> {oc}x{oh}x{ow}"
+            print(f"{name:<28} {t:>7} {elapsed * 1e6:>10.1f} {base / elapsed:>7.2f}x")
+
+    print()
+    print(f"{'add':<28} {'threads':>7} {'time[us]':>10} {'speedup':>8}")
+    for w in add_sizes:
+        in1 = np.random.uniform(0, 1, w).astype("float32")
+        in2 = np.random.uniform(0, 1, w).astype("float32")
+        out = np.zeros(w, dtype="float32")
+
+        base = None
+        for t in counts:
+            elapsed = timeit(lib.vanilla_accelerator_addvec, ptr(in1), ptr(in2), ptr(out), w,
+                             0, 0, t)
+            np.testing.assert_allclose(out, in1 + in2)
+            base = base or elapsed
+            print(f"{w:<28} {t:>7} {elapsed * 1e6:>10.1f} {base / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
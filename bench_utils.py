@@ -0,0 +1,58 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Host-side harness for timing the vanilla_accelerator kernels"""
+
+import ctypes
+import os
+import pathlib
+import subprocess
+import tempfile
+import time
+
+from codegen import gen_includes
+
+
+def build_kernels(cflags=("-O2", "-pthread")) -> ctypes.CDLL:
+    """
+    Compile the same kernel sources the codegen includes into a shared library
+    """
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="vanilla_accelerator_bench_"))
+    src = workdir / "kernels.c"
+    lib = workdir / "libkernels.so"
+    src.write_text(gen_includes())
+
+    cc = os.environ.get("CC", "cc")
+    subprocess.check_call([cc, *cflags, "-shared", "-fPIC", "-o", str(lib), str(src)])
+    return ctypes.CDLL(str(lib))
+
+
+def ptr(arr):
+    return arr.ctypes.data_as(ctypes.c_void_p)
+
+
+def timeit(fn, *args, number=10, repeat=5) -> float:
+    """
+    Best average wall time of `fn(*args)` in seconds
+    """
+    fn(*args)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
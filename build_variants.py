@@ -0,0 +1,110 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Partition, lower and build shape variants of ONNX models concurrently"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+
+def variant_name(model, shape):
+    base = os.path.splitext(os.path.basename(model))[0]
+    return f"{base}_{'x'.join(str(d) for d in shape)}"
+
+
+def build_variant(model, input_name, shape, output):
+    """
+    Build one (model, shape) configuration into its own directory `output`. Runs in a
+    worker process, so the backend is registered there.
+    """
+    import onnx
+    from tvm import relay
+    from tvm.relay import transform
+
+    import deploy
+    from backend import VanillaAcceleratorBackend
+    from run import set_batch
+
+    start = time.perf_counter()
+    try:
+        onnx_model = onnx.load(model)
+        if shape[0] > 1:
+            set_batch(onnx_model)
+        mod, params = relay.frontend.from_onnx(onnx_model, {input_name: shape}, freeze_params=False)
+        mod = transform.InferType()(mod)
+
+        uma_backend = VanillaAcceleratorBackend()
+        uma_backend.register()
+        os.makedirs(output, exist_ok=True)
+        path = os.path.join(output, "model.so")
+        deploy.build(mod, params, uma_backend).export_library(path, options=deploy.export_options)
+        return {"time": time.perf_counter() - start, "size": os.path.getsize(path), "error": None}
+    except Exception:
+        return {"time": time.perf_counter() - start, "size": 0, "error": traceback.format_exc()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="./model/mnist-12.onnx")
+    parser.add_argument("--input", default="Input3")
+    parser.add_argument("--shape", action="append", default=[],
+                        help="comma separated input shape, repeat for more variants")
+    parser.add_argument("--config", default=None,
+                        help='JSON list of {"model": ..., "input": ..., "shape": [...]}')
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default="./variants")
+    args = parser.parse_args()
+
+    configs = []
+    if args.config is not None:
+        with open(args.config) as f:
+            configs = [(c["model"], c["input"], tuple(c["shape"])) for c in json.load(f)]
+    shapes = args.shape or ([] if configs else ["1,1,28,28", "8,1,28,28", "64,1,28,28"])
+    for shape in shapes:
+        configs.append((args.model, args.input, tuple(int(d) for d in shape.split(","))))
+
+    # spawned workers, TVM's thread pools do not survive a fork
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(args.jobs, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(build_variant, model, input_name, shape,
+                        os.path.join(args.output, variant_name(model, shape))): (model, shape)
+            for model, input_name, shape in configs
+        }
+        results = {futures[f]: f.result() for f in concurrent.futures.as_completed(futures)}
+    elapsed = time.perf_counter() - start
+
+    print(f"{'variant':<32} {'build[s]':>9} {'size[KiB]':>10}")
+    for model, _, shape in configs:
+        r = results[(model, shape)]
+        if r["error"] is not None:
+            print(f"{variant_name(model, shape):<32} {'failed':>9}")
+            print(r["error"])
+            continue
+        print(f"{variant_name(model, shape):<32} {r['time']:>9.1f} {r['size'] / 1024:>10.1f}")
+    total = sum(r["time"] for r in results.values())
+    print(f"{len(configs)} variants in {elapsed:.1f}s wall, {total:.1f}s of builds, "
+          f"{args.jobs} jobs")
+
+
+if __name__ == "__main__":
+    main()
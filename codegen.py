@@ -20,10 +20,25 @@ import tvm
 import pathlib
 
 
+kernel_sources = [
+    "threadpool.cc",
+    "scratchpad.cc",
+    "conv2dnchw.cc",
+    "conv2dnchw_int8.cc",
+    "conv2d_winograd.cc",
+    "conv2dnhwc.cc",
+    "pool.cc",
+    "gzadd.cc",
+    "eltwise.cc",
+    "dense.cc",
+    "requantize.cc",
+]
+
+
 def gen_includes() -> str:
     topdir = pathlib.Path(__file__).parent.absolute()
 
     includes = ""
-    includes += f'#include "{topdir}/conv2dnchw.cc"\n'
-    includes += f'#include "{topdir}/gzadd.cc"\n'
+    for src in kernel_sources:
+        includes += f'#include "{topdir}/{src}"\n'
     return includes
@@ -0,0 +1,216 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdlib.h>
+#include <string.h>
+
+/*
+* Winograd F(2x2, 3x3): every 2x2 output tile costs 16 multiplies per (oc, ic) pair instead of
+* 36. With U = G g G^T the transformed 3x3 filter and V = B^T d B the transformed 4x4 input
+* patch, the output tile is A^T (sum over ic of U (.) V) A. For each of the 16 positions the
+* sum over ic is a (oc x ic) by (ic x tiles) matrix product.
+*/
+
+/* output tiles a task transforms and multiplies at once */
+#define VA_WINO_TILES 32
+/* output channels sharing one pass over the transformed input */
+#define VA_WINO_OC_BLOCK 4
+
+typedef struct {
+  const float* ifmap;
+  const float* u;
+  const float* bias;
+  float* result;
+  int oc, ow, oh, ic, iw, ih, padh, padw;
+  int bn, bc, bh, bw, relu;
+  int tw, ntiles, blocks;
+  int error;
+} vanilla_accelerator_winograd_args_t;
+
+/* V = B^T d B of the 4x4 input patch at (y0, x0), zero outside the input */
+static void vanilla_accelerator_winograd_input(const float* in, int ih, int iw, int y0, int x0,
+    float* v, int stride) {
+  float d[4][4];
+  float t[4][4];
+  for (int r = 0; r < 4; ++r) {
+    for (int c = 0; c < 4; ++c) {
+      int y = y0 + r;
+      int x = x0 + c;
+      d[r][c] = (y >= 0 && y < ih && x >= 0 && x < iw) ? in[y * iw + x] : 0.0f;
+    }
+  }
+  // B^T = [1 0 -1 0; 0 1 1 0; 0 -1 1 0; 0 1 0 -1]
+  for (int c = 0; c < 4; ++c) {
+    t[0][c] = d[0][c] - d[2][c];
+    t[1][c] = d[1][c] + d[2][c];
+    t[2][c] = d[2][c] - d[1][c];
+    t[3][c] = d[1][c] - d[3][c];
+  }
+  for (int r = 0; r < 4; ++r) {
+    v[(r * 4 + 0) * stride] = t[r][0] - t[r][2];
+    v[(r * 4 + 1) * stride] = t[r][1] + t[r][2];
+    v[(r * 4 + 2) * stride] = t[r][2] - t[r][1];
+    v[(r * 4 + 3) * stride] = t[r][1] - t[r][3];
+  }
+}
+
+/*!
+* \brief One task covers VA_WINO_TILES output tiles of one image for all output channels: the
+* tiles are transformed once for every input channel, then reused by every output channel.
+*/
+static void vanilla_accelerator_winograd_task(void* ctx, int task) {
+  vanilla_accelerator_winograd_args_t* a = (vanilla_accelerator_winograd_args_t*)ctx;
+  int b = task / a->blocks;
+  int t0 = (task % a->blocks) * VA_WINO_TILES;
+  int nt = a->ntiles - t0 < VA_WINO_TILES ? a->ntiles - t0 : VA_WINO_TILES;
+  const float* in = a->ifmap + (size_t)b * a->ic * a->ih * a->iw;
+  float* out = a->result + (size_t)b * a->oc * a->oh * a->ow;
+  const float* bs = a->bias ? a->bias + b * a->bn : NULL;
+
+  // v[16][ic][VA_WINO_TILES], the transformed input of the task's tiles
+  float* v = (float*)malloc(sizeof(float) * 16 * a->ic * VA_WINO_TILES);
+  if (v == NULL) {
+    a->error = 1;
+    return;
+  }
+  for (int i = 0; i < a->ic; ++i) {
+    for (int t = 0; t < nt; ++t) {
+      int ty = (t0 + t) / a->tw;
+      int tx = (t0 + t) % a->tw;
+      vanilla_accelerator_winograd_input(in + i * a->ih * a->iw, a->ih, a->iw,
+                                         2 * ty - a->padh, 2 * tx - a->padw,
+                                         v + i * VA_WINO_TILES + t, a->ic * VA_WINO_TILES);
+    }
+  }
+
+  for (int o0 = 0; o0 < a->oc; o0 += VA_WINO_OC_BLOCK) {
+    int ob = a->oc - o0 < VA_WINO_OC_BLOCK ? a->oc - o0 : VA_WINO_OC_BLOCK;
+    float m[VA_WINO_OC_BLOCK][16][VA_WINO_TILES];
+    memset(m, 0, sizeof(m));
+    for (int xi = 0; xi < 16; ++xi) {
+      const float* ux = a->u + ((size_t)xi * a->oc + o0) * a->ic;
+      const float* vx = v + (size_t)xi * a->ic * VA_WINO_TILES;
+      for (int i = 0; i < a->ic; ++i) {
+        const float* vi = vx + i * VA_WINO_TILES;
+        for (int o = 0; o < ob; ++o) {
+          float w = ux[o * a->ic + i];
+          for (int t = 0; t < VA_WINO_TILES; ++t) {
+            m[o][xi][t] += w * vi[t];
+          }
+        }
+      }
+    }
+
+    // Y = A^T M A, A^T = [1 1 1 0; 0 1 -1 -1]
+    for (int o = 0; o < ob; ++o) {
+      float* plane = out + (size_t)(o0 + o) * a->oh * a->ow;
+      for (int t = 0; t < nt; ++t) {
+        float s[2][4];
+        float y[2][2];
+        for (int c = 0; c < 4; ++c) {
+          s[0][c] = m[o][c][t] + m[o][4 + c][t] + m[o][8 + c][t];
+          s[1][c] = m[o][4 + c][t] - m[o][8 + c][t] - m[o][12 + c][t];
+        }
+        for (int r = 0; r < 2; ++r) {
+          y[r][0] = s[r][0] + s[r][1] + s[r][2];
+          y[r][1] = s[r][1] - s[r][2] - s[r][3];
+        }
+        int ty = (t0 + t) / a->tw;
+        int tx = (t0 + t) % a->tw;
+        for (int r = 0; r < 2 && 2 * ty + r < a->oh; ++r) {
+          for (int c = 0; c < 2 && 2 * tx + c < a->ow; ++c) {
+            int yy = 2 * ty + r;
+            int xx = 2 * tx + c;
+            float val = y[r][c];
+            if (bs) {
+              val += bs[(o0 + o) * a->bc + yy * a->bh + xx * a->bw];
+              val = (a->relu && val < 0.000000e+00f) ? 0.000000e+00f : val;
+            }
+            plane[yy * a->ow + xx] = val;
+          }
+        }
+      }
+    }
+  }
+  free(v);
+}
+
+static int vanilla_accelerator_winograd_run(const float* ifmap, const float* u, const float* bias,
+    float* result, int n, int oc, int ow, int oh, int ic, int iw, int ih, int padh, int padw,
+    int bn, int bc, int bh, int bw, int relu, int nthreads) {
+  vanilla_accelerator_winograd_args_t a;
+  a.ifmap = ifmap;
+  a.u = u;
+  a.bias = bias;
+  a.result = result;
+  a.oc = oc;
+  a.ow = ow;
+  a.oh = oh;
+  a.ic = ic;
+  a.iw = iw;
+  a.ih = ih;
+  a.padh = padh;
+  a.padw = padw;
+  a.bn = bn;
+  a.bc = bc;
+  a.bh = bh;
+  a.bw = bw;
+  a.relu = relu;
+  a.tw = (ow + 1) / 2;
+  a.ntiles = ((oh + 1) / 2) * a.tw;
+  a.blocks = (a.ntiles + VA_WINO_TILES - 1) / VA_WINO_TILES;
+  a.error = 0;
+
+  vanilla_accelerator_parallel_for(nthreads, n * a.blocks, vanilla_accelerator_winograd_task,
+                                   &a);
+  return a.error ? -1 : 0;
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Winograd F(2x2, 3x3) Conv2D for stride 1, dilation 1, ungrouped 3x3 convolutions,
+* datatype float. u holds the weights transformed at compile time, u[4][4][oc][ic] as
+* computed by relay_passes.winograd_weights.
+* Padding is applied on the fly as in vanilla_accelerator_conv2dnchw_blocked, the other
+* parameters are the same.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_winograd(float* ifmap, float* u, float* result, int n,
+    int oc, int ow, int oh, int ic, int iw, int ih, int padh, int padw, int nthreads) {
+  return vanilla_accelerator_winograd_run(ifmap, u, NULL, result, n, oc, ow, oh, ic, iw, ih, padh,
+                                          padw, 0, 0, 0, 0, 0, nthreads);
+}
+
+/*!
+* \brief Winograd Conv2D fused with a bias/residual add and optional relu, the add operand is
+* read as in vanilla_accelerator_conv2dnchw_bias.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_winograd_bias(float* ifmap, float* u, float* bias,
+    float* result, int n, int oc, int ow, int oh, int ic, int iw, int ih, int padh, int padw,
+    int bn, int bc, int bh, int bw, int relu, int nthreads) {
+  return vanilla_accelerator_winograd_run(ifmap, u, bias, result, n, oc, ow, oh, ic, iw, ih, padh,
+                                          padw, bn, bc, bh, bw, relu, nthreads);
+}
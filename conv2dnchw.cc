@@ -42,6 +42,8 @@ int vanilla_accelerator_pad(float *ifmap, float *result, int ow, int oh, int ic,
       }
     }
   }
+
+  return 0;
 }
 
 /*!
@@ -90,3 +92,269 @@ int vanilla_accelerator_conv2dnchw(float* ifmap, float* weights, float* result,
 
   return 0;
 }
+
+#define VA_CONV_MAX_OC_TILE 8
+#define VA_CONV_MAX_OW_TILE 16
+
+#if defined(__GNUC__)
+#define VA_CONV_INLINE static inline __attribute__((always_inline))
+#else
+#define VA_CONV_INLINE static inline
+#endif
+
+/*!
+* \brief Register-tiled micro-kernel computing an oc_tile x ow_tile block of one output row.
+* Accumulators stay in registers across the whole (ic, kh, kw) reduction and every output
+* element is written exactly once. ifmap points at the first of the ic input channels of the
+* group, unpadded (ic x ih x iw); taps falling into the (padh, padw) border are skipped instead
+* of reading a materialized zero. If bias is not NULL, bias[o * bc + y * bh + x * bw] is added to
+* the accumulator (and relu applied) before the store. OCT x OWT is the full tile shape, always
+* a constant so that every shape in vanilla_accelerator_conv2d_tiles gets its own unrolled copy.
+*/
+VA_CONV_INLINE void vanilla_accelerator_conv2d_tile(const float* ifmap, const float* weights,
+    const float* bias, float* result, int oc0, int oc_tile, int y, int x0, int ow_tile, int ow,
+    int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh, int sw, int dh,
+    int dw, int bc, int bh, int bw, int relu, const int OCT, const int OWT) {
+  float acc[VA_CONV_MAX_OC_TILE][VA_CONV_MAX_OW_TILE];
+  int wstride = ic * kh * kw;
+  int ix0 = x0 * sw - padw;
+  int interior = (ix0 >= 0) && (ix0 + (ow_tile - 1) * sw + (kw - 1) * dw < iw);
+
+  for (int o = 0; o < OCT; ++o) {
+    for (int x = 0; x < OWT; ++x) {
+      acc[o][x] = 0.000000e+00f;
+    }
+  }
+
+  for (int c = 0; c < ic; ++c) {
+    for (int ky = 0; ky < kh; ++ky) {
+      int iy = y * sh + ky * dh - padh;
+      if (iy < 0 || iy >= ih) {
+        continue;
+      }
+      const float* row = ifmap + c * iw * ih + iy * iw;
+      const float* wrow = weights + oc0 * wstride + (c * kh + ky) * kw;
+
+      if (interior && oc_tile == OCT && ow_tile == OWT) {
+        for (int kx = 0; kx < kw; ++kx) {
+          const float* in = row + ix0 + kx * dw;
+          for (int o = 0; o < OCT; ++o) {
+            float wv = wrow[o * wstride + kx];
+            for (int x = 0; x < OWT; ++x) {
+              acc[o][x] += wv * in[x * sw];
+            }
+          }
+        }
+      } else if (interior) {
+        for (int kx = 0; kx < kw; ++kx) {
+          const float* in = row + ix0 + kx * dw;
+          for (int o = 0; o < oc_tile; ++o) {
+            float wv = wrow[o * wstride + kx];
+            for (int x = 0; x < ow_tile; ++x) {
+              acc[o][x] += wv * in[x * sw];
+            }
+          }
+        }
+      } else {
+        for (int kx = 0; kx < kw; ++kx) {
+          for (int o = 0; o < oc_tile; ++o) {
+            float wv = wrow[o * wstride + kx];
+            for (int x = 0; x < ow_tile; ++x) {
+              int ix = ix0 + x * sw + kx * dw;
+              if (ix >= 0 && ix < iw) {
+                acc[o][x] += wv * row[ix];
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+
+  for (int o = 0; o < oc_tile; ++o) {
+    float* out = result + (oc0 + o) * ow * oh + y * ow + x0;
+    if (bias) {
+      const float* b = bias + (oc0 + o) * bc + y * bh + x0 * bw;
+      for (int x = 0; x < ow_tile; ++x) {
+        float v = acc[o][x] + b[x * bw];
+        out[x] = (relu && v < 0.000000e+00f) ? 0.000000e+00f : v;
+      }
+    } else {
+      for (int x = 0; x < ow_tile; ++x) {
+        out[x] = acc[o][x];
+      }
+    }
+  }
+}
+
+typedef void (*vanilla_accelerator_conv2d_tile_t)(const float* ifmap, const float* weights,
+    const float* bias, float* result, int oc0, int oc_tile, int y, int x0, int ow_tile, int ow,
+    int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh, int sw, int dh,
+    int dw, int bc, int bh, int bw, int relu);
+
+#define VA_CONV_TILE(OCT, OWT)                                                                 \
+  static void vanilla_accelerator_conv2d_tile_##OCT##x##OWT(const float* ifmap,                \
+      const float* weights, const float* bias, float* result, int oc0, int oc_tile, int y,    \
+      int x0, int ow_tile, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh,  \
+      int padw, int sh, int sw, int dh, int dw, int bc, int bh, int bw, int relu) {           \
+    vanilla_accelerator_conv2d_tile(ifmap, weights, bias, result, oc0, oc_tile, y, x0,        \
+                                    ow_tile, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw,  \
+                                    dh, dw, bc, bh, bw, relu, OCT, OWT);                      \
+  }
+
+VA_CONV_TILE(4, 8)
+VA_CONV_TILE(8, 4)
+VA_CONV_TILE(2, 16)
+VA_CONV_TILE(4, 4)
+VA_CONV_TILE(8, 8)
+VA_CONV_TILE(1, 16)
+
+/*!
+* \brief Tile shapes selectable through the `tile` argument of the conv2d kernels, an index
+* into this table; 0 is the default, the autotuner picks the best per workload.
+*/
+static const struct {
+  int oc;
+  int ow;
+  vanilla_accelerator_conv2d_tile_t fn;
+} vanilla_accelerator_conv2d_tiles[] = {
+    {4, 8, vanilla_accelerator_conv2d_tile_4x8},  {8, 4, vanilla_accelerator_conv2d_tile_8x4},
+    {2, 16, vanilla_accelerator_conv2d_tile_2x16}, {4, 4, vanilla_accelerator_conv2d_tile_4x4},
+    {8, 8, vanilla_accelerator_conv2d_tile_8x8},  {1, 16, vanilla_accelerator_conv2d_tile_1x16},
+};
+#define VA_CONV_NUM_TILES \
+  ((int)(sizeof(vanilla_accelerator_conv2d_tiles) / sizeof(vanilla_accelerator_conv2d_tiles[0])))
+
+typedef struct {
+  const float* ifmap;
+  const float* weights;
+  const float* bias;
+  float* result;
+  int n, oc, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw, dh, dw, groups;
+  int bn, bc, bh, bw, relu;
+  int oct, owt;
+  vanilla_accelerator_conv2d_tile_t tile_fn;
+  int octiles;
+  int bands;
+} vanilla_accelerator_conv2d_args_t;
+
+/* One task computes one oc tile of one group and image, over one band of output rows. */
+static void vanilla_accelerator_conv2d_task(void* ctx, int task) {
+  const vanilla_accelerator_conv2d_args_t* a = (const vanilla_accelerator_conv2d_args_t*)ctx;
+  int icg = a->ic / a->groups;
+  int ocg = a->oc / a->groups;
+  int band = task % a->bands;
+  int tile = (task / a->bands) % (a->groups * a->octiles);
+  int b = task / (a->bands * a->groups * a->octiles);
+  int g = tile / a->octiles;
+
+  // output channel tiles never straddle two groups
+  int oc0 = g * ocg + (tile % a->octiles) * a->oct;
+  int oc_tile = ((g + 1) * ocg - oc0 < a->oct) ? (g + 1) * ocg - oc0 : a->oct;
+  int rows = (a->oh + a->bands - 1) / a->bands;
+  int y1 = (band + 1) * rows < a->oh ? (band + 1) * rows : a->oh;
+
+  const float* in = a->ifmap + (b * a->ic + g * icg) * a->ih * a->iw;
+  const float* bs = a->bias ? a->bias + b * a->bn : NULL;
+  float* out = a->result + b * a->oc * a->oh * a->ow;
+  for (int y = band * rows; y < y1; ++y) {
+    for (int x0 = 0; x0 < a->ow; x0 += a->owt) {
+      int ow_tile = (a->ow - x0 < a->owt) ? a->ow - x0 : a->owt;
+      a->tile_fn(in, a->weights, bs, out, oc0, oc_tile, y, x0, ow_tile, a->ow, a->oh, icg, a->kh,
+                 a->kw, a->iw, a->ih, a->padh, a->padw, a->sh, a->sw, a->dh, a->dw, a->bc, a->bh,
+                 a->bw, a->relu);
+    }
+  }
+}
+
+static int vanilla_accelerator_conv2d_blocked(const float* ifmap, const float* weights,
+    const float* bias, float* result, int n, int oc, int ow, int oh, int ic, int kh, int kw,
+    int iw, int ih, int padh, int padw, int sh, int sw, int dh, int dw, int groups, int bn,
+    int bc, int bh, int bw, int relu, int tile, int nthreads) {
+  vanilla_accelerator_conv2d_args_t a;
+  a.ifmap = ifmap;
+  a.weights = weights;
+  a.bias = bias;
+  a.result = result;
+  a.n = n;
+  a.oc = oc;
+  a.ow = ow;
+  a.oh = oh;
+  a.ic = ic;
+  a.kh = kh;
+  a.kw = kw;
+  a.iw = iw;
+  a.ih = ih;
+  a.padh = padh;
+  a.padw = padw;
+  a.sh = sh;
+  a.sw = sw;
+  a.dh = dh;
+  a.dw = dw;
+  a.groups = groups;
+  a.bn = bn;
+  a.bc = bc;
+  a.bh = bh;
+  a.bw = bw;
+  a.relu = relu;
+  tile = (tile >= 0 && tile < VA_CONV_NUM_TILES) ? tile : 0;
+  a.oct = vanilla_accelerator_conv2d_tiles[tile].oc;
+  a.owt = vanilla_accelerator_conv2d_tiles[tile].ow;
+  a.tile_fn = vanilla_accelerator_conv2d_tiles[tile].fn;
+  a.octiles = (oc / groups + a.oct - 1) / a.oct;
+
+  // split output rows into bands when there are too few channel tiles to go around
+  int ntiles = n * groups * a.octiles;
+  a.bands = 1;
+  if (nthreads > 1 && ntiles < 4 * nthreads) {
+    a.bands = (4 * nthreads + ntiles - 1) / ntiles;
+    a.bands = a.bands < oh ? a.bands : oh;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, ntiles * a.bands, vanilla_accelerator_conv2d_task,
+                                   &a);
+  return 0;
+}
+
+/*!
+* \brief Cache-blocked Conv2D, datatype float, tiled over oc x ow so that partial sums stay in
+* registers. Padding is applied on the fly, so ifmap may either be the unpadded input
+* (padh/padw > 0) or an already padded one (padh = padw = 0).
+* \param n Batch size. \param oc Number of output channels. \param ow Width of output feature
+* map. \param oh Height of output feature map. \param ic Number of input channels (all
+* groups). \param kh Height of convolution kernels. \param kw Width of convolution kernels.
+* \param iw Width of ifmap. \param ih Height of ifmap. \param padh Top padding. \param padw
+* Left padding. \param sh, sw Strides. \param dh, dw Dilations. \param groups Number of
+* groups, weights are (oc, ic / groups, kh, kw); groups == ic == oc is a depthwise conv.
+* \param tile Index into vanilla_accelerator_conv2d_tiles, the oc x ow register tile shape.
+* \param nthreads Number of worker threads, output channel tiles and row bands are spread
+* over them.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_blocked(float* ifmap, float* weights, float* result, int n,
+    int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh,
+    int sw, int dh, int dw, int groups, int tile, int nthreads) {
+  return vanilla_accelerator_conv2d_blocked(ifmap, weights, NULL, result, n, oc, ow, oh, ic, kh,
+                                            kw, iw, ih, padh, padw, sh, sw, dh, dw, groups, 0, 0,
+                                            0, 0, 0, tile, nthreads);
+}
+
+/*!
+* \brief Cache-blocked Conv2D fused with a bias/residual add and optional relu. The add
+* operand is read as bias[b * bn + o * bc + y * bh + x * bw], so a per-channel bias uses
+* (0, 1, 0, 0) and a full residual uses (oc * oh * ow, oh * ow, ow, 1). The intermediate conv2d
+* output is never stored.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_bias(float* ifmap, float* weights, float* bias,
+    float* result, int n, int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh,
+    int padw, int sh, int sw, int dh, int dw, int groups, int bn, int bc, int bh, int bw, int relu,
+    int tile, int nthreads) {
+  return vanilla_accelerator_conv2d_blocked(ifmap, weights, bias, result, n, oc, ow, oh, ic, kh,
+                                            kw, iw, ih, padh, padw, sh, sw, dh, dw, groups, bn, bc,
+                                            bh, bw, relu, tile, nthreads);
+}
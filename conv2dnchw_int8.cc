@@ -0,0 +1,258 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdint.h>
+#include <stdlib.h>
+
+
+/*!
+* \brief int8 x int8 -> int32 counterpart of vanilla_accelerator_conv2d_tile, one
+* oc_tile x ow_tile block of one output row with int32 accumulators in registers. Taps falling
+* into the (padh, padw) border read zero. If bias is not NULL, the int32
+* bias[o * bc + y * bh + x * bw] is added (and relu applied) before the store. OCT x OWT is
+* the full tile shape, see vanilla_accelerator_conv2d_tiles.
+*/
+VA_CONV_INLINE void vanilla_accelerator_qconv2d_tile(const int8_t* ifmap, const int8_t* weights,
+    const int32_t* bias, int32_t* result, int oc0, int oc_tile, int y, int x0, int ow_tile,
+    int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh, int sw,
+    int dh, int dw, int bc, int bh, int bw, int relu, const int OCT, const int OWT) {
+  int32_t acc[VA_CONV_MAX_OC_TILE][VA_CONV_MAX_OW_TILE];
+  int wstride = ic * kh * kw;
+  int ix0 = x0 * sw - padw;
+  int interior = (ix0 >= 0) && (ix0 + (ow_tile - 1) * sw + (kw - 1) * dw < iw);
+
+  for (int o = 0; o < OCT; ++o) {
+    for (int x = 0; x < OWT; ++x) {
+      acc[o][x] = 0;
+    }
+  }
+
+  for (int c = 0; c < ic; ++c) {
+    for (int ky = 0; ky < kh; ++ky) {
+      int iy = y * sh + ky * dh - padh;
+      if (iy < 0 || iy >= ih) {
+        continue;
+      }
+      const int8_t* row = ifmap + c * iw * ih + iy * iw;
+      const int8_t* wrow = weights + oc0 * wstride + (c * kh + ky) * kw;
+
+      if (interior && oc_tile == OCT && ow_tile == OWT) {
+        for (int kx = 0; kx < kw; ++kx) {
+          const int8_t* in = row + ix0 + kx * dw;
+          for (int o = 0; o < OCT; ++o) {
+            int32_t wv = wrow[o * wstride + kx];
+            for (int x = 0; x < OWT; ++x) {
+              acc[o][x] += wv * (int32_t)in[x * sw];
+            }
+          }
+        }
+      } else if (interior) {
+        for (int kx = 0; kx < kw; ++kx) {
+          const int8_t* in = row + ix0 + kx * dw;
+          for (int o = 0; o < oc_tile; ++o) {
+            int32_t wv = wrow[o * wstride + kx];
+            for (int x = 0; x < ow_tile; ++x) {
+              acc[o][x] += wv * (int32_t)in[x * sw];
+            }
+          }
+        }
+      } else {
+        for (int kx = 0; kx < kw; ++kx) {
+          for (int o = 0; o < oc_tile; ++o) {
+            int32_t wv = wrow[o * wstride + kx];
+            for (int x = 0; x < ow_tile; ++x) {
+              int ix = ix0 + x * sw + kx * dw;
+              if (ix >= 0 && ix < iw) {
+                acc[o][x] += wv * (int32_t)row[ix];
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+
+  for (int o = 0; o < oc_tile; ++o) {
+    int32_t* out = result + (oc0 + o) * ow * oh + y * ow + x0;
+    if (bias) {
+      const int32_t* b = bias + (oc0 + o) * bc + y * bh + x0 * bw;
+      for (int x = 0; x < ow_tile; ++x) {
+        int32_t v = acc[o][x] + b[x * bw];
+        out[x] = (relu && v < 0) ? 0 : v;
+      }
+    } else {
+      for (int x = 0; x < ow_tile; ++x) {
+        out[x] = acc[o][x];
+      }
+    }
+  }
+}
+
+typedef void (*vanilla_accelerator_qconv2d_tile_t)(const int8_t* ifmap, const int8_t* weights,
+    const int32_t* bias, int32_t* result, int oc0, int oc_tile, int y, int x0, int ow_tile,
+    int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh, int sw,
+    int dh, int dw, int bc, int bh, int bw, int relu);
+
+#define VA_QCONV_TILE(OCT, OWT)                                                                \
+  static void vanilla_accelerator_qconv2d_tile_##OCT##x##OWT(const int8_t* ifmap,              \
+      const int8_t* weights, const int32_t* bias, int32_t* result, int oc0, int oc_tile,       \
+      int y, int x0, int ow_tile, int ow, int oh, int ic, int kh, int kw, int iw, int ih,      \
+      int padh, int padw, int sh, int sw, int dh, int dw, int bc, int bh, int bw, int relu) {  \
+    vanilla_accelerator_qconv2d_tile(ifmap, weights, bias, result, oc0, oc_tile, y, x0,        \
+                                     ow_tile, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw,  \
+                                     dh, dw, bc, bh, bw, relu, OCT, OWT);                      \
+  }
+
+VA_QCONV_TILE(4, 8)
+VA_QCONV_TILE(8, 4)
+VA_QCONV_TILE(2, 16)
+VA_QCONV_TILE(4, 4)
+VA_QCONV_TILE(8, 8)
+VA_QCONV_TILE(1, 16)
+
+/* same shapes, in the same order, as vanilla_accelerator_conv2d_tiles */
+static const vanilla_accelerator_qconv2d_tile_t vanilla_accelerator_qconv2d_tiles[] = {
+    vanilla_accelerator_qconv2d_tile_4x8, vanilla_accelerator_qconv2d_tile_8x4,
+    vanilla_accelerator_qconv2d_tile_2x16, vanilla_accelerator_qconv2d_tile_4x4,
+    vanilla_accelerator_qconv2d_tile_8x8, vanilla_accelerator_qconv2d_tile_1x16,
+};
+
+typedef struct {
+  const int8_t* ifmap;
+  const int8_t* weights;
+  const int32_t* bias;
+  int32_t* result;
+  int n, oc, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw, dh, dw, groups;
+  int bn, bc, bh, bw, relu;
+  int oct, owt;
+  vanilla_accelerator_qconv2d_tile_t tile_fn;
+  int octiles;
+  int bands;
+} vanilla_accelerator_qconv2d_args_t;
+
+/* One task computes one oc tile of one group and image, over one band of output rows. */
+static void vanilla_accelerator_qconv2d_task(void* ctx, int task) {
+  const vanilla_accelerator_qconv2d_args_t* a = (const vanilla_accelerator_qconv2d_args_t*)ctx;
+  int icg = a->ic / a->groups;
+  int ocg = a->oc / a->groups;
+  int band = task % a->bands;
+  int tile = (task / a->bands) % (a->groups * a->octiles);
+  int b = task / (a->bands * a->groups * a->octiles);
+  int g = tile / a->octiles;
+
+  int oc0 = g * ocg + (tile % a->octiles) * a->oct;
+  int oc_tile = ((g + 1) * ocg - oc0 < a->oct) ? (g + 1) * ocg - oc0 : a->oct;
+  int rows = (a->oh + a->bands - 1) / a->bands;
+  int y1 = (band + 1) * rows < a->oh ? (band + 1) * rows : a->oh;
+
+  const int8_t* in = a->ifmap + (b * a->ic + g * icg) * a->ih * a->iw;
+  const int32_t* bs = a->bias ? a->bias + b * a->bn : NULL;
+  int32_t* out = a->result + b * a->oc * a->oh * a->ow;
+  for (int y = band * rows; y < y1; ++y) {
+    for (int x0 = 0; x0 < a->ow; x0 += a->owt) {
+      int ow_tile = (a->ow - x0 < a->owt) ? a->ow - x0 : a->owt;
+      a->tile_fn(in, a->weights, bs, out, oc0, oc_tile, y, x0, ow_tile, a->ow, a->oh, icg, a->kh,
+                 a->kw, a->iw, a->ih, a->padh, a->padw, a->sh, a->sw, a->dh, a->dw, a->bc, a->bh,
+                 a->bw, a->relu);
+    }
+  }
+}
+
+static int vanilla_accelerator_qconv2d_blocked(const int8_t* ifmap, const int8_t* weights,
+    const int32_t* bias, int32_t* result, int n, int oc, int ow, int oh, int ic, int kh, int kw,
+    int iw, int ih, int padh, int padw, int sh, int sw, int dh, int dw, int groups, int bn,
+    int bc, int bh, int bw, int relu, int tile, int nthreads) {
+  vanilla_accelerator_qconv2d_args_t a;
+  a.ifmap = ifmap;
+  a.weights = weights;
+  a.bias = bias;
+  a.result = result;
+  a.n = n;
+  a.oc = oc;
+  a.ow = ow;
+  a.oh = oh;
+  a.ic = ic;
+  a.kh = kh;
+  a.kw = kw;
+  a.iw = iw;
+  a.ih = ih;
+  a.padh = padh;
+  a.padw = padw;
+  a.sh = sh;
+  a.sw = sw;
+  a.dh = dh;
+  a.dw = dw;
+  a.groups = groups;
+  a.bn = bn;
+  a.bc = bc;
+  a.bh = bh;
+  a.bw = bw;
+  a.relu = relu;
+  tile = (tile >= 0 && tile < VA_CONV_NUM_TILES) ? tile : 0;
+  a.oct = vanilla_accelerator_conv2d_tiles[tile].oc;
+  a.owt = vanilla_accelerator_conv2d_tiles[tile].ow;
+  a.tile_fn = vanilla_accelerator_qconv2d_tiles[tile];
+  a.octiles = (oc / groups + a.oct - 1) / a.oct;
+
+  int ntiles = n * groups * a.octiles;
+  a.bands = 1;
+  if (nthreads > 1 && ntiles < 4 * nthreads) {
+    a.bands = (4 * nthreads + ntiles - 1) / ntiles;
+    a.bands = a.bands < oh ? a.bands : oh;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, ntiles * a.bands, vanilla_accelerator_qconv2d_task,
+                                   &a);
+  return 0;
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Quantized Conv2D, int8 ifmap and weights, int32 result. Same arguments and blocking
+* as vanilla_accelerator_conv2dnchw_blocked; zero points are not handled here, they are the
+* separate correction terms of the canonicalized qnn.conv2d.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_int8(int8_t* ifmap, int8_t* weights, int32_t* result, int n,
+    int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh,
+    int sw, int dh, int dw, int groups, int tile, int nthreads) {
+  return vanilla_accelerator_qconv2d_blocked(ifmap, weights, NULL, result, n, oc, ow, oh, ic, kh,
+                                             kw, iw, ih, padh, padw, sh, sw, dh, dw, groups, 0, 0,
+                                             0, 0, 0, tile, nthreads);
+}
+
+/*!
+* \brief Quantized Conv2D fused with an int32 bias/residual add and optional relu, see
+* vanilla_accelerator_conv2dnchw_bias for the bias strides.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_int8_bias(int8_t* ifmap, int8_t* weights, int32_t* bias,
+    int32_t* result, int n, int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih,
+    int padh, int padw, int sh, int sw, int dh, int dw, int groups, int bn, int bc, int bh, int bw,
+    int relu, int tile, int nthreads) {
+  return vanilla_accelerator_qconv2d_blocked(ifmap, weights, bias, result, n, oc, ow, oh, ic, kh,
+                                             kw, iw, ih, padh, padw, sh, sw, dh, dw, groups, bn,
+                                             bc, bh, bw, relu, tile, nthreads);
+}
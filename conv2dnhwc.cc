@@ -0,0 +1,186 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdlib.h>
+
+/* output pixels x output channels of one register tile */
+#define VA_NHWC_X_TILE 4
+#define VA_NHWC_OC_TILE 16
+
+#if defined(__GNUC__)
+#define VA_NHWC_INLINE static inline __attribute__((always_inline))
+#else
+#define VA_NHWC_INLINE static inline
+#endif
+
+typedef struct {
+  const float* ifmap;
+  const float* weights;
+  const float* bias;
+  float* result;
+  int oc, ow, oh, ic, kh, kw, iw, ih, padh, padw, sh, sw, dh, dw;
+  int bn, bh, bw, bc, relu;
+} vanilla_accelerator_nhwc_args_t;
+
+/*!
+* \brief Register tile of xt output pixels x ot output channels of output row y, image b. NHWC
+* keeps the channels innermost in the input, HWIO weights and output, so the (kh, kw, ic)
+* reduction broadcasts one input value against a contiguous row of ot weights. Taps in the
+* padding border are skipped. Called with the constant full tile shape, or with the sizes of a
+* partial tile at the edges.
+*/
+VA_NHWC_INLINE void vanilla_accelerator_nhwc_tile(const vanilla_accelerator_nhwc_args_t* a,
+    int b, int y, int x0, int o0, const int xt, const int ot) {
+  float acc[VA_NHWC_X_TILE][VA_NHWC_OC_TILE];
+  for (int x = 0; x < xt; ++x) {
+    for (int o = 0; o < ot; ++o) {
+      acc[x][o] = 0.000000e+00f;
+    }
+  }
+  for (int ky = 0; ky < a->kh; ++ky) {
+    int iy = y * a->sh + ky * a->dh - a->padh;
+    if (iy < 0 || iy >= a->ih) {
+      continue;
+    }
+    const float* in_row = a->ifmap + ((size_t)b * a->ih + iy) * a->iw * a->ic;
+    for (int kx = 0; kx < a->kw; ++kx) {
+      const float* in_px[VA_NHWC_X_TILE];
+      int valid = 1;
+      for (int x = 0; x < xt; ++x) {
+        int ix = (x0 + x) * a->sw + kx * a->dw - a->padw;
+        in_px[x] = (ix >= 0 && ix < a->iw) ? in_row + ix * a->ic : NULL;
+        valid = valid && in_px[x] != NULL;
+      }
+      const float* w = a->weights + (size_t)(ky * a->kw + kx) * a->ic * a->oc + o0;
+      for (int i = 0; i < a->ic; ++i) {
+        const float* wrow = w + (size_t)i * a->oc;
+        for (int x = 0; x < xt; ++x) {
+          if (!valid && in_px[x] == NULL) {
+            continue;
+          }
+          float v = in_px[x][i];
+          for (int o = 0; o < ot; ++o) {
+            acc[x][o] += v * wrow[o];
+          }
+        }
+      }
+    }
+  }
+  for (int x = 0; x < xt; ++x) {
+    float* out = a->result + (((size_t)b * a->oh + y) * a->ow + x0 + x) * a->oc + o0;
+    if (a->bias) {
+      const float* bs = a->bias + b * a->bn + y * a->bh + (x0 + x) * a->bw + o0 * a->bc;
+      for (int o = 0; o < ot; ++o) {
+        float v = acc[x][o] + bs[o * a->bc];
+        out[o] = (a->relu && v < 0.000000e+00f) ? 0.000000e+00f : v;
+      }
+    } else {
+      for (int o = 0; o < ot; ++o) {
+        out[o] = acc[x][o];
+      }
+    }
+  }
+}
+
+/* One task computes one output row of one image. */
+static void vanilla_accelerator_nhwc_task(void* ctx, int task) {
+  const vanilla_accelerator_nhwc_args_t* a = (const vanilla_accelerator_nhwc_args_t*)ctx;
+  int b = task / a->oh;
+  int y = task % a->oh;
+  for (int x0 = 0; x0 < a->ow; x0 += VA_NHWC_X_TILE) {
+    int xt = a->ow - x0 < VA_NHWC_X_TILE ? a->ow - x0 : VA_NHWC_X_TILE;
+    for (int o0 = 0; o0 < a->oc; o0 += VA_NHWC_OC_TILE) {
+      int ot = a->oc - o0 < VA_NHWC_OC_TILE ? a->oc - o0 : VA_NHWC_OC_TILE;
+      if (xt == VA_NHWC_X_TILE && ot == VA_NHWC_OC_TILE) {
+        vanilla_accelerator_nhwc_tile(a, b, y, x0, o0, VA_NHWC_X_TILE, VA_NHWC_OC_TILE);
+      } else {
+        vanilla_accelerator_nhwc_tile(a, b, y, x0, o0, xt, ot);
+      }
+    }
+  }
+}
+
+static int vanilla_accelerator_conv2d_nhwc(const float* ifmap, const float* weights,
+    const float* bias, float* result, int n, int oc, int ow, int oh, int ic, int kh, int kw,
+    int iw, int ih, int padh, int padw, int sh, int sw, int dh, int dw, int bn, int bh, int bw,
+    int bc, int relu, int nthreads) {
+  vanilla_accelerator_nhwc_args_t a;
+  a.ifmap = ifmap;
+  a.weights = weights;
+  a.bias = bias;
+  a.result = result;
+  a.oc = oc;
+  a.ow = ow;
+  a.oh = oh;
+  a.ic = ic;
+  a.kh = kh;
+  a.kw = kw;
+  a.iw = iw;
+  a.ih = ih;
+  a.padh = padh;
+  a.padw = padw;
+  a.sh = sh;
+  a.sw = sw;
+  a.dh = dh;
+  a.dw = dw;
+  a.bn = bn;
+  a.bh = bh;
+  a.bw = bw;
+  a.bc = bc;
+  a.relu = relu;
+
+  vanilla_accelerator_parallel_for(nthreads, n * oh, vanilla_accelerator_nhwc_task, &a);
+  return 0;
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Register-tiled Conv2D on NHWC data with HWIO weights, datatype float, ungrouped.
+* Padding is applied on the fly, the parameters are those of
+* vanilla_accelerator_conv2dnchw_blocked: ifmap is (n, ih, iw, ic), weights are
+* (kh, kw, ic, oc) and result is (n, oh, ow, oc). Output rows are spread over nthreads threads.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnhwc_blocked(float* ifmap, float* weights, float* result, int n,
+    int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh, int padw, int sh,
+    int sw, int dh, int dw, int nthreads) {
+  return vanilla_accelerator_conv2d_nhwc(ifmap, weights, NULL, result, n, oc, ow, oh, ic, kh, kw,
+                                         iw, ih, padh, padw, sh, sw, dh, dw, 0, 0, 0, 0, 0,
+                                         nthreads);
+}
+
+/*!
+* \brief NHWC Conv2D fused with a bias/residual add and optional relu. The add operand is read
+* as bias[b * bn + y * bh + x * bw + o * bc], so a per-channel bias uses (0, 0, 0, 1).
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnhwc_bias(float* ifmap, float* weights, float* bias,
+    float* result, int n, int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh,
+    int padw, int sh, int sw, int dh, int dw, int bn, int bh, int bw, int bc, int relu,
+    int nthreads) {
+  return vanilla_accelerator_conv2d_nhwc(ifmap, weights, bias, result, n, oc, ow, oh, ic, kh, kw,
+                                         iw, ih, padh, padw, sh, sw, dh, dw, bn, bh, bw, bc, relu,
+                                         nthreads);
+}
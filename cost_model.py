@@ -0,0 +1,179 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Analytic cost model deciding which matched patterns are worth offloading"""
+
+import json
+import statistics
+
+import numpy as np
+import tvm
+from tvm import relay
+from tvm.relay import dataflow_pattern as dfp
+
+
+def _elems(ty) -> int:
+    return int(np.prod([int(d) for d in ty.shape]))
+
+
+def _bytes(ty) -> int:
+    return _elems(ty) * tvm.DataType(ty.dtype).bits // 8
+
+
+def _flops(call) -> int:
+    """
+    Arithmetic operations of one Relay call, multiply-adds count twice
+    """
+    out = _elems(call.checked_type)
+    op  = call.op.name
+    if op in ("nn.conv2d", "qnn.conv2d"):
+        layout = str(call.attrs.kernel_layout) or "OIHW"
+        kernel = dict(zip(layout, [int(d) for d in call.args[1].checked_type.shape]))
+        return 2 * out * kernel["I"] * kernel["H"] * kernel["W"]
+    if op in ("nn.max_pool2d", "nn.avg_pool2d"):
+        return out * int(np.prod([int(k) for k in call.attrs.pool_size]))
+    if op in ("nn.dense", "qnn.dense"):
+        return 2 * out * int(call.args[1].checked_type.shape[-1])
+    return out
+
+
+def _matched_calls(pattern, expr) -> list:
+    """
+    Operator calls of `expr` that are part of the match of `pattern`, the match stops at the
+    arguments the pattern's wildcards and constants bind
+    """
+    if isinstance(pattern, dfp.AltPattern):
+        for alt in (pattern.left, pattern.right):
+            if alt.match(expr):
+                return _matched_calls(alt, expr)
+        return []
+    if isinstance(pattern, (dfp.AttrPattern, dfp.TypePattern, dfp.DataTypePattern,
+                            dfp.ShapePattern)):
+        return _matched_calls(pattern.pattern, expr)
+    if isinstance(pattern, dfp.CallPattern) and isinstance(expr, relay.Call) and \
+            isinstance(expr.op, tvm.ir.Op):
+        calls = [expr]
+        for (arg_pattern, arg) in zip(pattern.args, expr.args):
+            calls.extend(_matched_calls(arg_pattern, arg))
+        return calls
+    return []
+
+
+def workload(pattern, expr):
+    """
+    (flops, bytes crossing the partition boundary, output shape) of `pattern` matched at
+    `expr`. Intermediates inside the pattern never leave the accelerator, the graph upstream
+    of its arguments is not part of it.
+    """
+    calls  = _matched_calls(pattern, expr)
+    inner  = set(calls)
+    flops  = sum(_flops(c) for c in calls)
+    nbytes = _bytes(expr.checked_type)
+    for call in calls:
+        for arg in call.args:
+            if arg not in inner:
+                nbytes += _bytes(arg.checked_type)
+    return (flops, nbytes, [int(d) for d in expr.checked_type.shape])
+
+
+class CostModel:
+    """
+    Roofline estimate of a pattern on the host and on the accelerator. The accelerator also
+    pays a fixed call overhead and the transfer of its operands and result over the link.
+    Defaults are analytic, `calibrate` fits the throughputs to bench_kernels.py results.
+    """
+
+    def __init__(self, host_gflops=2.0, host_gbps=10.0, accel_gflops=16.0, accel_gbps=20.0,
+                 link_gbps=8.0, call_overhead_us=2.0):
+        self.host_gflops      = host_gflops
+        self.host_gbps        = host_gbps
+        self.accel_gflops     = accel_gflops
+        self.accel_gbps       = accel_gbps
+        self.link_gbps        = link_gbps
+        self.call_overhead_us = call_overhead_us
+        self.decisions        = []
+
+    @classmethod
+    def calibrated(cls, path, **kwargs):
+        """
+        Model with the compute and memory throughputs measured by bench_kernels.py: conv2d
+        entries give GFLOP/s, add entries GB/s, on the accelerator kernels and the host-C
+        lowering alike
+        """
+        with open(path) as f:
+            results = json.load(f)["results"]
+        model = cls(**kwargs)
+        conv  = [r for r in results if r["kernel"] == "conv2d"]
+        add   = [r for r in results if r["kernel"] == "add"]
+        if conv:
+            model.accel_gflops = statistics.median(r["gflops"] for r in conv)
+            host = [r["host_c_gflops"] for r in conv if "host_c_gflops" in r]
+            model.host_gflops = statistics.median(host) if host else model.host_gflops
+        if add:
+            model.accel_gbps = statistics.median(r["gbps"] for r in add)
+            host = [r["gbps"] * r["time_us"] / r["host_c_time_us"] for r in add
+                    if "host_c_time_us" in r]
+            model.host_gbps = statistics.median(host) if host else model.host_gbps
+        return model
+
+    def host_us(self, flops, nbytes) -> float:
+        return max(flops / self.host_gflops, nbytes / self.host_gbps) * 1e-3
+
+    def accel_us(self, flops, nbytes) -> float:
+        compute  = max(flops / self.accel_gflops, nbytes / self.accel_gbps) * 1e-3
+        transfer = nbytes / self.link_gbps * 1e-3
+        return self.call_overhead_us + compute + transfer
+
+    def decide(self, name, pattern, expr) -> bool:
+        """
+        Offload the pattern `name` matched at `expr` if the accelerator is predicted to be
+        faster, recording the decision
+        """
+        try:
+            (flops, nbytes, shape) = workload(pattern, expr)
+        except (ValueError, AttributeError, tvm.TVMError):
+            # untyped expression, keep the unconditional offload
+            return True
+        host  = self.host_us(flops, nbytes)
+        accel = self.accel_us(flops, nbytes)
+        self.decisions.append({
+            "pattern": name,
+            "shape": shape,
+            "flops": flops,
+            "bytes": nbytes,
+            "host_us": host,
+            "accel_us": accel,
+            "offload": accel < host,
+            "savings_us": host - accel,
+        })
+        return accel < host
+
+    def predicate(self, name, pattern):
+        return lambda expr: self.decide(name, pattern, expr)
+
+    def report(self) -> str:
+        lines = [f"{'pattern':<14} {'shape':<20} {'host[us]':>10} {'accel[us]':>10} "
+                 f"{'offload':>8} {'saved[us]':>10}"]
+        for d in self.decisions:
+            shape = "x".join(str(x) for x in d["shape"])
+            lines.append(f"{d['pattern']:<14} {shape:<20} {d['host_us']:>10.2f} "
+                         f"{d['accel_us']:>10.2f} {str(d['offload']):>8} "
+                         f"{max(d['savings_us'], 0.0):>10.2f}")
+        offloaded = [d for d in self.decisions if d["offload"]]
+        saved     = sum(d["savings_us"] for d in offloaded)
+        lines.append(f"{len(offloaded)}/{len(self.decisions)} offloaded, "
+                     f"{saved:.2f} us predicted savings")
+        return "\n".join(lines)
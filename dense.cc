@@ -0,0 +1,137 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdlib.h>
+#include <stdio.h>
+
+#define VA_DENSE_MR 4
+#define VA_DENSE_NR 4
+#define VA_DENSE_KL 4
+#define VA_DENSE_NB 64
+
+/*!
+* \brief Micro-kernel computing an mr x nr block of result = data * weight^T. Every dot
+* product is split over VA_DENSE_KL independent partial sums so the inner loop vectorizes
+* without reassociating float additions. If bias is not NULL, bias[i * bm + j * bn] is added
+* (and relu applied) before the store.
+*/
+static void vanilla_accelerator_dense_tile(const float* data, const float* weight,
+    const float* bias, float* result, int i0, int mr, int j0, int nr, int n, int k, int bm,
+    int bn, int relu) {
+  float acc[VA_DENSE_MR][VA_DENSE_NR][VA_DENSE_KL];
+  int kmain = k - k % VA_DENSE_KL;
+
+  for (int i = 0; i < VA_DENSE_MR; ++i) {
+    for (int j = 0; j < VA_DENSE_NR; ++j) {
+      for (int l = 0; l < VA_DENSE_KL; ++l) {
+        acc[i][j][l] = 0.000000e+00f;
+      }
+    }
+  }
+
+  if (mr == VA_DENSE_MR && nr == VA_DENSE_NR) {
+    for (int kk = 0; kk < kmain; kk += VA_DENSE_KL) {
+      for (int i = 0; i < VA_DENSE_MR; ++i) {
+        const float* a = data + (i0 + i) * k + kk;
+        for (int j = 0; j < VA_DENSE_NR; ++j) {
+          const float* b = weight + (j0 + j) * k + kk;
+          for (int l = 0; l < VA_DENSE_KL; ++l) {
+            acc[i][j][l] += a[l] * b[l];
+          }
+        }
+      }
+    }
+  } else {
+    for (int kk = 0; kk < kmain; kk += VA_DENSE_KL) {
+      for (int i = 0; i < mr; ++i) {
+        const float* a = data + (i0 + i) * k + kk;
+        for (int j = 0; j < nr; ++j) {
+          const float* b = weight + (j0 + j) * k + kk;
+          for (int l = 0; l < VA_DENSE_KL; ++l) {
+            acc[i][j][l] += a[l] * b[l];
+          }
+        }
+      }
+    }
+  }
+
+  for (int i = 0; i < mr; ++i) {
+    const float* a = data + (i0 + i) * k;
+    for (int j = 0; j < nr; ++j) {
+      const float* b = weight + (j0 + j) * k;
+      float sum = 0.000000e+00f;
+      for (int l = 0; l < VA_DENSE_KL; ++l) {
+        sum += acc[i][j][l];
+      }
+      for (int kk = kmain; kk < k; ++kk) {
+        sum += a[kk] * b[kk];
+      }
+      if (bias) {
+        sum += bias[(i0 + i) * bm + (j0 + j) * bn];
+        if (relu && sum < 0.000000e+00f) {
+          sum = 0.000000e+00f;
+        }
+      }
+      result[(i0 + i) * n + j0 + j] = sum;
+    }
+  }
+}
+
+static int vanilla_accelerator_dense_blocked(const float* data, const float* weight,
+    const float* bias, float* result, int m, int n, int k, int bm, int bn, int relu) {
+  // weight rows of one column block stay cache resident while all rows of data stream by
+  for (int jb = 0; jb < n; jb += VA_DENSE_NB) {
+    int jend = (n - jb < VA_DENSE_NB) ? n : jb + VA_DENSE_NB;
+    for (int i0 = 0; i0 < m; i0 += VA_DENSE_MR) {
+      int mr = (m - i0 < VA_DENSE_MR) ? m - i0 : VA_DENSE_MR;
+      for (int j0 = jb; j0 < jend; j0 += VA_DENSE_NR) {
+        int nr = (jend - j0 < VA_DENSE_NR) ? jend - j0 : VA_DENSE_NR;
+        vanilla_accelerator_dense_tile(data, weight, bias, result, i0, mr, j0, nr, n, k, bm, bn,
+                                       relu);
+      }
+    }
+  }
+
+  return 0;
+}
+
+/*!
+* \brief Dense (fully-connected) layer, result = data * weight^T, datatype float.
+* \param data Pointer to input data of size m*k*sizeof(float). \param weight Pointer to weight
+* data of size n*k*sizeof(float). \param result Pointer to output data of size
+* m*n*sizeof(float). \param m Number of rows of data (batch). \param n Number of output units.
+* \param k Number of input units.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_dense(float* data, float* weight, float* result, int m, int n, int k) {
+  return vanilla_accelerator_dense_blocked(data, weight, NULL, result, m, n, k, 0, 0, 0);
+}
+
+/*!
+* \brief Dense layer fused with a bias add and optional relu. The bias is read as
+* bias[i * bm + j * bn], so a (n,) bias uses (0, 1).
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_dense_bias(float* data, float* weight, float* bias, float* result, int m,
+    int n, int k, int bm, int bn, int relu) {
+  return vanilla_accelerator_dense_blocked(data, weight, bias, result, m, n, k, bm, bn, relu);
+}
@@ -0,0 +1,150 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Build once, run many: in-process AOT execution of (partitioned) models"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import tvm
+from tvm import relay
+from tvm.relay.backend import Executor, Runtime
+
+import codegen
+import pass_cache
+
+pass_config = {"tir.disable_vectorize": True}
+# Python modules deciding the partitioning, the lowering and the generated code
+python_sources = ["deploy.py", "backend.py", "patterns.py", "relay_passes.py", "strategies.py",
+                  "codegen.py", "cost_model.py"] + pass_cache.lowering_sources
+export_options = ["-O2", "-pthread"]
+
+# compiled models reused across runs, see `build_and_load`
+default_cache_dir = os.environ.get(
+    "VANILLA_ACCELERATOR_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "vanilla_accelerator")
+)
+
+
+def get_targets(uma_backend=None):
+    target_c = tvm.target.Target("c")
+    targets  = [target_c]
+    if uma_backend is not None:
+        targets.append(tvm.target.Target(uma_backend.target_name, host=target_c))
+    return targets
+
+
+def build(mod, params=None, uma_backend=None):
+    """
+    Build `mod` with the AOT executor for the C host target. If `uma_backend` is
+    given the params are bound, the model is partitioned and the matched operators are
+    offloaded.
+    """
+    targets = get_targets(uma_backend)
+    if uma_backend is not None:
+        if params:
+            # the weights are constants while partitioning, so the backend can transform them
+            # once here, e.g. for the Winograd kernels
+            mod    = tvm.IRModule.from_expr(
+                relay.build_module.bind_params_by_name(mod["main"], params))
+            params = None
+        mod = uma_backend.partition(mod)
+
+    executor = Executor("aot", {"interface-api": "packed", "unpacked-api": False})
+    with tvm.transform.PassContext(opt_level=3, config=pass_config):
+        return relay.build(mod, target=targets, params=params, executor=executor, runtime=Runtime("cpp"))
+
+
+def load(factory, directory=None):
+    """
+    Compile the generated sources of `factory` into a shared library and
+    return an AotModule to set_input/run/get_output on
+    """
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="vanilla_accelerator_")
+    path = os.path.join(directory, "model.so")
+    factory.export_library(path, options=export_options)
+    return load_library(path)
+
+
+def load_library(path):
+    lib = tvm.runtime.load_module(path)
+    return tvm.runtime.executor.AotModule(lib["default"](tvm.cpu()))
+
+
+def cache_key(mod, params=None, uma_backend=None) -> str:
+    """
+    Content hash of everything the compiled model depends on: the Relay module, the params,
+    the targets with their attributes and tuning logs, the offload cost model and layout, the
+    pass config, the compiler options, the backend's Python and kernel sources and the TVM
+    version
+    """
+    h = hashlib.sha256()
+    h.update(tvm.ir.save_json(mod).encode())
+    for name in sorted(params or {}):
+        value = params[name]
+        value = value.numpy() if hasattr(value, "numpy") else np.asarray(value)
+        h.update(name.encode())
+        h.update(str((value.dtype, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    for target in get_targets(uma_backend):
+        h.update(str(target.export()).encode())
+        # the tuned kernel parameters are read from the log while lowering
+        h.update(pass_cache.file_digest(target.attrs.get("tuning_log", "")).encode())
+    cost_model = getattr(uma_backend, "cost_model", None)
+    if cost_model is not None:
+        # the partitioning depends on the model's parameters
+        h.update(str(sorted((k, v) for k, v in vars(cost_model).items() if k != "decisions")).encode())
+    h.update(str(getattr(uma_backend, "layout", None)).encode())
+    h.update(str(getattr(uma_backend, "winograd", None)).encode())
+    h.update(str(sorted(pass_config.items())).encode())
+    h.update(str(export_options).encode())
+    topdir = os.path.dirname(os.path.abspath(codegen.__file__))
+    for src in codegen.kernel_sources:
+        with open(os.path.join(topdir, src), "rb") as f:
+            h.update(src.encode())
+            h.update(f.read())
+    h.update(pass_cache.sources_digest(python_sources).encode())
+    h.update(tvm.__version__.encode())
+    return h.hexdigest()
+
+
+def build_and_load(mod, params=None, uma_backend=None, cache_dir=default_cache_dir):
+    """
+    `load(build(mod, params, uma_backend))`, reusing the library compiled by an earlier run
+    with the same `cache_key` from `cache_dir`. Returns (AotModule, cache hit).
+    """
+    if cache_dir is None:
+        return (load(build(mod, params, uma_backend)), False)
+
+    entry = os.path.join(cache_dir, cache_key(mod, params, uma_backend))
+    path  = os.path.join(entry, "model.so")
+    if os.path.exists(path):
+        return (load_library(path), True)
+
+    # export next to the entry, then rename so concurrent runs never load a partial library
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix="tmp_", dir=cache_dir)
+    factory = build(mod, params, uma_backend)
+    factory.export_library(os.path.join(staging, "model.so"), options=export_options)
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # another run stored the same model first
+        shutil.rmtree(staging, ignore_errors=True)
+    return (load_library(path), False)
@@ -0,0 +1,339 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <math.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+#define VA_ELTWISE_CHUNK 16384
+
+/*!
+* \brief Float elementwise kernels offloaded through the pass_injective.eltwise_ops registry:
+* binary subtract / multiply / maximum (same shape and strided broadcast, as the add kernels in
+* gzadd.cc) and unary relu / clip. Like the add rows, the unstrided cases run vectors of
+* VA_ELTWISE_LANES floats on restrict-qualified pointers, with scalar loops up to the first
+* aligned output and for the remainder.
+*/
+typedef void (*vanilla_accelerator_binary_row_t)(const float* in1, const float* in2,
+                                                 float* result, int n, int t1, int t2);
+
+#if defined(__GNUC__)
+/* one native register: lane selects split over narrower registers cost more than they save */
+#if defined(__AVX__)
+#define VA_ELTWISE_LANES 8
+#else
+#define VA_ELTWISE_LANES 4
+#endif
+typedef float vanilla_accelerator_eltwise_f32_t
+    __attribute__((vector_size(VA_ELTWISE_LANES * sizeof(float)), __may_alias__));
+/* unaligned loads */
+typedef float vanilla_accelerator_eltwise_f32_u
+    __attribute__((vector_size(VA_ELTWISE_LANES * sizeof(float)), __may_alias__,
+                   aligned(sizeof(float))));
+/* lane masks of vector comparisons */
+typedef int32_t vanilla_accelerator_eltwise_mask_t
+    __attribute__((vector_size(VA_ELTWISE_LANES * sizeof(int32_t))));
+
+/* m ? x : y per lane */
+#define VA_ELTWISE_SELECT(m, x, y)                                                             \
+  ((vanilla_accelerator_eltwise_f32_t)(((m) & (vanilla_accelerator_eltwise_mask_t)(x)) |        \
+                                       (~(m) & (vanilla_accelerator_eltwise_mask_t)(y))))
+#define VA_ELTWISE_LOAD(p) (*(const vanilla_accelerator_eltwise_f32_u*)(p))
+/* subtracting keeps the sign of a broadcast -0.0f */
+#define VA_ELTWISE_BROADCAST(s) ((s) - (vanilla_accelerator_eltwise_f32_t){0})
+#define VA_ELTWISE_VECTOR_LOOP(LOADX, LOADY, VEXPR)                                            \
+  for ( ; j + VA_ELTWISE_LANES <= n; j += VA_ELTWISE_LANES ) {                                 \
+    vanilla_accelerator_eltwise_f32_t x = (LOADX);                                             \
+    vanilla_accelerator_eltwise_f32_t y = (LOADY);                                             \
+    *(vanilla_accelerator_eltwise_f32_t*)(result + j) = (VEXPR);                               \
+  }
+#define VA_ELTWISE_UNALIGNED(p) ((uintptr_t)(p) % (VA_ELTWISE_LANES * sizeof(float)) != 0)
+#else
+#define VA_ELTWISE_VECTOR_LOOP(LOADX, LOADY, VEXPR)
+#define VA_ELTWISE_UNALIGNED(p) 0
+#endif
+
+/* EXPR of the floats x and y, VEXPR the same of two vectors */
+#define VA_ELTWISE_BINARY_ROW(NAME, EXPR, VEXPR)                                               \
+  static void NAME(const float* a, const float* b, float* r, int n, int t1, int t2) {          \
+    const float* __restrict in1 = a;                                                           \
+    const float* __restrict in2 = b;                                                           \
+    float* __restrict result = r;                                                              \
+    int j = 0;                                                                                 \
+    if (t1 == 1 && t2 == 1) {                                                                  \
+      for ( ; j < n && VA_ELTWISE_UNALIGNED(result + j); j++ ) {                               \
+        float x = in1[j];                                                                      \
+        float y = in2[j];                                                                      \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+      VA_ELTWISE_VECTOR_LOOP(VA_ELTWISE_LOAD(in1 + j), VA_ELTWISE_LOAD(in2 + j), VEXPR)        \
+      for ( ; j < n; j++ ) {                                                                   \
+        float x = in1[j];                                                                      \
+        float y = in2[j];                                                                      \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+    } else if (t1 == 1) {                                                                      \
+      const float yb = in2[0];                                                                 \
+      for ( ; j < n && VA_ELTWISE_UNALIGNED(result + j); j++ ) {                               \
+        float x = in1[j];                                                                      \
+        float y = yb;                                                                          \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+      VA_ELTWISE_VECTOR_LOOP(VA_ELTWISE_LOAD(in1 + j), VA_ELTWISE_BROADCAST(yb), VEXPR)        \
+      for ( ; j < n; j++ ) {                                                                   \
+        float x = in1[j];                                                                      \
+        float y = yb;                                                                          \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+    } else if (t2 == 1) {                                                                      \
+      const float xb = in1[0];                                                                 \
+      for ( ; j < n && VA_ELTWISE_UNALIGNED(result + j); j++ ) {                               \
+        float x = xb;                                                                          \
+        float y = in2[j];                                                                      \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+      VA_ELTWISE_VECTOR_LOOP(VA_ELTWISE_BROADCAST(xb), VA_ELTWISE_LOAD(in2 + j), VEXPR)        \
+      for ( ; j < n; j++ ) {                                                                   \
+        float x = xb;                                                                          \
+        float y = in2[j];                                                                      \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+    } else {                                                                                   \
+      for ( ; j < n; j++ ) {                                                                   \
+        float x = in1[j * t1];                                                                 \
+        float y = in2[j * t2];                                                                 \
+        result[j] = (EXPR);                                                                    \
+      }                                                                                        \
+    }                                                                                          \
+  }
+
+VA_ELTWISE_BINARY_ROW(vanilla_accelerator_sub_row, x - y, x - y)
+VA_ELTWISE_BINARY_ROW(vanilla_accelerator_mul_row, x * y, x * y)
+VA_ELTWISE_BINARY_ROW(vanilla_accelerator_max_row, x > y ? x : y,
+                      VA_ELTWISE_SELECT(x > y, x, y))
+
+typedef struct {
+  const float* in1;
+  const float* in2;
+  float* result;
+  vanilla_accelerator_binary_row_t row;
+  int d[4];
+  int s1[4];
+  int s2[4];
+  int rows;
+  int chunk;
+  float lo;
+  float hi;
+} vanilla_accelerator_eltwise_args_t;
+
+/* chunk of a same-shape binary op, d[3] is the total length */
+static void vanilla_accelerator_binary_task(void* ctx, int task) {
+  const vanilla_accelerator_eltwise_args_t* a = (const vanilla_accelerator_eltwise_args_t*)ctx;
+  int begin = task * a->chunk;
+  int end = (task + 1) * a->chunk < a->d[3] ? (task + 1) * a->chunk : a->d[3];
+  a->row(a->in1 + begin, a->in2 + begin, a->result + begin, end - begin, 1, 1);
+}
+
+/* chunk of rows of a broadcasting binary op, see vanilla_accelerator_addvec_strided_task */
+static void vanilla_accelerator_binary_strided_task(void* ctx, int task) {
+  const vanilla_accelerator_eltwise_args_t* a = (const vanilla_accelerator_eltwise_args_t*)ctx;
+  int n = a->d[3];
+  int end = (task + 1) * a->chunk < a->rows ? (task + 1) * a->chunk : a->rows;
+  int i2 = (task * a->chunk) % a->d[2];
+  int i1 = (task * a->chunk / a->d[2]) % a->d[1];
+  int i0 = task * a->chunk / (a->d[2] * a->d[1]);
+  for (int r = task * a->chunk; r < end; r++) {
+    int o1 = i0 * a->s1[0] + i1 * a->s1[1] + i2 * a->s1[2];
+    int o2 = i0 * a->s2[0] + i1 * a->s2[1] + i2 * a->s2[2];
+    a->row(a->in1 + o1, a->in2 + o2, a->result + r * n, n, a->s1[3], a->s2[3]);
+    if (++i2 == a->d[2]) {
+      i2 = 0;
+      if (++i1 == a->d[1]) {
+        i1 = 0;
+        ++i0;
+      }
+    }
+  }
+}
+
+static int vanilla_accelerator_binary_run(const float* in1, const float* in2, float* result,
+    vanilla_accelerator_binary_row_t row, int w, int nthreads) {
+  vanilla_accelerator_eltwise_args_t a;
+  a.in1    = in1;
+  a.in2    = in2;
+  a.result = result;
+  a.row    = row;
+  a.d[3]   = w;
+  a.chunk  = VA_ELTWISE_CHUNK;
+  if (nthreads <= 1 || w < 2 * VA_ELTWISE_CHUNK) {
+    a.chunk = w;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (w + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_binary_task, &a);
+  return 0;
+}
+
+static int vanilla_accelerator_binary_strided_run(const float* in1, const float* in2,
+    float* result, vanilla_accelerator_binary_row_t row, const int* d, const int* s1,
+    const int* s2, int nthreads) {
+  vanilla_accelerator_eltwise_args_t a;
+  a.in1    = in1;
+  a.in2    = in2;
+  a.result = result;
+  a.row    = row;
+  for (int i = 0; i < 4; i++) {
+    a.d[i]  = d[i];
+    a.s1[i] = s1[i];
+    a.s2[i] = s2[i];
+  }
+  a.rows   = d[0] * d[1] * d[2];
+  a.chunk  = (VA_ELTWISE_CHUNK + d[3] - 1) / d[3];
+  if (nthreads <= 1 || a.rows * d[3] < 2 * VA_ELTWISE_CHUNK) {
+    a.chunk = a.rows;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (a.rows + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_binary_strided_task, &a);
+  return 0;
+}
+
+/* clip(x, lo, hi); relu is clip(x, 0, inf) */
+static void vanilla_accelerator_clip_task(void* ctx, int task) {
+  const vanilla_accelerator_eltwise_args_t* a = (const vanilla_accelerator_eltwise_args_t*)ctx;
+  int begin = task * a->chunk;
+  int n = ((task + 1) * a->chunk < a->d[3] ? (task + 1) * a->chunk : a->d[3]) - begin;
+  const float* __restrict in = a->in1 + begin;
+  float* __restrict result = a->result + begin;
+  const float lo = a->lo;
+  const float hi = a->hi;
+  int j = 0;
+  for ( ; j < n && VA_ELTWISE_UNALIGNED(result + j); j++ ) {
+    float x = in[j];
+    x = x < hi ? x : hi;
+    result[j] = x > lo ? x : lo;
+  }
+#if defined(__GNUC__)
+  const vanilla_accelerator_eltwise_f32_t lov = VA_ELTWISE_BROADCAST(lo);
+  const vanilla_accelerator_eltwise_f32_t hiv = VA_ELTWISE_BROADCAST(hi);
+  for ( ; j + VA_ELTWISE_LANES <= n; j += VA_ELTWISE_LANES ) {
+    vanilla_accelerator_eltwise_f32_t x = VA_ELTWISE_LOAD(in + j);
+    x = VA_ELTWISE_SELECT(x < hiv, x, hiv);
+    *(vanilla_accelerator_eltwise_f32_t*)(result + j) =
+        VA_ELTWISE_SELECT(x > lov, x, lov);
+  }
+#endif
+  for ( ; j < n; j++ ) {
+    float x = in[j];
+    x = x < hi ? x : hi;
+    result[j] = x > lo ? x : lo;
+  }
+}
+
+static int vanilla_accelerator_clip_run(const float* in, float* result, int w, float lo,
+    float hi, int nthreads) {
+  vanilla_accelerator_eltwise_args_t a;
+  a.in1    = in;
+  a.result = result;
+  a.d[3]   = w;
+  a.lo     = lo;
+  a.hi     = hi;
+  a.chunk  = VA_ELTWISE_CHUNK;
+  if (nthreads <= 1 || w < 2 * VA_ELTWISE_CHUNK) {
+    a.chunk = w;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (w + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_clip_task, &a);
+  return 0;
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief result = in1 - in2 over w elements.
+*/
+int vanilla_accelerator_subvec(float* in1, float* in2, float* result, int w, int nthreads) {
+  return vanilla_accelerator_binary_run(in1, in2, result, vanilla_accelerator_sub_row, w,
+                                        nthreads);
+}
+
+/*!
+* \brief result = in1 - in2 with broadcasting, arguments as vanilla_accelerator_addvec_strided.
+*/
+int vanilla_accelerator_subvec_strided(float* in1, float* in2, float* result, int d0, int d1,
+    int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22, int s23,
+    int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_binary_strided_run(in1, in2, result, vanilla_accelerator_sub_row, d,
+                                                s1, s2, nthreads);
+}
+
+/*!
+* \brief result = in1 * in2 over w elements.
+*/
+int vanilla_accelerator_mulvec(float* in1, float* in2, float* result, int w, int nthreads) {
+  return vanilla_accelerator_binary_run(in1, in2, result, vanilla_accelerator_mul_row, w,
+                                        nthreads);
+}
+
+int vanilla_accelerator_mulvec_strided(float* in1, float* in2, float* result, int d0, int d1,
+    int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22, int s23,
+    int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_binary_strided_run(in1, in2, result, vanilla_accelerator_mul_row, d,
+                                                s1, s2, nthreads);
+}
+
+/*!
+* \brief result = max(in1, in2) over w elements.
+*/
+int vanilla_accelerator_maxvec(float* in1, float* in2, float* result, int w, int nthreads) {
+  return vanilla_accelerator_binary_run(in1, in2, result, vanilla_accelerator_max_row, w,
+                                        nthreads);
+}
+
+int vanilla_accelerator_maxvec_strided(float* in1, float* in2, float* result, int d0, int d1,
+    int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22, int s23,
+    int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_binary_strided_run(in1, in2, result, vanilla_accelerator_max_row, d,
+                                                s1, s2, nthreads);
+}
+
+/*!
+* \brief result = max(in, 0) over w elements.
+*/
+int vanilla_accelerator_relu(float* in, float* result, int w, int nthreads) {
+  return vanilla_accelerator_clip_run(in, result, w, 0.000000e+00f, INFINITY, nthreads);
+}
+
+/*!
+* \brief result = min(max(in, lo), hi) over w elements.
+*/
+int vanilla_accelerator_clip(float* in, float* result, int w, float lo, float hi, int nthreads) {
+  return vanilla_accelerator_clip_run(in, result, w, lo, hi, nthreads);
+}
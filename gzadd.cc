@@ -1,22 +1,486 @@
-#ifdef __cplusplus
-extern "C"
+#include <stdint.h>
+
+#define VA_ADD_CHUNK 16384
+/* vector lanes of the add kernels when their `vw` argument is 0 */
+#define VA_ADD_VECTOR_WIDTH 8
+
+/* element types of the add kernels */
+enum { VA_ADD_FLOAT32, VA_ADD_INT32, VA_ADD_INT8 };
+
+static const int vanilla_accelerator_add_bytes[] = {4, 4, 1};
+
+/* one output row: both operands contiguous (vv), in2 (vs) or in1 (sv) a broadcast scalar */
+typedef void (*vanilla_accelerator_add_row_t)(const void* in1, const void* in2, void* result,
+    int n);
+
+typedef struct {
+  int lanes;
+  vanilla_accelerator_add_row_t vv;
+  vanilla_accelerator_add_row_t vs;
+  vanilla_accelerator_add_row_t sv;
+} vanilla_accelerator_add_rows_t;
+
+/* scalar rows, also the general strided case */
+#define VA_ADD_SCALAR_ROWS(T, S)                                                                \
+  static void vanilla_accelerator_add_##S##_vv1(const void* a, const void* b, void* r, int n) { \
+    const T* __restrict in1 = (const T*)a;                                                      \
+    const T* __restrict in2 = (const T*)b;                                                      \
+    T* __restrict result = (T*)r;                                                               \
+    for ( int j = 0; j < n; j++ ) {                                                             \
+      result[j] = (T)(in1[j] + in2[j]);                                                         \
+    }                                                                                           \
+  }                                                                                             \
+  static void vanilla_accelerator_add_##S##_vs1(const void* a, const void* b, void* r, int n) { \
+    const T* __restrict in1 = (const T*)a;                                                      \
+    T bc = *(const T*)b;                                                                        \
+    T* __restrict result = (T*)r;                                                               \
+    for ( int j = 0; j < n; j++ ) {                                                             \
+      result[j] = (T)(in1[j] + bc);                                                             \
+    }                                                                                           \
+  }                                                                                             \
+  static void vanilla_accelerator_add_##S##_sv1(const void* a, const void* b, void* r, int n) { \
+    vanilla_accelerator_add_##S##_vs1(b, a, r, n);                                              \
+  }                                                                                             \
+  static void vanilla_accelerator_add_##S##_ss(const void* a, const void* b, void* r, int n,    \
+      int t1, int t2) {                                                                         \
+    const T* in1 = (const T*)a;                                                                 \
+    const T* in2 = (const T*)b;                                                                 \
+    T* result = (T*)r;                                                                          \
+    for ( int j = 0; j < n; j++ ) {                                                             \
+      result[j] = (T)(in1[j * t1] + in2[j * t2]);                                               \
+    }                                                                                           \
+  }
+
+VA_ADD_SCALAR_ROWS(float, f32)
+VA_ADD_SCALAR_ROWS(int32_t, i32)
+VA_ADD_SCALAR_ROWS(int8_t, i8)
+
+#define VA_ADD_ROWS(S, L) \
+  {L, vanilla_accelerator_add_##S##_vv##L, vanilla_accelerator_add_##S##_vs##L, \
+   vanilla_accelerator_add_##S##_sv##L}
+
+#if defined(__GNUC__)
+/*
+* Rows blocked by the vector width L. Scalar steps run up to the first result element aligned
+* to a whole vector, the main loop then stores aligned vectors of L lanes, and a scalar loop
+* adds the remainder. The operands keep their own offsets, so their loads are unaligned (the
+* _u vector types only assume element alignment). Operands must not overlap the result.
+*/
+#define VA_ADD_VECTOR_ROWS(T, S, L)                                                             \
+  typedef T vanilla_accelerator_##S##x##L##_t                                                   \
+      __attribute__((vector_size(L * sizeof(T)), __may_alias__));                               \
+  typedef T vanilla_accelerator_##S##x##L##_u                                                   \
+      __attribute__((vector_size(L * sizeof(T)), __may_alias__, aligned(sizeof(T))));           \
+  static void vanilla_accelerator_add_##S##_vv##L(const void* a, const void* b, void* r,        \
+      int n) {                                                                                  \
+    const T* __restrict in1 = (const T*)a;                                                      \
+    const T* __restrict in2 = (const T*)b;                                                      \
+    T* __restrict result = (T*)r;                                                               \
+    int j = 0;                                                                                  \
+    for ( ; j < n && (uintptr_t)(result + j) % (L * sizeof(T)) != 0; j++ ) {                    \
+      result[j] = (T)(in1[j] + in2[j]);                                                         \
+    }                                                                                           \
+    for ( ; j + L <= n; j += L ) {                                                              \
+      *(vanilla_accelerator_##S##x##L##_t*)(result + j) =                                       \
+          *(const vanilla_accelerator_##S##x##L##_u*)(in1 + j) +                                \
+          *(const vanilla_accelerator_##S##x##L##_u*)(in2 + j);                                 \
+    }                                                                                           \
+    for ( ; j < n; j++ ) {                                                                      \
+      result[j] = (T)(in1[j] + in2[j]);                                                         \
+    }                                                                                           \
+  }                                                                                             \
+  static void vanilla_accelerator_add_##S##_vs##L(const void* a, const void* b, void* r,        \
+      int n) {                                                                                  \
+    const T* __restrict in1 = (const T*)a;                                                      \
+    T bc = *(const T*)b;                                                                        \
+    T* __restrict result = (T*)r;                                                               \
+    int j = 0;                                                                                  \
+    for ( ; j < n && (uintptr_t)(result + j) % (L * sizeof(T)) != 0; j++ ) {                    \
+      result[j] = (T)(in1[j] + bc);                                                             \
+    }                                                                                           \
+    for ( ; j + L <= n; j += L ) {                                                              \
+      *(vanilla_accelerator_##S##x##L##_t*)(result + j) =                                       \
+          *(const vanilla_accelerator_##S##x##L##_u*)(in1 + j) + bc;                            \
+    }                                                                                           \
+    for ( ; j < n; j++ ) {                                                                      \
+      result[j] = (T)(in1[j] + bc);                                                             \
+    }                                                                                           \
+  }                                                                                             \
+  static void vanilla_accelerator_add_##S##_sv##L(const void* a, const void* b, void* r,        \
+      int n) {                                                                                  \
+    vanilla_accelerator_add_##S##_vs##L(b, a, r, n);                                            \
+  }
+
+VA_ADD_VECTOR_ROWS(float, f32, 4)
+VA_ADD_VECTOR_ROWS(float, f32, 8)
+VA_ADD_VECTOR_ROWS(float, f32, 16)
+VA_ADD_VECTOR_ROWS(int32_t, i32, 4)
+VA_ADD_VECTOR_ROWS(int32_t, i32, 8)
+VA_ADD_VECTOR_ROWS(int32_t, i32, 16)
+VA_ADD_VECTOR_ROWS(int8_t, i8, 4)
+VA_ADD_VECTOR_ROWS(int8_t, i8, 8)
+VA_ADD_VECTOR_ROWS(int8_t, i8, 16)
+
+#define VA_ADD_ROW_WIDTHS(S) \
+  {VA_ADD_ROWS(S, 1), VA_ADD_ROWS(S, 4), VA_ADD_ROWS(S, 8), VA_ADD_ROWS(S, 16)}
+#define VA_ADD_NUM_WIDTHS 4
+#else
+#define VA_ADD_ROW_WIDTHS(S) {VA_ADD_ROWS(S, 1)}
+#define VA_ADD_NUM_WIDTHS 1
 #endif
 
-int vanilla_accelerator_addvec(float *in1, float *in2, float *result, int w) {
-  for ( int i = 0; i < w; i++ ) {
-    result[i] = in1[i] + in2[i];
+/* row kernels per element type, by increasing vector width */
+static const vanilla_accelerator_add_rows_t
+    vanilla_accelerator_add_rows[3][VA_ADD_NUM_WIDTHS] = {
+  VA_ADD_ROW_WIDTHS(f32), VA_ADD_ROW_WIDTHS(i32), VA_ADD_ROW_WIDTHS(i8)
+};
+
+/* the widest row kernels of at most vw lanes, VA_ADD_VECTOR_WIDTH for vw <= 0 */
+static const vanilla_accelerator_add_rows_t* vanilla_accelerator_add_select(int dtype, int vw) {
+  int i = 0;
+  vw = vw > 0 ? vw : VA_ADD_VECTOR_WIDTH;
+  while (i + 1 < VA_ADD_NUM_WIDTHS && vanilla_accelerator_add_rows[dtype][i + 1].lanes <= vw) {
+    i++;
   }
+  return &vanilla_accelerator_add_rows[dtype][i];
+}
+
+typedef struct {
+  const void* in1;
+  const void* in2;
+  void* result;
+  const vanilla_accelerator_add_rows_t* rows;
+  int bytes;
+  int w;
+  int chunk;
+} vanilla_accelerator_add_args_t;
+
+static void vanilla_accelerator_addvec_task(void* ctx, int task) {
+  const vanilla_accelerator_add_args_t* a = (const vanilla_accelerator_add_args_t*)ctx;
+  int begin = task * a->chunk;
+  int end = (task + 1) * a->chunk < a->w ? (task + 1) * a->chunk : a->w;
+  size_t offset = (size_t)begin * a->bytes;
+  a->rows->vv((const char*)a->in1 + offset, (const char*)a->in2 + offset,
+              (char*)a->result + offset, end - begin);
+}
 
+typedef struct {
+  const void* in1;
+  const void* in2;
+  void* result;
+  int dtype;
+  const vanilla_accelerator_add_rows_t* rows;
+  int d[4];
+  int s1[4];
+  int s2[4];
+  int rows_n;
+  int chunk;
+} vanilla_accelerator_add_strided_args_t;
+
+/*!
+* \brief One task adds a chunk of output rows (d[3] elements each). The row offsets come from
+* the outer strides; the inner stride of an operand is either 1 or 0 (broadcast scalar).
+*/
+static void vanilla_accelerator_addvec_strided_task(void* ctx, int task) {
+  const vanilla_accelerator_add_strided_args_t* a =
+      (const vanilla_accelerator_add_strided_args_t*)ctx;
+  int n = a->d[3];
+  int bytes = vanilla_accelerator_add_bytes[a->dtype];
+  int end = (task + 1) * a->chunk < a->rows_n ? (task + 1) * a->chunk : a->rows_n;
+  int t1 = a->s1[3];
+  int t2 = a->s2[3];
+  // row index (i0, i1, i2), divided out once and then carried along
+  int i2 = (task * a->chunk) % a->d[2];
+  int i1 = (task * a->chunk / a->d[2]) % a->d[1];
+  int i0 = task * a->chunk / (a->d[2] * a->d[1]);
+  for ( int r = task * a->chunk; r < end; r++ ) {
+    int o1 = i0 * a->s1[0] + i1 * a->s1[1] + i2 * a->s1[2];
+    int o2 = i0 * a->s2[0] + i1 * a->s2[1] + i2 * a->s2[2];
+    if (++i2 == a->d[2]) {
+      i2 = 0;
+      if (++i1 == a->d[1]) {
+        i1 = 0;
+        ++i0;
+      }
+    }
+    const char* in1 = (const char*)a->in1 + (size_t)o1 * bytes;
+    const char* in2 = (const char*)a->in2 + (size_t)o2 * bytes;
+    char* result = (char*)a->result + (size_t)r * n * bytes;
+    if (t1 == 1 && t2 == 1) {
+      a->rows->vv(in1, in2, result, n);
+    } else if (t1 == 1 && t2 == 0) {
+      a->rows->vs(in1, in2, result, n);
+    } else if (t1 == 0 && t2 == 1) {
+      a->rows->sv(in1, in2, result, n);
+    } else if (a->dtype == VA_ADD_INT32) {
+      vanilla_accelerator_add_i32_ss(in1, in2, result, n, t1, t2);
+    } else if (a->dtype == VA_ADD_INT8) {
+      vanilla_accelerator_add_i8_ss(in1, in2, result, n, t1, t2);
+    } else {
+      vanilla_accelerator_add_f32_ss(in1, in2, result, n, t1, t2);
+    }
+  }
+}
+
+static int vanilla_accelerator_addvec_run(const void* in1, const void* in2, void* result,
+    int dtype, int w, int vw, int chunk, int nthreads) {
+  vanilla_accelerator_add_args_t a;
+  a.in1    = in1;
+  a.in2    = in2;
+  a.result = result;
+  a.rows   = vanilla_accelerator_add_select(dtype, vw);
+  a.bytes  = vanilla_accelerator_add_bytes[dtype];
+  a.w      = w;
+  a.chunk  = chunk > 0 ? chunk : VA_ADD_CHUNK;
+  if (nthreads <= 1 || w < 2 * a.chunk) {
+    a.chunk = w;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (w + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_addvec_task, &a);
   return 0;
 }
 
-int vanilla_accelerator_addvec_bc(float *in1, float *in2, float *result, int w, int wb) {
-  for ( int i = 0; i < w/wb; i++ ) {
-    for ( int j = 0; j < wb; j++ ) {
-      int idx = i * wb + j;
-      result[idx] = in1[idx] + in2[i];
+static int vanilla_accelerator_addvec_strided_run(const void* in1, const void* in2,
+    void* result, int dtype, const int* d, const int* s1, const int* s2, int vw, int chunk,
+    int nthreads) {
+  vanilla_accelerator_add_strided_args_t a;
+  a.in1    = in1;
+  a.in2    = in2;
+  a.result = result;
+  a.dtype  = dtype;
+  a.rows   = vanilla_accelerator_add_select(dtype, vw);
+  for ( int i = 0; i < 4; i++ ) {
+    a.d[i]  = d[i];
+    a.s1[i] = s1[i];
+    a.s2[i] = s2[i];
+  }
+  a.rows_n = d[0] * d[1] * d[2];
+  chunk    = chunk > 0 ? chunk : VA_ADD_CHUNK;
+  a.chunk  = (chunk + d[3] - 1) / d[3];
+  if (nthreads <= 1 || a.rows_n * d[3] < 2 * chunk) {
+    a.chunk = a.rows_n;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (a.rows_n + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_addvec_strided_task, &a);
+  return 0;
+}
+
+#define VA_ADD_MAX_INPUTS 16
+#define VA_ADD_STRIP 256
+
+typedef struct {
+  const void* in[VA_ADD_MAX_INPUTS];
+  void* result;
+  int k;
+  int dtype;
+  int w;
+  int chunk;
+} vanilla_accelerator_addn_args_t;
+
+/* sum of k inputs, accumulated strip by strip so every input is read and the result written once */
+static void vanilla_accelerator_addvec_n_task(void* ctx, int task) {
+  const vanilla_accelerator_addn_args_t* a = (const vanilla_accelerator_addn_args_t*)ctx;
+  int end = (task + 1) * a->chunk < a->w ? (task + 1) * a->chunk : a->w;
+  for ( int s = task * a->chunk; s < end; s += VA_ADD_STRIP ) {
+    int len = end - s < VA_ADD_STRIP ? end - s : VA_ADD_STRIP;
+    if (a->dtype == VA_ADD_FLOAT32) {
+      float acc[VA_ADD_STRIP];
+      const float* in0 = (const float*)a->in[0] + s;
+      for ( int i = 0; i < len; i++ ) {
+        acc[i] = in0[i];
+      }
+      for ( int j = 1; j < a->k; j++ ) {
+        const float* in = (const float*)a->in[j] + s;
+        for ( int i = 0; i < len; i++ ) {
+          acc[i] += in[i];
+        }
+      }
+      float* result = (float*)a->result + s;
+      for ( int i = 0; i < len; i++ ) {
+        result[i] = acc[i];
+      }
+    } else {
+      // integer sums wrap, so accumulating int8 in int32 and truncating once is exact
+      int32_t acc[VA_ADD_STRIP];
+      for ( int i = 0; i < len; i++ ) {
+        acc[i] = 0;
+      }
+      for ( int j = 0; j < a->k; j++ ) {
+        if (a->dtype == VA_ADD_INT32) {
+          const int32_t* in = (const int32_t*)a->in[j] + s;
+          for ( int i = 0; i < len; i++ ) {
+            acc[i] += in[i];
+          }
+        } else {
+          const int8_t* in = (const int8_t*)a->in[j] + s;
+          for ( int i = 0; i < len; i++ ) {
+            acc[i] += in[i];
+          }
+        }
+      }
+      for ( int i = 0; i < len; i++ ) {
+        if (a->dtype == VA_ADD_INT32) {
+          ((int32_t*)a->result)[s + i] = acc[i];
+        } else {
+          ((int8_t*)a->result)[s + i] = (int8_t)acc[i];
+        }
+      }
     }
   }
+}
 
+static int vanilla_accelerator_addvec_n_run(void* result, int dtype, int w, int nthreads, int k,
+    void** in) {
+  vanilla_accelerator_addn_args_t a;
+  if (k < 1 || k > VA_ADD_MAX_INPUTS) {
+    return -1;
+  }
+  for ( int j = 0; j < k; j++ ) {
+    a.in[j] = in[j];
+  }
+  a.result = result;
+  a.k      = k;
+  a.dtype  = dtype;
+  a.w      = w;
+  a.chunk  = VA_ADD_CHUNK;
+  if (nthreads <= 1 || w < 2 * VA_ADD_CHUNK) {
+    a.chunk = w;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (w + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_addvec_n_task, &a);
   return 0;
 }
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief result = in1 + in2 over w elements, in vectors of vw lanes (4, 8 or 16, 0 for the
+* default VA_ADD_VECTOR_WIDTH, 1 for scalar loops). Large vectors are split into chunks of
+* `chunk` elements (0 for the default VA_ADD_CHUNK) spread over nthreads threads.
+*/
+int vanilla_accelerator_addvec(float *in1, float *in2, float *result, int w, int vw,
+    int chunk, int nthreads) {
+  return vanilla_accelerator_addvec_run(in1, in2, result, VA_ADD_FLOAT32, w, vw, chunk,
+                                        nthreads);
+}
+
+/*!
+* \brief result = in1 + in2 with numpy broadcasting. The output is d0 x d1 x d2 x d3
+* (contiguous), in1 element (i0, i1, i2, i3) is in1[i0 * s10 + i1 * s11 + i2 * s12 + i3 * s13]
+* and likewise for in2; a broadcast dimension has stride 0. Shapes are collapsed to at most four
+* dimensions by the lowering. Rows with contiguous or broadcast-scalar operands are vectorized
+* and tasks cover about `chunk` output elements, as for vanilla_accelerator_addvec.
+*/
+int vanilla_accelerator_addvec_strided(float *in1, float *in2, float *result, int d0, int d1,
+    int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22, int s23,
+    int vw, int chunk, int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_addvec_strided_run(in1, in2, result, VA_ADD_FLOAT32, d, s1, s2,
+                                                vw, chunk, nthreads);
+}
+
+/*!
+* \brief int32 variants, used for the accumulators of quantized graphs (bias and residual adds
+* before requantization). Arithmetic wraps like the TIR they replace.
+*/
+int vanilla_accelerator_addvec_int32(int32_t *in1, int32_t *in2, int32_t *result, int w,
+    int vw, int chunk, int nthreads) {
+  return vanilla_accelerator_addvec_run(in1, in2, result, VA_ADD_INT32, w, vw, chunk, nthreads);
+}
+
+int vanilla_accelerator_addvec_int32_strided(int32_t *in1, int32_t *in2, int32_t *result,
+    int d0, int d1, int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22,
+    int s23, int vw, int chunk, int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_addvec_strided_run(in1, in2, result, VA_ADD_INT32, d, s1, s2,
+                                                vw, chunk, nthreads);
+}
+
+/*!
+* \brief int8 variants, the sum is truncated to int8.
+*/
+int vanilla_accelerator_addvec_int8(int8_t *in1, int8_t *in2, int8_t *result, int w,
+    int vw, int chunk, int nthreads) {
+  return vanilla_accelerator_addvec_run(in1, in2, result, VA_ADD_INT8, w, vw, chunk, nthreads);
+}
+
+int vanilla_accelerator_addvec_int8_strided(int8_t *in1, int8_t *in2, int8_t *result, int d0,
+    int d1, int d2, int d3, int s10, int s11, int s12, int s13, int s20, int s21, int s22, int s23,
+    int vw, int chunk, int nthreads) {
+  int d[4]  = {d0, d1, d2, d3};
+  int s1[4] = {s10, s11, s12, s13};
+  int s2[4] = {s20, s21, s22, s23};
+  return vanilla_accelerator_addvec_strided_run(in1, in2, result, VA_ADD_INT8, d, s1, s2,
+                                                vw, chunk, nthreads);
+}
+
+/* parameter and argument lists of the k inputs of vanilla_accelerator_addvec_n<k> */
+#define VA_ADD_PARAMS_3(T) T* in0, T* in1, T* in2
+#define VA_ADD_PARAMS_4(T) VA_ADD_PARAMS_3(T), T* in3
+#define VA_ADD_PARAMS_5(T) VA_ADD_PARAMS_4(T), T* in4
+#define VA_ADD_PARAMS_6(T) VA_ADD_PARAMS_5(T), T* in5
+#define VA_ADD_PARAMS_7(T) VA_ADD_PARAMS_6(T), T* in6
+#define VA_ADD_PARAMS_8(T) VA_ADD_PARAMS_7(T), T* in7
+#define VA_ADD_PARAMS_9(T) VA_ADD_PARAMS_8(T), T* in8
+#define VA_ADD_PARAMS_10(T) VA_ADD_PARAMS_9(T), T* in9
+#define VA_ADD_PARAMS_11(T) VA_ADD_PARAMS_10(T), T* in10
+#define VA_ADD_PARAMS_12(T) VA_ADD_PARAMS_11(T), T* in11
+#define VA_ADD_PARAMS_13(T) VA_ADD_PARAMS_12(T), T* in12
+#define VA_ADD_PARAMS_14(T) VA_ADD_PARAMS_13(T), T* in13
+#define VA_ADD_PARAMS_15(T) VA_ADD_PARAMS_14(T), T* in14
+#define VA_ADD_PARAMS_16(T) VA_ADD_PARAMS_15(T), T* in15
+#define VA_ADD_ARGS_3 in0, in1, in2
+#define VA_ADD_ARGS_4 VA_ADD_ARGS_3, in3
+#define VA_ADD_ARGS_5 VA_ADD_ARGS_4, in4
+#define VA_ADD_ARGS_6 VA_ADD_ARGS_5, in5
+#define VA_ADD_ARGS_7 VA_ADD_ARGS_6, in6
+#define VA_ADD_ARGS_8 VA_ADD_ARGS_7, in7
+#define VA_ADD_ARGS_9 VA_ADD_ARGS_8, in8
+#define VA_ADD_ARGS_10 VA_ADD_ARGS_9, in9
+#define VA_ADD_ARGS_11 VA_ADD_ARGS_10, in10
+#define VA_ADD_ARGS_12 VA_ADD_ARGS_11, in11
+#define VA_ADD_ARGS_13 VA_ADD_ARGS_12, in12
+#define VA_ADD_ARGS_14 VA_ADD_ARGS_13, in13
+#define VA_ADD_ARGS_15 VA_ADD_ARGS_14, in14
+#define VA_ADD_ARGS_16 VA_ADD_ARGS_15, in15
+
+#define VA_ADD_N(K, SUFFIX, T, DTYPE)                                                             \
+  int vanilla_accelerator_addvec##SUFFIX##_n##K(T* result, int w, int nthreads,                  \
+                                                VA_ADD_PARAMS_##K(T)) {                           \
+    void* in[K] = {VA_ADD_ARGS_##K};                                                              \
+    return vanilla_accelerator_addvec_n_run(result, DTYPE, w, nthreads, K, in);                   \
+  }
+#define VA_ADD_N_DTYPES(K)                                                                        \
+  VA_ADD_N(K, , float, VA_ADD_FLOAT32)                                                            \
+  VA_ADD_N(K, _int32, int32_t, VA_ADD_INT32)                                                      \
+  VA_ADD_N(K, _int8, int8_t, VA_ADD_INT8)
+
+/*!
+* \brief result = in0 + in1 + ... + in{k-1} over w elements, for k = 3 to VA_ADD_MAX_INPUTS
+* inputs: vanilla_accelerator_addvec_n<k>(result, w, nthreads, in0, ..., in{k-1}), and the
+* _int32_n<k> and _int8_n<k> variants. Replaces a tree of k - 1 adds, reading every input once
+* and writing only the result.
+*/
+VA_ADD_N_DTYPES(3)
+VA_ADD_N_DTYPES(4)
+VA_ADD_N_DTYPES(5)
+VA_ADD_N_DTYPES(6)
+VA_ADD_N_DTYPES(7)
+VA_ADD_N_DTYPES(8)
+VA_ADD_N_DTYPES(9)
+VA_ADD_N_DTYPES(10)
+VA_ADD_N_DTYPES(11)
+VA_ADD_N_DTYPES(12)
+VA_ADD_N_DTYPES(13)
+VA_ADD_N_DTYPES(14)
+VA_ADD_N_DTYPES(15)
+VA_ADD_N_DTYPES(16)
@@ -0,0 +1,158 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Opt-in compile-time instrumentation of the vanilla_accelerator passes"""
+
+import atexit
+import contextlib
+import json
+import os
+import time
+
+
+class FunctionRecord:
+    """
+    Timings and offload decisions of VanillaAcceleratorTirPass for one PrimFunc
+    """
+
+    def __init__(self, name, dump_dir):
+        self.name      = name
+        self.dump_dir  = dump_dir
+        self.passes    = []
+        self.cached    = False
+        self.blocks    = 0
+        self.offloaded = []
+        self.host      = []
+        self.staging   = []
+        self.time_ms   = 0.0
+
+    @contextlib.contextmanager
+    def step(self, name, rewriter=None):
+        """
+        Time the sub-pass `name`; with a BlockRewriter also count the blocks it claimed
+        """
+        claimed = len(rewriter.claimed) if rewriter is not None else 0
+        start   = time.perf_counter()
+        yield
+        entry = {"name": name, "time_ms": (time.perf_counter() - start) * 1e3}
+        if rewriter is not None:
+            entry["offloaded"] = len(rewriter.claimed) - claimed
+        self.passes.append(entry)
+
+    def dump(self, stage, func):
+        if self.dump_dir is None:
+            return
+        os.makedirs(self.dump_dir, exist_ok=True)
+        with open(os.path.join(self.dump_dir, f"{self.name}.{stage}.tir"), "w") as f:
+            f.write(str(func))
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "cached": self.cached,
+            "time_ms": self.time_ms,
+            "blocks": self.blocks,
+            "offloaded": self.offloaded,
+            "host": self.host,
+            "passes": self.passes,
+            "staging": self.staging,
+        }
+
+
+class Recorder:
+    """
+    Collects a FunctionRecord per lowered PrimFunc while enabled. Disabled by default, then
+    `function` yields None and the passes skip all bookkeeping and dumps.
+    """
+
+    def __init__(self):
+        self.enabled   = False
+        self.dump_dir  = None
+        self.functions = []
+
+    def enable(self, dump_dir=None):
+        """
+        Start recording; with `dump_dir` the IR before and after lowering is written there
+        """
+        self.enabled  = True
+        self.dump_dir = dump_dir
+
+    def disable(self):
+        self.enabled = False
+
+    def dump(self, name, text):
+        """
+        Write `text` to `name` in the dump directory, if recording with one
+        """
+        if not self.enabled or self.dump_dir is None:
+            return
+        os.makedirs(self.dump_dir, exist_ok=True)
+        with open(os.path.join(self.dump_dir, name), "w") as f:
+            f.write(text)
+
+    @contextlib.contextmanager
+    def function(self, func):
+        if not self.enabled:
+            yield None
+            return
+        name = str(func.attrs["global_symbol"]) if func.attrs is not None and \
+            "global_symbol" in func.attrs else f"func{len(self.functions)}"
+        record = FunctionRecord(name, self.dump_dir)
+        start  = time.perf_counter()
+        yield record
+        record.time_ms = (time.perf_counter() - start) * 1e3
+        self.functions.append(record)
+
+    def report(self, cache=None) -> dict:
+        """
+        Machine-readable summary of everything recorded so far
+        """
+        functions = [f.to_json() for f in self.functions]
+        totals    = {
+            "functions": len(functions),
+            "cached": sum(f["cached"] for f in functions),
+            "time_ms": sum(f["time_ms"] for f in functions),
+            "blocks": sum(f["blocks"] for f in functions),
+            "offloaded": sum(len(f["offloaded"]) for f in functions),
+            "host": sum(len(f["host"]) for f in functions),
+        }
+        passes = {}
+        for f in functions:
+            for p in f["passes"]:
+                passes[p["name"]] = passes.get(p["name"], 0.0) + p["time_ms"]
+        totals["passes_ms"] = passes
+        report = {"totals": totals, "functions": functions}
+        if cache is not None:
+            report["cache"] = cache.stats()
+        return report
+
+    def write(self, path, cache=None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(cache), f, indent=2)
+
+    def clear(self):
+        self.functions = []
+
+
+# shared by every VanillaAcceleratorTirPass, turned on by run.py --instrument or
+# by setting VANILLA_ACCELERATOR_INSTRUMENT to a dump directory
+recorder = Recorder()
+if os.environ.get("VANILLA_ACCELERATOR_INSTRUMENT"):
+    recorder.enable(os.environ["VANILLA_ACCELERATOR_INSTRUMENT"])
+    atexit.register(lambda: recorder.functions and recorder.write(
+        os.path.join(recorder.dump_dir, "report.json")))
@@ -1,25 +1,154 @@
 import tvm
-from tvm import tir
+from collections import namedtuple
 import pass_utils
+import pass_injective
+import pass_requantize
+
+tir_func = {"dma": "vanilla_accelerator_dma", "dma_wait": "vanilla_accelerator_dma_wait"}
+
+# widest vector of the elementwise kernels (vw = 16), the tile granularity while `dimension`
+# is unset
+max_lanes = 16
+# function attribute carrying the per-call cost report
+report_attr = "vanilla_accelerator_staging"
+
+# argument positions of the elementwise kernels, which can run on any slice of their operands
+StagedCall = namedtuple("StagedCall", ["inputs", "output", "width"])
+
+def _staged_calls() :
+    calls = dict()
+    for op in pass_injective.eltwise_ops.values():
+        for dtype in op.dtypes:
+            name = op.kernel + pass_injective.tir_dtypes[dtype]
+            if op.arity == 2:
+                calls[name] = StagedCall([0, 1], 2, 3)
+            else:
+                calls[name] = StagedCall([0], 1, 2)
+    for dtype in pass_injective.eltwise_ops["add"].dtypes:
+        for k in range(pass_injective.min_add_inputs, pass_injective.max_add_inputs + 1):
+            # (result, w, nthreads, inputs...)
+            calls[pass_injective.add_n_kernel(dtype, k)] = StagedCall(None, 0, 1)
+    calls[pass_requantize.tir_func["requantize"]] = StagedCall([0], 1, 2)
+    return calls
+
+staged_calls = _staged_calls()
+
+def get_extern_call(stmt: tvm.tir.Stmt) :
+    """
+    (name, args) of an `Evaluate(call_extern(...))` statement, or None
+    """
+    if not isinstance(stmt, tvm.tir.Evaluate) or not isinstance(stmt.value, tvm.tir.Call):
+        return None
+    call = stmt.value
+    if not call.op.same_as(tvm.ir.Op.get("tir.call_extern")):
+        return None
+    return (call.args[0].value, list(call.args[1:]))
+
+def _elem_bytes(var: tvm.tir.Var) -> int:
+    return tvm.DataType(var.type_annotation.element_type.dtype).bits // 8
+
+def stage_call(name: str, args, tile: int, scope: str) :
+    """
+    Run an elementwise kernel call tile by tile out of ping-pong scratchpad buffers in
+    `scope`: the loads of tile k+1 are issued before the kernel runs on tile k, and the
+    store of tile k is only waited for when its slot is reused. Returns (stmt, report).
+    """
+    call    = staged_calls[name]
+    inputs  = call.inputs if call.inputs is not None else list(range(3, len(args)))
+    ptrs    = inputs + [call.output]
+    width   = int(args[call.width])
+    ntiles  = (width + tile - 1) // tile
+    tile    = min(tile, width)
+    bufs    = {i: tvm.tir.decl_buffer((width,), args[i].type_annotation.element_type.dtype,
+                                      data=args[i]) for i in ptrs}
+
+    irb  = tvm.tir.ir_builder.create()
+    spad = {i: irb.allocate(bufs[i].dtype, (2 * tile,), name=f"spad{i}", scope=scope).asobject()
+            for i in ptrs}
+
+    def _length(k):
+        return tvm.tir.min(tile, width - k * tile)
+
+    def _load(k, slot):
+        for i in inputs:
+            size = _elem_bytes(args[i])
+            irb.emit(pass_utils.tir_call(irb, True, tir_func["dma"],
+                                         spad[i].access_ptr("w", offset=slot * tile),
+                                         bufs[i].access_ptr("r", offset=k * tile),
+                                         _length(k) * size, slot))
+
+    # channels 0/1 load into slot 0/1, channels 2/3 store out of slot 0/1
+    _load(0, 0)
+    with irb.for_range(0, ntiles, name="k") as k:
+        slot = tvm.tir.truncmod(k, 2)
+        with irb.if_scope(k + 1 < ntiles):
+            _load(k + 1, 1 - slot)
+        irb.emit(pass_utils.tir_call(irb, True, tir_func["dma_wait"], slot))
+        irb.emit(pass_utils.tir_call(irb, True, tir_func["dma_wait"], slot + 2))
+
+        kargs = list(args)
+        for i in ptrs:
+            kargs[i] = spad[i].access_ptr("rw", offset=slot * tile)
+        kargs[call.width] = _length(k)
+        irb.emit(pass_utils.tir_call(irb, True, name, *kargs))
+
+        size = _elem_bytes(args[call.output])
+        irb.emit(pass_utils.tir_call(irb, True, tir_func["dma"],
+                                     bufs[call.output].access_ptr("w", offset=k * tile),
+                                     spad[call.output].access_ptr("r", offset=slot * tile),
+                                     _length(k) * size, slot + 2))
+    irb.emit(pass_utils.tir_call(irb, True, tir_func["dma_wait"], 2))
+    irb.emit(pass_utils.tir_call(irb, True, tir_func["dma_wait"], 3))
+
+    report = {
+        "kernel": name,
+        "staged": True,
+        "tiles": ntiles,
+        "bytes_in": sum(width * _elem_bytes(args[i]) for i in inputs),
+        "bytes_out": width * _elem_bytes(args[call.output]),
+        "scratchpad_bytes": sum(2 * tile * _elem_bytes(args[i]) for i in ptrs),
+    }
+    return (irb.get(), report)
 
 def add_device_buffer(func, mod, ctx):
-    sch = tir.Schedule(func)
-
-    def _hb(op):
-        print(type(op))
-
-    tvm.tir.stmt_functor.post_order_visit(func.body, _hb)
-
-    #print(func)
-    #block = sch.get_block("root", func_name = "tvmgen_default_vanilla_accelerator_main_0")
-    #block = sch.get_block("main")
-    #block = sch.get_block("T_add")
-    #print(sch.mod.show())
-    ##i, j, k, l = sch.get_loops("T_add")
-    ##print(type(block))
-    #sch.cache_read(block, 0, "local")
-    #sch.cache_read(block, 1, "local")
-    #sch.cache_write(block, 0, "local")
-    print(sch.mod.show())
-
-    return func
+    """
+    Stage the operands of the offloaded elementwise calls through an on-chip scratchpad
+    in the `scratchpad_scope` target attribute, `scratchpad_size` elements per operand and
+    slot rounded up to a multiple of the vector lanes. Disabled while `scratchpad_scope` is
+    not set. The bytes each call moves are attached to the function, see `cost_report`.
+    """
+    scope = pass_utils.target_attr(func, "scratchpad_scope", "")
+    if scope == "":
+        return func
+    lanes  = int(pass_utils.target_attr(func, "dimension", 0)) or max_lanes
+    size   = int(pass_utils.target_attr(func, "scratchpad_size", 4096))
+    tile   = (max(size, 1) + lanes - 1) // lanes * lanes
+    report = []
+
+    def _stage(op):
+        extern = get_extern_call(op)
+        if extern is None or extern[0].startswith("vanilla_accelerator_dma"):
+            return op
+        (name, args) = extern
+        if name not in staged_calls:
+            # whole-tensor kernels (conv2d, dense, strided) read host memory directly
+            report.append({"kernel": name, "staged": False})
+            return op
+        (stmt, entry) = stage_call(name, args, tile, scope)
+        report.append(entry)
+        return stmt
+
+    body = tvm.tir.stmt_functor.ir_transform(func.body, None, _stage, ["tir.Evaluate"])
+    if len(report) == 0:
+        return func
+    return func.with_body(body).with_attr(report_attr, report)
+
+def cost_report(func: tvm.tir.PrimFunc) :
+    """
+    Per-call staging report of a lowered function: kernel, staged, tiles, bytes_in,
+    bytes_out and scratchpad_bytes
+    """
+    if func.attrs is None or report_attr not in func.attrs:
+        return []
+    return [{str(k): (v.value if hasattr(v, "value") else str(v)) for k, v in entry.items()}
+            for entry in func.attrs[report_attr]]
@@ -0,0 +1,149 @@
+import glob
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+import tvm
+
+# modules whose code decides how a PrimFunc is lowered, part of every key on disk
+lowering_sources = ["passes.py", "pass_*.py", "autotune.py"]
+
+def sources_digest(patterns) -> str:
+    """
+    Hash of the contents of the package files matching `patterns`
+    """
+    topdir = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(topdir, pattern))):
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode())
+                h.update(f.read())
+    return h.hexdigest()
+
+def file_digest(path: str) -> str:
+    """
+    Hash of the contents of the file at `path`, of nothing if there is none
+    """
+    h = hashlib.sha256()
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+class LoweringCache:
+    """
+    Lowered PrimFuncs of VanillaAcceleratorTirPass keyed by the structural hash of the
+    incoming PrimFunc, so repeated layers are lowered once. The most recently used
+    `capacity` entries are kept in memory, and with a `path` every lowering is also
+    written there as JSON and reused by later runs. Entries on disk are also keyed by the
+    lowering sources and the contents of the `tuning_log` the tuned kernel parameters
+    come from.
+    """
+
+    def __init__(self, capacity: int = 128, path: str = None, tuning_log: str = None):
+        self.capacity   = capacity
+        self.path       = path
+        self.tuning_log = tuning_log
+        self.version    = sources_digest(lowering_sources)
+        self.entries   = OrderedDict()
+        self.hits      = 0
+        self.disk_hits = 0
+        self.misses    = 0
+
+    @staticmethod
+    def canonical(func: tvm.tir.PrimFunc) -> tvm.tir.PrimFunc:
+        # identical layers only differ in their symbol name, which the Relay function
+        # attributes UMA attaches carry as well
+        if func.attrs is None:
+            return func
+        if "global_symbol" in func.attrs:
+            func = func.with_attr("global_symbol", "")
+        if "relay_attrs" in func.attrs:
+            func = func.with_attr("relay_attrs", tvm.ir.make_node("DictAttrs"))
+        return func
+
+    @staticmethod
+    def restore(func: tvm.tir.PrimFunc, lowered: tvm.tir.PrimFunc) -> tvm.tir.PrimFunc:
+        if func.attrs is None:
+            return lowered
+        for name in ["global_symbol", "relay_attrs"]:
+            if name in func.attrs:
+                lowered = lowered.with_attr(name, func.attrs[name])
+        return lowered
+
+    def _salt(self) -> str:
+        h = hashlib.sha256()
+        h.update(self.version.encode())
+        h.update(file_digest(self.tuning_log).encode())
+        return h.hexdigest()[:16]
+
+    def _file(self, key: int, salt: str) -> str:
+        return os.path.join(self.path, f"{key:016x}-{salt}.json")
+
+    def _load(self, key: int, salt: str, func: tvm.tir.PrimFunc) :
+        if not self.path or not os.path.exists(self._file(key, salt)):
+            return None
+        try:
+            with open(self._file(key, salt)) as f:
+                (orig, lowered) = tvm.ir.load_json(f.read())
+        except (OSError, tvm.TVMError):
+            return None
+        return lowered if tvm.ir.structural_equal(orig, func) else None
+
+    def _store(self, key: int, salt: str, func: tvm.tir.PrimFunc, lowered: tvm.tir.PrimFunc):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        # write then rename so concurrent compiles never read a partial entry
+        (fd, tmp) = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(tvm.ir.save_json(tvm.runtime.convert([func, lowered])))
+        os.replace(tmp, self._file(key, salt))
+
+    def _insert(self, key: int, func: tvm.tir.PrimFunc, lowered: tvm.tir.PrimFunc):
+        self.entries.setdefault(key, []).append((func, lowered))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def lookup(self, func: tvm.tir.PrimFunc, lower) -> tvm.tir.PrimFunc:
+        """
+        Lowering of `func`, computed with `lower(func)` if it is not cached
+        """
+        if self.capacity <= 0 and not self.path:
+            self.misses += 1
+            return lower(func)
+
+        canon = self.canonical(func)
+        key   = tvm.ir.structural_hash(canon)
+        # entries sharing a hash are told apart by structural equality
+        for (orig, lowered) in self.entries.get(key, []):
+            if tvm.ir.structural_equal(orig, canon):
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.restore(func, lowered)
+
+        salt    = self._salt() if self.path else ""
+        lowered = self._load(key, salt, canon)
+        if lowered is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            lowered = self.canonical(lower(func))
+            self._store(key, salt, canon, lowered)
+        if self.capacity > 0:
+            self._insert(key, canon, lowered)
+        return self.restore(func, lowered)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
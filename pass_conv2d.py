@@ -2,120 +2,244 @@ import tvm
 from tvm import tir
 from functools import reduce
 import pass_utils
-
-def get_padding(stmt: tvm.tir.Stmt) :
-    def _check_padding(hvmin):
-        if type(hvmin) is tvm.tir.expr.Var :
-            return 0
-        else :
-            return int(hmin.b)
-
-    def _hb(op):
-        if isinstance(op, tvm.tir.Block):
-            hmin = op.reads[0].region[2].min
-            vmin = op.reads[0].region[3].min
-
-            hpad.extend([_check_padding(hmin)])
-            vpad.extend([_check_padding(vmin)])
-
-    hpad = []
-    vpad = []
-    tvm.tir.stmt_functor.post_order_visit(stmt.body, _hb)
-    return (hpad[0], vpad[0])
-
-
-def conv2d_pass(func, mod, ctx):
-    _loops = dict()
-    _entry_node = None
-
-    def _detect_and_replace_pad(
-        func: tvm.tir.PrimFunc, mod: tvm.ir.IRModule, ctx: tvm.ir.transform.PassContext
-    ) -> tvm.tir.PrimFunc:
-        def _replace_pad(op):
-            if op == _entry_node:
-                (inputs, outputs) = pass_utils.stmt_analysis(op)
-                (hpad, vpad) = get_padding(op)
-
-                irb = tvm.tir.ir_builder.create()
-                # extraction of loop offsets
-                for k, v in _loops.items():
-                    assert v.min.value == 0
-                offset_order = ["w", "h", "ci"]
-                offsets = [_loops[i].extent.value for i in offset_order]
-                args = inputs + outputs + offsets + [hpad, vpad]
-                irb.emit(pass_utils.tir_call(irb, True, "vanilla_accelerator_pad", *args))
-                irb_result = irb.get()
-                return irb_result
-            else:
-                return op
-
-        sch = tir.Schedule(func)
-
-        if pass_utils.has_block("pad_temp", func):
-            pad_block = sch.get_block("pad_temp")
-            rv_loops = sch.get_loops(pad_block)
-            assert len(rv_loops) == 4
-            loops = dict(
-                n  = rv_loops[0],
-                ci = rv_loops[1],
-                h  = rv_loops[2],
-                w  = rv_loops[3],
-            )
-            _entry_node = sch.get(rv_loops[1])
-            _loops = {k: sch.get(v) for k, v in loops.items()}
-
-            x = tvm.tir.stmt_functor.ir_transform(
-                func.body, None, _replace_pad, ["tir.For", "tir.SeqStmt"]
-            )
-            return func.with_body(x)
+import pass_pool
+import autotune
+
+# conv2d block -> number of loops around it
+# (depthwise convs have no input channel reduction)
+conv2d_blocks = {
+    "conv2d_nchw"       : 7,
+    "group_conv2d_nchw" : 7,
+    "DepthwiseConv2d"   : 6,
+}
+# NHWC conv2d block (HWIO weights) -> number of loops around it
+conv2d_nhwc_blocks = {
+    "conv2d_nhwc"       : 7,
+}
+# (input, output) dtype -> (conv2d kernel, conv2d kernel with fused epilogue)
+conv2d_kernels = {
+    ("float32", "float32") : ("vanilla_accelerator_conv2dnchw_blocked",
+                              "vanilla_accelerator_conv2dnchw_bias"),
+    ("int8", "int32")      : ("vanilla_accelerator_conv2dnchw_int8",
+                              "vanilla_accelerator_conv2dnchw_int8_bias"),
+}
+conv2d_nhwc_kernels = {
+    ("float32", "float32") : ("vanilla_accelerator_conv2dnhwc_blocked",
+                              "vanilla_accelerator_conv2dnhwc_bias"),
+}
+# the conv2d of relay_passes.WinogradWeights on transformed weights, see strategies.py
+winograd_blocks = ["conv2d_winograd"]
+# Winograd F(2x2, 3x3) kernels: (conv2d kernel, conv2d kernel with fused epilogue)
+winograd_kernels = ("vanilla_accelerator_conv2dnchw_winograd",
+                    "vanilla_accelerator_conv2dnchw_winograd_bias")
+
+def conv2d_pass(rewriter: pass_utils.BlockRewriter, mod, ctx):
+    index = rewriter.index
+    # fold_padding: read the unpadded input in the conv2d kernel instead of
+    # materializing the padded input with vanilla_accelerator_pad
+    _fold = bool(pass_utils.target_attr(index.func, "fold_padding", True))
+    # num_threads: worker threads the conv2d kernel spreads its tiles over
+    _threads = int(pass_utils.target_attr(index.func, "num_threads", 1))
+
+    def _lower_pad(blk):
+        block = index.blocks[blk]
+        loops = index.loops[blk]
+        if block.writes[0].buffer.dtype != "float32":
+            # vanilla_accelerator_pad is float only
+            return None
+        consumers = index.find_consumers(block.writes[0].buffer)
+        if any(pass_utils.block_kind(c) not in conv2d_blocks for c in consumers):
+            # it pads the (h, w) planes of NCHW conv2d inputs with zeros; NHWC and pooling
+            # inputs (padded with the lowest value for max) are left to their own lowering
+            return None
+        assert len(loops) == 4
+        _loops = dict(
+            n  = loops[0],
+            ci = loops[1],
+            h  = loops[2],
+            w  = loops[3],
+        )
+        (hpad, vpad) = pass_utils.get_padding(block)
+
+        irb = tvm.tir.ir_builder.create()
+        # extraction of loop offsets
+        for k, v in _loops.items():
+            assert v.min.value == 0
+        offset_order = ["w", "h", "ci"]
+        offsets = [_loops[i].extent.value for i in offset_order]
+        # padding is per channel plane, batches are just more planes
+        offsets[2] *= _loops["n"].extent.value
+        args = [block.reads[0].buffer, block.writes[0].buffer] + offsets + [hpad, vpad]
+        irb.emit(pass_utils.tir_call(irb, True, "vanilla_accelerator_pad", *args))
+        return irb.get()
+
+    def _lower_winograd(blk):
+        """
+        The weights arrive transformed, U = G g G^T, the kernel only transforms the input
+        """
+        block = index.blocks[blk]
+        if pass_utils.io_dtypes(block) != ("float32", "float32"):
+            return None
+        (ifmap, u) = [r.buffer for r in block.reads]
+        conv_out   = block.writes[0].buffer
+        pad        = pass_utils.find_pad(index, ifmap) if _fold else None
+        epilogue   = pass_utils.find_epilogue(index, conv_out)
+
+        fused   = []
+        removed = []
+        if pad is None:
+            padding = [0, 0]
         else:
-            return func
-
-    def _detect_and_replace_conv2d(
-        func: tvm.tir.PrimFunc, mod: tvm.ir.IRModule, ctx: tvm.ir.transform.PassContext
-    ) -> tvm.tir.PrimFunc:
-        def _replace_conv2d(op):
-            if op == _entry_node:
-                (inputs, outputs) = pass_utils.stmt_analysis(op)
-
-                irb = tvm.tir.ir_builder.create()
-                # extraction of loop offsets
-                for k, v in _loops.items():
-                    assert v.min.value == 0
-                offset_order = ["co", "w", "h", "ci", "kh", "kw"]
-                offsets = [_loops[i].extent.value for i in offset_order]
-                args = inputs + outputs + offsets
-                irb.emit(pass_utils.tir_call(irb, True, "vanilla_accelerator_conv2dnchw", *args))
-                irb_result = irb.get()
-                return irb_result
-            else:
-                return op
-
-        sch = tir.Schedule(func)
-
-        if pass_utils.has_block("conv2d_nchw", func):
-            conv2d_block = sch.get_block("conv2d_nchw")
-            rv_loops = sch.get_loops(conv2d_block)
-            assert len(rv_loops) == 7
-            loops = dict(
-                n  =rv_loops[0],
-                co =rv_loops[1],
-                h  =rv_loops[2],
-                w  =rv_loops[3],
-                ci =rv_loops[4],
-                kh =rv_loops[5],
-                kw =rv_loops[6],
-            )
-            _entry_node = sch.get(rv_loops[1])
-            _loops = {k: sch.get(v) for k, v in loops.items()}
-
-            x = tvm.tir.stmt_functor.ir_transform(
-                func.body, None, _replace_conv2d, ["tir.For", "tir.SeqStmt"]
-            )
-            return func.with_body(x)
+            (ifmap, padding) = (pad[0], list(pad[1]))
+            fused.append(pad[2])
+            removed.append(block.reads[0].buffer)
+        (n, oc, oh, ow) = [int(x) for x in conv_out.shape]
+        (_, ic, ih, iw) = [int(x) for x in ifmap.shape]
+        shape = [n, oc, ow, oh, ic, iw, ih] + padding
+        if epilogue is None:
+            args  = [ifmap, u, conv_out] + shape + [_threads]
+            fname = winograd_kernels[0]
         else:
-            return func
-
-    r = _detect_and_replace_pad(func, mod, ctx)
-    r = _detect_and_replace_conv2d(r, mod, ctx)
-    return r
+            (bias, result, relu, blocks, buffers) = epilogue
+            bstrides = pass_utils.broadcast_strides(bias.shape, conv_out.shape)
+            args  = [ifmap, u, bias, result] + shape + bstrides + [relu, _threads]
+            fname = winograd_kernels[1]
+            fused.extend(blocks)
+            removed.extend(buffers)
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return (irb.get(), fused, removed)
+
+    def _lower_conv2d(blk):
+        block   = index.blocks[blk]
+        loops   = index.loops[blk]
+        kernels = conv2d_kernels.get(pass_utils.io_dtypes(block))
+        if kernels is None:
+            return None
+        assert len(loops) == conv2d_blocks[pass_utils.block_kind(blk)]
+        for v in loops:
+            assert v.min.value == 0
+
+        inputs   = [r.buffer for r in block.reads]
+        conv_out = block.writes[0].buffer
+        pad      = pass_utils.find_pad(index, inputs[0]) if _fold else None
+        epilogue = pass_utils.find_epilogue(index, conv_out)
+
+        fused   = []
+        removed = []
+        if pad is None:
+            padding = [0, 0]
+        else:
+            inputs  = [pad[0]] + inputs[1:]
+            padding = list(pad[1])
+            fused.append(pad[2])
+            removed.append(block.reads[0].buffer)
+        (ifmap, weights) = inputs
+        (n, oc, oh, ow)  = [int(x) for x in conv_out.shape]
+        (_, ic, ih, iw)  = [int(x) for x in ifmap.shape]
+        (_, icg, kh, kw) = [int(x) for x in weights.shape]
+        (strides, dilations) = pass_utils.get_window(block)
+        offsets = [n, oc, ow, oh, ic, kh, kw, iw, ih] + padding + strides + dilations
+        offsets = offsets + [ic // icg]
+        pool = None
+        if epilogue is not None and pass_utils.io_dtypes(block) == ("float32", "float32"):
+            pool = pass_pool.find_pool(index, epilogue[1], _fold)
+        # register tile shape from the tuning log, see autotune.conv2d_tile
+        tile    = autotune.conv2d_tile(index.func, kernels[0], pass_utils.io_dtypes(block),
+                                       offsets, _threads)
+        threads = [tile, _threads]
+        if epilogue is None:
+            args  = inputs + [conv_out] + offsets + threads
+            fname = kernels[0]
+        elif pool is not None:
+            # the conv2d result only lives in the kernel, the pool output is written
+            (bias, result, relu, blocks, buffers) = epilogue
+            (pool_out, window, pool_blocks, pool_buffers) = pool
+            (pool_h, pool_w) = [int(x) for x in pool_out.shape[2:]]
+            bstrides = pass_utils.broadcast_strides(bias.shape, conv_out.shape)
+            args  = inputs + [bias, pool_out] + offsets + bstrides + [relu, pool_w, pool_h] + \
+                window + threads
+            fname = pass_pool.conv2d_pool_kernel
+            fused.extend(blocks + pool_blocks)
+            removed.extend(buffers + pool_buffers)
+        else:
+            (bias, result, relu, blocks, buffers) = epilogue
+            # bias strides over (n, co, h, w) of the conv2d output
+            bstrides = pass_utils.broadcast_strides(bias.shape, conv_out.shape)
+            args  = inputs + [bias, result] + offsets + bstrides + [relu] + threads
+            fname = kernels[1]
+            fused.extend(blocks)
+            removed.extend(buffers)
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return (irb.get(), fused, removed)
+
+    def _lower_conv2d_nhwc(blk):
+        block   = index.blocks[blk]
+        loops   = index.loops[blk]
+        kernels = conv2d_nhwc_kernels.get(pass_utils.io_dtypes(block))
+        if kernels is None:
+            return None
+        assert len(loops) == conv2d_nhwc_blocks[pass_utils.block_kind(blk)]
+
+        inputs   = [r.buffer for r in block.reads]
+        conv_out = block.writes[0].buffer
+        pad      = pass_utils.find_pad(index, inputs[0], pass_utils.nhwc_axes) \
+            if _fold else None
+        epilogue = pass_utils.find_epilogue(index, conv_out)
+
+        fused   = []
+        removed = []
+        if pad is None:
+            padding = [0, 0]
+        else:
+            inputs  = [pad[0]] + inputs[1:]
+            padding = list(pad[1])
+            fused.append(pad[2])
+            removed.append(block.reads[0].buffer)
+        (ifmap, weights) = inputs
+        (n, oh, ow, oc)  = [int(x) for x in conv_out.shape]
+        (_, ih, iw, ic)  = [int(x) for x in ifmap.shape]
+        (kh, kw, icg, _) = [int(x) for x in weights.shape]
+        if icg != ic:
+            # grouped NHWC convs are left to the default lowering
+            return None
+        (strides, dilations) = pass_utils.get_window(block, pass_utils.nhwc_axes)
+        offsets = [n, oc, ow, oh, ic, kh, kw, iw, ih] + padding + strides + dilations
+        if epilogue is None:
+            args  = inputs + [conv_out] + offsets + [_threads]
+            fname = kernels[0]
+        else:
+            (bias, result, relu, blocks, buffers) = epilogue
+            # bias strides over (n, h, w, co) of the conv2d output
+            bstrides = pass_utils.broadcast_strides(bias.shape, conv_out.shape)
+            args  = inputs + [bias, result] + offsets + bstrides + [relu, _threads]
+            fname = kernels[1]
+            fused.extend(blocks)
+            removed.extend(buffers)
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return (irb.get(), fused, removed)
+
+    # conv2d first: a folded pad block is claimed before the pad lowering runs
+    for blk in index.find(conv2d_blocks):
+        lowered = _lower_conv2d(blk)
+        if lowered is not None:
+            rewriter.replace(blk, *lowered)
+    for blk in index.find(conv2d_nhwc_blocks):
+        lowered = _lower_conv2d_nhwc(blk)
+        if lowered is not None:
+            rewriter.replace(blk, *lowered)
+    for blk in index.find(winograd_blocks):
+        lowered = _lower_winograd(blk)
+        if lowered is not None:
+            rewriter.replace(blk, *lowered)
+
+    for blk in index.find(pass_utils.pad_blocks):
+        if rewriter.is_free(blk):
+            lowered = _lower_pad(blk)
+            if lowered is not None:
+                rewriter.replace(blk, lowered)
@@ -0,0 +1,49 @@
+import tvm
+from tvm import tir
+import pass_utils
+
+# nn.dense lowers to `T_matmul_NT` (older TVM versions name it `T_dense`)
+dense_blocks = ["T_matmul_NT", "T_dense"]
+
+def dense_pass(rewriter: pass_utils.BlockRewriter, mod, ctx):
+    index = rewriter.index
+
+    def _lower_dense(blk):
+        block = index.blocks[blk]
+        loops = index.loops[blk]
+        if any(r.buffer.dtype != "float32" for r in block.reads):
+            return None
+        assert len(loops) == 3
+        _loops = dict(
+            m = loops[0],
+            n = loops[1],
+            k = loops[2],
+        )
+        inputs    = [r.buffer for r in block.reads]
+        dense_out = block.writes[0].buffer
+        epilogue  = pass_utils.find_epilogue(index, dense_out)
+
+        irb = tvm.tir.ir_builder.create()
+        # extraction of loop offsets
+        for k, v in _loops.items():
+            assert v.min.value == 0
+        offset_order = ["m", "n", "k"]
+        offsets = [_loops[i].extent.value for i in offset_order]
+        if epilogue is None:
+            args    = inputs + [dense_out] + offsets
+            fname   = "vanilla_accelerator_dense"
+            fused   = []
+            removed = []
+        else:
+            (bias, result, relu, fused, removed) = epilogue
+            # bias strides over (m, n) of the dense output
+            strides = pass_utils.broadcast_strides(bias.shape, dense_out.shape)
+            args  = inputs + [bias, result] + offsets + strides + [relu]
+            fname = "vanilla_accelerator_dense_bias"
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return (irb.get(), fused, removed)
+
+    for blk in index.find(dense_blocks):
+        lowered = _lower_dense(blk)
+        if lowered is not None:
+            rewriter.replace(blk, *lowered)
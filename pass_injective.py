@@ -1,69 +1,226 @@
 import tvm
-from tvm import tir
+from collections import namedtuple
 from functools import reduce
 import pass_utils
+import autotune
 
-tir_func = {"T_add": "vanilla_accelerator_addvec"}
-
-def add_pass(func, mod, ctx):
-    #_loops = dict()
-    #_handles = []
-    _entry_node = None
-
-    def _detect_and_replace_add(
-        func: tvm.tir.PrimFunc, mod: tvm.ir.IRModule, ctx: tvm.ir.transform.PassContext
-    ) -> tvm.tir.PrimFunc:
-        def _replace_add(op):
-            if op == _entry_node:
-                (inputs, outputs) = pass_utils.stmt_analysis(op)
-                in1       = inputs[0]
-                in2       = inputs[1]
-                out       = outputs[0]
-                in1_elm   = int(reduce(lambda x, y: x * y, in1.shape))
-                in2_elm   = int(reduce(lambda x, y: x * y, in2.shape))
-                if in1_elm < in2_elm :
-                    width = in2_elm
-                    bc    = in2_elm // in1_elm
-                    args  = [in2.data, in1.data, out.data, width, bc]
-                    fname = tir_func["T_add"] + "_bc"
-                elif in1_elm > in2_elm :
-                    width = in1_elm
-                    bc    = in1_elm // in2_elm
-                    args  = [in1.data, in2.data, out.data, width, bc]
-                    fname = tir_func["T_add"] + "_bc"
-                else :
-                    width = in1_elm
-                    args  = [in1.data, in2.data, out.data, width]
-                    fname = tir_func["T_add"]
-
-                irb = tvm.tir.ir_builder.create()
-                irb.emit(pass_utils.tir_call(irb, True, fname, *args))
-                return irb.get()
-            else:
-                return op
-
-        sch = tir.Schedule(func)
-
-        blk_list = pass_utils.find_blocks("T_add", func)
-        if len(blk_list) != 0:
-            func_update = func
-
-            for blk in blk_list :
-                add_block   = sch.get_block(blk)
-                rv_loops    = sch.get_loops(add_block)
-                _entry_node = sch.get(rv_loops[0])
-                #_loops      = [sch.get(v) for v in rv_loops]
-                #_handles    = func_update.buffer_map.items()
-
-                x = tvm.tir.stmt_functor.ir_transform(
-                    func_update.body, None, _replace_add, ["tir.For", "tir.SeqStmt"]
-                )
-
-                func_update = func.with_body(x)
-
-            return func_update
+# element type -> kernel variant suffix
+tir_dtypes = {"float32": "", "int32": "_int32", "int8": "_int8"}
+# fewest and most inputs of the vanilla_accelerator_addvec_n<k> kernels (VA_ADD_MAX_INPUTS)
+min_add_inputs = 3
+max_add_inputs = 16
+
+# relay_op/arity build the MergeComposite pattern, block/match select the TIR block,
+# match(value) returns (input buffers, extra kernel arguments) or None,
+# tuned kernels take `vw` (vector lanes, the `dimension` target attribute) and `chunk`
+# arguments before nthreads, see autotune.add_chunk
+EltwiseOp = namedtuple("EltwiseOp", ["relay_op", "block", "arity", "kernel", "dtypes", "match",
+                                     "tuned"], defaults=[False])
+
+def add_n_kernel(dtype: str, k: int) -> str:
+    """
+    The kernel summing `k` inputs of `dtype`, with a fixed argument list
+    (result, w, nthreads, in0, ..., in{k-1}) as call_extern declares it
+    """
+    return eltwise_ops["add"].kernel + tir_dtypes[dtype] + f"_n{k}"
+
+def _match_binary(node) :
+    def _match(value):
+        if not isinstance(value, node):
+            return None
+        if not all(isinstance(x, tvm.tir.BufferLoad) for x in (value.a, value.b)):
+            return None
+        return ([value.a.buffer, value.b.buffer], [])
+    return _match
+
+def _match_relu(value) :
+    if not isinstance(value, tvm.tir.Max) or not isinstance(value.a, tvm.tir.BufferLoad):
+        return None
+    if not isinstance(value.b, tvm.tir.FloatImm) or value.b.value != 0:
+        return None
+    return ([value.a.buffer], [])
+
+def _match_clip(value) :
+    # topi.clip: max(min(x, a_max), a_min)
+    if not isinstance(value, tvm.tir.Max) or not isinstance(value.a, tvm.tir.Min):
+        return None
+    if not isinstance(value.a.a, tvm.tir.BufferLoad):
+        return None
+    bounds = [tvm.arith.Analyzer().simplify(x) for x in (value.b, value.a.b)]
+    if not all(isinstance(x, tvm.tir.FloatImm) for x in bounds):
+        return None
+    return ([value.a.a.buffer], bounds)
+
+eltwise_ops = {
+    "add"      : EltwiseOp("add", "T_add", 2, "vanilla_accelerator_addvec",
+                           ["float32", "int32", "int8"], _match_binary(tvm.tir.Add), True),
+    "subtract" : EltwiseOp("subtract", "T_subtract", 2, "vanilla_accelerator_subvec",
+                           ["float32"], _match_binary(tvm.tir.Sub)),
+    "multiply" : EltwiseOp("multiply", "T_multiply", 2, "vanilla_accelerator_mulvec",
+                           ["float32"], _match_binary(tvm.tir.Mul)),
+    "maximum"  : EltwiseOp("maximum", "T_maximum", 2, "vanilla_accelerator_maxvec",
+                           ["float32"], _match_binary(tvm.tir.Max)),
+    "relu"     : EltwiseOp("nn.relu", "compute", 1, "vanilla_accelerator_relu",
+                           ["float32"], _match_relu),
+    "clip"     : EltwiseOp("clip", "compute", 1, "vanilla_accelerator_clip",
+                           ["float32"], _match_clip),
+}
+
+def match_eltwise(block: tvm.tir.Block) :
+    """
+    (registry entry, input buffers, extra kernel arguments) if `block` computes one of the
+    `eltwise_ops` on a dtype it has a kernel for, None otherwise
+    """
+    store = block.body
+    if not isinstance(store, tvm.tir.BufferStore):
+        return None
+    for op in eltwise_ops.values():
+        if pass_utils.block_kind(block.name_hint) != op.block:
+            continue
+        matched = op.match(store.value)
+        if matched is None:
+            continue
+        (inputs, params) = matched
+        if store.buffer.dtype not in op.dtypes:
+            return None
+        if any(b.dtype != store.buffer.dtype for b in inputs):
+            return None
+        return (op, inputs, params)
+    return None
+
+def get_strides(in1: tvm.tir.Buffer, in2: tvm.tir.Buffer, out: tvm.tir.Buffer) :
+    """
+    Describe `in1 + in2` (numpy broadcasting) for vanilla_accelerator_addvec_strided as
+    (dims, in1 strides, in2 strides), each padded to 4 entries. Unit dimensions are dropped and
+    neighbouring dimensions both operands walk contiguously are collapsed. None if more than 4
+    dimensions remain.
+    """
+    strides1 = pass_utils.broadcast_strides(in1.shape, out.shape)
+    strides2 = pass_utils.broadcast_strides(in2.shape, out.shape)
+
+    merged = []
+    for e, s1, s2 in zip([int(x) for x in out.shape], strides1, strides2):
+        if e == 1:
+            continue
+        if merged and merged[-1][1] == s1 * e and merged[-1][2] == s2 * e:
+            merged[-1] = (merged[-1][0] * e, s1, s2)
+        else:
+            merged.append((e, s1, s2))
+    if len(merged) > 4:
+        return None
+
+    merged = [(1, 0, 0)] * (4 - len(merged)) + merged
+    return tuple(list(x) for x in zip(*merged))
+
+def get_add_tree(index: pass_utils.BlockIndex, blk: str) :
+    """
+    Flatten the tree of same-shape `T_add` blocks rooted at `blk`, following intermediates
+    that are only read by the tree. Returns (leaf buffers, fused block names, removed
+    buffers) or None if `blk` is not an elementwise add of two buffer loads.
+    """
+    store = index.blocks[blk].body
+    if not isinstance(store, tvm.tir.BufferStore) or not isinstance(store.value, tvm.tir.Add):
+        return None
+    operands = [store.value.a, store.value.b]
+    if not all(isinstance(x, tvm.tir.BufferLoad) for x in operands):
+        return None
+
+    out     = store.buffer
+    leaves  = []
+    blocks  = []
+    removed = []
+    for buf in [x.buffer for x in operands]:
+        producers = index.find_producers(buf)
+        subtree   = None
+        if (len(producers) == 1 and pass_utils.block_kind(producers[0]) == "T_add"
+                and index.is_intermediate(buf)
+                and len(index.find_consumers(buf)) == 1
+                and buf.dtype == out.dtype
+                and [int(x) for x in buf.shape] == [int(x) for x in out.shape]):
+            subtree = get_add_tree(index, producers[0])
+        if subtree is None:
+            leaves.append(buf)
+        else:
+            leaves.extend(subtree[0])
+            blocks.extend([producers[0]] + subtree[1])
+            removed.extend([buf] + subtree[2])
+    return (leaves, blocks, removed)
+
+def eltwise_pass(rewriter: pass_utils.BlockRewriter, mod, ctx):
+    index = rewriter.index
+    _threads = int(pass_utils.target_attr(index.func, "num_threads", 1))
+    # 0 lets the kernels pick their default vector width
+    _lanes   = int(pass_utils.target_attr(index.func, "dimension", 0))
+
+    def _lower_add_tree(blk):
+        out  = index.blocks[blk].writes[0].buffer
+        tree = get_add_tree(index, blk)
+        if tree is None or out.dtype not in tir_dtypes or index.nest(blk) is None:
+            return None
+        (leaves, fused, removed) = tree
+        out_shape = [int(x) for x in out.shape]
+        if len(leaves) < min_add_inputs or len(leaves) > max_add_inputs:
+            return None
+        if any([int(x) for x in b.shape] != out_shape for b in leaves):
+            # broadcasting leaves go through the binary kernels
+            return None
+        if not all(rewriter.is_free(b) for b in fused):
+            return None
+
+        width = int(reduce(lambda x, y: x * y, out.shape, 1))
+        args  = [out.data, width, _threads] + [b.data for b in leaves]
+        fname = add_n_kernel(out.dtype, len(leaves))
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return (irb.get(), fused, removed)
+
+    def _lower_eltwise(blk):
+        block  = index.blocks[blk]
+        _match = match_eltwise(block)
+        if _match is None or index.nest(blk) is None:
+            return None
+        (eltwise, inputs, params) = _match
+        out     = block.body.buffer
+        out_elm = int(reduce(lambda x, y: x * y, out.shape, 1))
+        in_elm  = [int(reduce(lambda x, y: x * y, b.shape, 1)) for b in inputs]
+        suffix  = tir_dtypes[out.dtype]
+
+        if all(e == out_elm for e in in_elm) :
+            scalars = [out_elm]
+            fname   = eltwise.kernel + suffix
+        elif eltwise.arity == 2 :
+            strides = get_strides(inputs[0], inputs[1], out)
+            if strides is None :
+                return None
+            (dims, strides1, strides2) = strides
+            scalars = dims + strides1 + strides2
+            fname   = eltwise.kernel + suffix + "_strided"
         else :
-            return func
+            return None
+
+        args = [b.data for b in inputs] + [out.data] + scalars + params
+        if eltwise.tuned :
+            args.append(_lanes)
+            args.append(autotune.add_chunk(index.func, fname, out.dtype, scalars, _lanes,
+                                           _threads))
+        args.append(_threads)
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, fname, *args))
+        return irb.get()
+
+    # chains of adds first, roots come after the adds they consume
+    for blk in reversed(index.find(["T_add"])) :
+        if rewriter.is_free(blk):
+            lowered = _lower_add_tree(blk)
+            if lowered is not None:
+                rewriter.replace(blk, *lowered)
 
-    r = _detect_and_replace_add(func, mod, ctx)
-    return r
+    # the remaining elementwise ops one by one
+    kinds = [op.block for op in eltwise_ops.values()]
+    for blk in index.find(kinds) :
+        if rewriter.is_free(blk):
+            stmt = _lower_eltwise(blk)
+            if stmt is not None:
+                rewriter.replace(blk, stmt)
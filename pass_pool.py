@@ -0,0 +1,89 @@
+import tvm
+import pass_utils
+
+# nn.max_pool2d / nn.avg_pool2d (NCHW) reduce in `pool_max` / `pool_sum`, avg_pool2d then
+# divides in a `pool_avg` block that stays in TIR
+pool_kernels = {
+    "pool_max" : "vanilla_accelerator_maxpool2d",
+    "pool_sum" : "vanilla_accelerator_sumpool2d",
+}
+# conv2d with fused epilogue and max pool, writing only the pooled map
+conv2d_pool_kernel = "vanilla_accelerator_conv2dnchw_bias_maxpool"
+
+def get_pool(index: pass_utils.BlockIndex, blk: str, fold: bool) :
+    """
+    Describe the float NCHW pooling block `blk`: (input, output, window, fused pad block or
+    None, removed padded input or None) with window = (kh, kw, sh, sw, dh, dw, padh, padw).
+    A pad block only feeding the pool is folded into the window when `fold` is set, the
+    kernels skip padded taps. None if the block is not supported.
+    """
+    block = index.blocks[blk]
+    if len(block.reads) != 1 or pass_utils.io_dtypes(block) != ("float32", "float32"):
+        return None
+    if len(block.iter_vars) != 6 or len(index.loops[blk]) != 6:
+        return None
+    ifmap  = block.reads[0].buffer
+    out    = block.writes[0].buffer
+    extent = [int(iv.dom.extent) for iv in block.iter_vars
+              if iv.iter_type == tvm.tir.IterVar.CommReduce]
+    if len(extent) != 2:
+        return None
+    (strides, dilations) = pass_utils.get_window(block)
+
+    pad = pass_utils.find_pad(index, ifmap) if fold else None
+    if pad is None:
+        return (ifmap, out, extent + strides + dilations + [0, 0], None, None)
+    return (pad[0], out, extent + strides + dilations + list(pad[1]), pad[2], ifmap)
+
+def find_pool(index: pass_utils.BlockIndex, buf: tvm.tir.Buffer, fold: bool) :
+    """
+    Detect a max pool consuming `buf`, the output of a conv2d epilogue, directly or through
+    its pad block. Returns (output, window, fused block names, removed buffers) or None.
+    """
+    if not index.is_intermediate(buf):
+        return None
+    consumers = index.find_consumers(buf)
+    if len(consumers) != 1:
+        return None
+    blk = consumers[0]
+    if pass_utils.block_kind(blk) in pass_utils.pad_blocks and fold:
+        padded = index.blocks[blk].writes[0].buffer
+        if not index.is_intermediate(padded) or len(index.find_consumers(padded)) != 1:
+            return None
+        blk = index.find_consumers(padded)[0]
+    if pass_utils.block_kind(blk) != "pool_max":
+        return None
+
+    pool = get_pool(index, blk, fold)
+    if pool is None or not pool[0].same_as(buf):
+        return None
+    (_, out, window, pad_block, padded) = pool
+    blocks  = [blk] + ([pad_block] if pad_block is not None else [])
+    removed = [buf] + ([padded] if padded is not None else [])
+    return (out, window, blocks, removed)
+
+def pool_pass(rewriter: pass_utils.BlockRewriter, mod, ctx):
+    index = rewriter.index
+    _fold    = bool(pass_utils.target_attr(index.func, "fold_padding", True))
+    _threads = int(pass_utils.target_attr(index.func, "num_threads", 1))
+
+    def _lower_pool(blk):
+        pool = get_pool(index, blk, _fold)
+        if pool is None or index.nest(blk) is None:
+            return None
+        (ifmap, out, window, pad_block, padded) = pool
+        (n, c, oh, ow) = [int(x) for x in out.shape]
+        (_, _, ih, iw) = [int(x) for x in ifmap.shape]
+        args  = [ifmap, out, n, c, ow, oh, iw, ih] + window + [_threads]
+        fused   = [pad_block] if pad_block is not None else []
+        removed = [padded] if padded is not None else []
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, pool_kernels[pass_utils.block_kind(blk)], *args))
+        return (irb.get(), fused, removed)
+
+    for blk in index.find(pool_kernels):
+        if rewriter.is_free(blk):
+            lowered = _lower_pool(blk)
+            if lowered is not None:
+                rewriter.replace(blk, *lowered)
@@ -0,0 +1,112 @@
+import tvm
+from functools import reduce
+import pass_utils
+
+tir_func = {"requantize": "vanilla_accelerator_requantize"}
+
+def get_fixed_point_multiply(block: tvm.tir.Block) :
+    """
+    (multiplier, shift) of a fixed_point_multiply block,
+    out[i] = q_multiply_shift(in[i], multiplier, 31, shift), or None
+    """
+    store = block.body
+    if not isinstance(store, tvm.tir.BufferStore) or not isinstance(store.value, tvm.tir.Call):
+        return None
+    call = store.value
+    if not call.op.same_as(tvm.ir.Op.get("tir.q_multiply_shift")):
+        return None
+    (x, multiplier, q, shift) = call.args
+    if not isinstance(x, tvm.tir.BufferLoad) or x.buffer.dtype != "int32":
+        return None
+    if not all(isinstance(a, tvm.tir.IntImm) for a in (multiplier, q, shift)) or q.value != 31:
+        return None
+    return (multiplier.value, shift.value)
+
+def get_scalar(expr: tvm.tir.PrimExpr, index: pass_utils.BlockIndex) :
+    """
+    Integer value of `expr`, either an immediate or a load of a 0-d constant buffer
+    (scalar relay constants are lowered to a `compile_engine_const` block), or None
+    """
+    expr = tvm.arith.Analyzer().simplify(expr)
+    if isinstance(expr, tvm.tir.IntImm):
+        return expr.value
+    if not isinstance(expr, tvm.tir.BufferLoad) or len(expr.buffer.shape) != 0:
+        return None
+    producers = index.find_producers(expr.buffer)
+    if len(producers) != 1:
+        return None
+    value = index.blocks[producers[0]].body.value
+    return value.value if isinstance(value, tvm.tir.IntImm) else None
+
+def find_requantize(index: pass_utils.BlockIndex, block_name: str) :
+    """
+    Follow the canonical qnn.requantize chain starting at a fixed_point_multiply block:
+    fixed_point_multiply -> [add zero point] -> clip -> cast to int8. Returns (input,
+    result, [multiplier, shift, zero_point, lo, hi], fused block names, removed buffers) or None.
+    """
+    block = index.blocks[block_name]
+    fpm = get_fixed_point_multiply(block)
+    if fpm is None:
+        return None
+
+    inp     = block.reads[0].buffer
+    buf     = block.writes[0].buffer
+    blocks  = []
+    removed = []
+    zp      = 0
+    clip    = None
+    while True:
+        if not index.is_intermediate(buf):
+            return None
+        consumers = index.find_consumers(buf)
+        if len(consumers) != 1:
+            return None
+        consumer = index.blocks[consumers[0]]
+        if not isinstance(consumer.body, tvm.tir.BufferStore):
+            return None
+        value    = consumer.body.value
+        blocks.append(consumers[0])
+        removed.append(buf)
+        buf = consumer.writes[0].buffer
+
+        if isinstance(value, tvm.tir.Cast):
+            # the final cast ends the chain
+            if clip is None or buf.dtype != "int8":
+                return None
+            break
+        elif isinstance(value, tvm.tir.Add) and clip is None and len(blocks) == 1:
+            zp = get_scalar(value.b, index)
+            if zp is None:
+                zp = get_scalar(value.a, index)
+            if zp is None:
+                return None
+        elif isinstance(value, tvm.tir.Max) and isinstance(value.a, tvm.tir.Min):
+            clip = (get_scalar(value.b, index), get_scalar(value.a.b, index))
+            if None in clip:
+                return None
+        else:
+            return None
+
+    return (inp, buf, list(fpm) + [zp] + list(clip), blocks, removed)
+
+def requantize_pass(rewriter: pass_utils.BlockRewriter, mod, ctx):
+    index = rewriter.index
+    _threads = int(pass_utils.target_attr(index.func, "num_threads", 1))
+
+    def _lower_requantize(blk):
+        requant = find_requantize(index, blk)
+        if requant is None or index.nest(blk) is None:
+            return None
+        (inp, result, params, fused, removed) = requant
+        width = int(reduce(lambda x, y: x * y, inp.shape, 1))
+        args  = [inp.data, result.data, width] + params + [_threads]
+
+        irb = tvm.tir.ir_builder.create()
+        irb.emit(pass_utils.tir_call(irb, True, tir_func["requantize"], *args))
+        return (irb.get(), fused, removed)
+
+    for blk in index.find(["compute"]):
+        if rewriter.is_free(blk):
+            lowered = _lower_requantize(blk)
+            if lowered is not None:
+                rewriter.replace(blk, *lowered)
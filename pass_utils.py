@@ -1,36 +1,273 @@
+import re
 import tvm
 
-def has_block(name: str, func: tvm.tir.PrimFunc) -> bool:
+def block_kind(name: str) -> str:
     """
-    Determine of a tir.block with `name` exists in `func`
+    Block name without the `_<n>` suffix TVM adds to repeated operators
+    (`T_add_1` -> `T_add`)
     """
-    def _hb(op):
-        if isinstance(op, tvm.tir.Block):
-            found_blocks.append(op.name_hint)
+    return re.sub(r"_[0-9]+$", "", name)
 
-    found_blocks = []
-    tvm.tir.stmt_functor.post_order_visit(func.body, _hb)
-    return name in found_blocks
+def target_attr(func: tvm.tir.PrimFunc, name: str, default=None):
+    """
+    Value of the target attribute `name` of the target `func` is lowered for,
+    `default` if it is not set
+    """
+    if func.attrs is None or "target" not in func.attrs:
+        return default
+    target = func.attrs["target"]
+    if name not in target.attrs or target.attrs[name] == "":
+        return default
+    return target.attrs[name]
+
+def io_dtypes(block: tvm.tir.Block) :
+    """
+    (input, output) element types of `block`, used to pick the kernel variant.
+    None if its inputs do not share one type.
+    """
+    dtypes = {r.buffer.dtype for r in block.reads}
+    if len(dtypes) != 1:
+        return None
+    return (dtypes.pop(), block.writes[0].buffer.dtype)
+
+class BlockIndex:
+    """
+    Every block of a PrimFunc collected in one traversal, with the loops around it and the
+    blocks producing and consuming each buffer. Shared by all the sub-passes of
+    VanillaAcceleratorTirPass instead of re-visiting the function per query.
+    """
+
+    def __init__(self, func: tvm.tir.PrimFunc):
+        self.func      = func
+        self.names     = []
+        self.blocks    = {}
+        self.loops     = {}
+        self.producers = {}
+        self.consumers = {}
+        self.params    = set(func.buffer_map.values())
+        self._visit(func.body, [])
+
+    def _visit(self, stmt, loops):
+        if isinstance(stmt, tvm.tir.For):
+            self._visit(stmt.body, loops + [stmt])
+        elif isinstance(stmt, tvm.tir.SeqStmt):
+            for s in stmt.seq:
+                self._visit(s, loops)
+        elif isinstance(stmt, tvm.tir.BlockRealize):
+            self._visit(stmt.block, loops)
+        elif isinstance(stmt, tvm.tir.Block):
+            name = stmt.name_hint
+            self.names.append(name)
+            self.blocks[name] = stmt
+            self.loops[name]  = loops
+            for r in stmt.reads:
+                self.consumers.setdefault(r.buffer, []).append(name)
+            for w in stmt.writes:
+                self.producers.setdefault(w.buffer, []).append(name)
+            # loops inside a block belong to the blocks nested in it
+            self._visit(stmt.body, [])
+        elif isinstance(stmt, tvm.tir.IfThenElse):
+            self._visit(stmt.then_case, loops)
+            if stmt.else_case is not None:
+                self._visit(stmt.else_case, loops)
+        elif hasattr(stmt, "body"):
+            self._visit(stmt.body, loops)
+
+    def find(self, kinds) :
+        """
+        Names of the blocks whose `block_kind` is in `kinds`, in program order
+        """
+        return [n for n in self.names if block_kind(n) in kinds]
+
+    def nest(self, name: str) -> tvm.tir.For:
+        """
+        Outermost loop around block `name`, None if it has no loops
+        """
+        loops = self.loops[name]
+        return loops[0] if len(loops) != 0 else None
+
+    def find_consumers(self, buf: tvm.tir.Buffer) :
+        """
+        Names of the blocks reading `buf`
+        """
+        return self.consumers.get(buf, [])
+
+    def find_producers(self, buf: tvm.tir.Buffer) :
+        """
+        Names of the blocks writing `buf`
+        """
+        return self.producers.get(buf, [])
+
+    def is_intermediate(self, buf: tvm.tir.Buffer) -> bool:
+        """
+        True if `buf` is allocated inside the function rather than passed in as a parameter
+        """
+        return buf not in self.params
+
+class BlockRewriter:
+    """
+    Lowering decisions of all the sub-passes for one PrimFunc. Loop nests are replaced and
+    allocations dropped in a single ir_transform sweep by `apply`. Blocks lowered or fused
+    by one sub-pass are claimed so later sub-passes leave them alone.
+    """
+
+    def __init__(self, func: tvm.tir.PrimFunc):
+        self.index   = BlockIndex(func)
+        self.nests   = {}
+        self.claimed = set()
+        self.removed = set()
+
+    def is_free(self, name: str) -> bool:
+        return name not in self.claimed
+
+    def replace(self, name: str, stmt: tvm.tir.Stmt, fused=(), removed=()):
+        """
+        Replace the loop nest of block `name` with `stmt` and drop the nests of the `fused`
+        blocks, whose results are computed by `stmt`. The allocations of `removed` go away.
+        """
+        self.nests[self.index.nest(name)] = stmt
+        self.claimed.add(name)
+        for b in fused:
+            self.nests[self.index.nest(b)] = tvm.tir.Evaluate(0)
+            self.claimed.add(b)
+        self.removed.update(removed)
+
+    def apply(self) -> tvm.tir.PrimFunc:
+        if len(self.nests) == 0:
+            return self.index.func
+
+        def _pre(op):
+            return self.nests.get(op) if isinstance(op, tvm.tir.For) else None
 
-def find_blocks(name: str, func: tvm.tir.PrimFunc) :
-    def _hb(op):
-        if isinstance(op, tvm.tir.Block):
-            found_blocks.append(op.name_hint)
+        def _post(op):
+            if not isinstance(op, tvm.tir.Block):
+                return op
+            allocs = [b for b in op.alloc_buffers if b not in self.removed]
+            if len(allocs) == len(op.alloc_buffers):
+                return op
+            return tvm.tir.Block(
+                op.iter_vars, op.reads, op.writes, op.name_hint, op.body, op.init,
+                allocs, op.match_buffers, op.annotations,
+            )
 
-    found_blocks = []
-    tvm.tir.stmt_functor.post_order_visit(func.body, _hb)
-    return list(filter(lambda x: name in x, found_blocks))
+        x = tvm.tir.stmt_functor.ir_transform(
+            self.index.func.body, _pre, _post, ["tir.For", "tir.Block"]
+        )
+        return self.index.func.with_body(x)
 
-def stmt_analysis(stmt: tvm.tir.Stmt) :
-    def _hb(op):
-        if isinstance(op, tvm.tir.Block):
-            input_buf.extend(map(lambda x: x.buffer, op.reads))
-            output_buf.extend(map(lambda x: x.buffer, op.writes))
+def is_relu(block: tvm.tir.Block) -> bool:
+    """
+    Determine if `block` computes max(x, 0) of a single buffer load
+    """
+    store = block.body
+    if not isinstance(store, tvm.tir.BufferStore) or not isinstance(store.value, tvm.tir.Max):
+        return False
+    a, b = store.value.a, store.value.b
+    return (isinstance(a, tvm.tir.BufferLoad)
+            and isinstance(b, (tvm.tir.FloatImm, tvm.tir.IntImm)) and b.value == 0)
+
+def find_epilogue(index: BlockIndex, out: tvm.tir.Buffer) :
+    """
+    Detect a bias/residual `T_add` (optionally followed by relu) consuming `out`, the
+    output of an offloaded conv2d/dense. Returns (bias, result, relu, fused block names,
+    removed buffers) or None if `out` cannot be folded into the kernel epilogue.
+    """
+    def _single_consumer(buf):
+        if not index.is_intermediate(buf):
+            return None
+        consumers = index.find_consumers(buf)
+        if len(consumers) != 1:
+            return None
+        return consumers[0]
+
+    add_name = _single_consumer(out)
+    if add_name is None or not add_name.startswith("T_add"):
+        return None
+
+    add_block = index.blocks[add_name]
+    others = [r.buffer for r in add_block.reads if not r.buffer.same_as(out)]
+    result = add_block.writes[0].buffer
+    if len(others) != 1 or others[0].dtype != out.dtype:
+        return None
+    if [int(x) for x in result.shape] != [int(x) for x in out.shape]:
+        return None
+    bias = others[0]
+
+    blocks  = [add_name]
+    removed = [out]
+    relu    = 0
+    relu_name = _single_consumer(result)
+    if relu_name is not None and is_relu(index.blocks[relu_name]):
+        blocks.append(relu_name)
+        removed.append(result)
+        result = index.blocks[relu_name].writes[0].buffer
+        relu   = 1
+
+    return (bias, result, relu, blocks, removed)
+
+# blocks materializing a padded conv2d or pooling input
+pad_blocks = ["pad_temp", "PaddedInput"]
+# (height, width) axes of the data layouts
+nchw_axes = (2, 3)
+nhwc_axes = (1, 2)
+
+def get_padding(block: tvm.tir.Block, axes=nchw_axes) :
+    def _check_padding(hvmin, var):
+        # the pad block reads `data[.., v_h - padh, v_w - padw]`
+        return -int(tvm.arith.Analyzer().simplify(hvmin - var))
+
+    return tuple(_check_padding(block.reads[0].region[a].min, block.iter_vars[a].var)
+                 for a in axes)
+
+def get_window(block: tvm.tir.Block, axes=nchw_axes) :
+    """
+    Strides and dilations of a conv2d or pooling block, from the index expressions it reads
+    the input with: data[.., h * stride_h + kh * dilation_h, w * stride_w + kw * dilation_w]
+    """
+    region  = block.reads[0].region
+    reduced = [iv.var for iv in block.iter_vars if iv.iter_type == tvm.tir.IterVar.CommReduce]
+    window  = []
+    for a in axes:
+        # the one reduction variable indexing this axis is the window tap, kh or kw
+        coeffs = tvm.arith.detect_linear_equation(region[a].min,
+                                                  [block.iter_vars[a].var] + reduced)
+        taps   = [int(c) for c in coeffs[1:-1] if int(c) != 0]
+        window.append((int(coeffs[0]), taps[0] if taps else 1))
+    return ([s for s, _ in window], [d for _, d in window])
+
+def find_pad(index: BlockIndex, conv_in: tvm.tir.Buffer, axes=nchw_axes) :
+    """
+    Detect a pad block whose output `conv_in` is only consumed by one conv2d or pool,
+    padding the `axes` of its input. Returns (unpadded input, (padh, padw), pad block name)
+    or None.
+    """
+    producers = index.find_producers(conv_in)
+    if len(producers) != 1 or block_kind(producers[0]) not in pad_blocks:
+        return None
+    if not index.is_intermediate(conv_in):
+        return None
+    if len(index.find_consumers(conv_in)) != 1:
+        return None
+
+    pad_block = index.blocks[producers[0]]
+    return (pad_block.reads[0].buffer, get_padding(pad_block, axes), producers[0])
+
+def broadcast_strides(shape, out_shape) :
+    """
+    Element strides to index a buffer of `shape` broadcast (numpy rules) to `out_shape`.
+    Broadcast dimensions get a stride of 0.
+    """
+    shape     = [int(x) for x in shape]
+    out_shape = [int(x) for x in out_shape]
+    shape     = [1] * (len(out_shape) - len(shape)) + shape
 
-    input_buf = []
-    output_buf = []
-    tvm.tir.stmt_functor.post_order_visit(stmt.body, _hb)
-    return (input_buf, output_buf)
+    strides = []
+    stride  = 1
+    for dim, out_dim in reversed(list(zip(shape, out_shape))):
+        assert dim in (1, out_dim)
+        strides.insert(0, stride if dim == out_dim else 0)
+        stride *= dim
+    return strides
 
 def tir_call(ib: tvm.tir.ir_builder, extern: bool, name: str, *args):
     """
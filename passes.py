@@ -16,23 +16,83 @@
 # under the License.
 """Transform passes for the vanilla_accelerator accelerator"""
 
+import contextlib
 import tvm
 from tvm import tir
 from tvm.relay.backend.contrib.uma.api.utils import add_llvm_to_block
 #from functools import reduce
 import pass_injective
 import pass_conv2d
+import pass_dense
+import pass_requantize
+import pass_pool
 import pass_buffer
 import pass_utils
+import pass_cache
+import instrument
+
+# lowerings shared by every VanillaAcceleratorTirPass, see `cache_size`/`cache_dir`
+lowering_cache = pass_cache.LoweringCache()
+# function attribute carrying the names of the offloaded and host blocks, so cache hits
+# report them too
+blocks_attr = "vanilla_accelerator_blocks"
+
+def lowered_blocks(func: tvm.tir.PrimFunc) :
+    """
+    (offloaded, host) block names of a lowered function
+    """
+    if func.attrs is None or blocks_attr not in func.attrs:
+        return ([], [])
+    blocks = func.attrs[blocks_attr]
+    return ([str(n) for n in blocks["offloaded"]], [str(n) for n in blocks["host"]])
 
 @tvm.tir.transform.prim_func_pass(opt_level=2)
 class VanillaAcceleratorTirPass:
     def transform_function(
         self, func: tvm.tir.PrimFunc, mod: tvm.ir.IRModule, ctx: tvm.ir.transform.PassContext
     ) -> tvm.tir.PrimFunc:
-        #update_func = pass_buffer.add_device_buffer(func, mod, ctx)
-        update_func = pass_conv2d.conv2d_pass(func, mod, ctx)
-        update_func = pass_injective.add_pass(update_func, mod, ctx)
-        update_func = pass_buffer.add_device_buffer(update_func, mod, ctx)
-        return update_func
-        #return self._vanilla_accelerator_add_pass(func, mod, ctx)
+        lowering_cache.capacity   = int(pass_utils.target_attr(func, "cache_size", 128))
+        lowering_cache.path       = pass_utils.target_attr(func, "cache_dir", "") or None
+        lowering_cache.tuning_log = pass_utils.target_attr(func, "tuning_log", "") or None
+        with instrument.recorder.function(func) as record:
+            lower = lambda f: self._lower(f, mod, ctx, record)
+            if record is None:
+                return lowering_cache.lookup(func, lower)
+
+            record.dump("before", func)
+            misses = lowering_cache.misses
+            update_func = lowering_cache.lookup(func, lower)
+            record.cached  = lowering_cache.misses == misses
+            record.staging = pass_buffer.cost_report(update_func)
+            (record.offloaded, record.host) = lowered_blocks(update_func)
+            record.blocks  = len(record.offloaded) + len(record.host)
+            record.dump("after", update_func)
+            return update_func
+
+    def _lower(
+        self, func: tvm.tir.PrimFunc, mod: tvm.ir.IRModule, ctx: tvm.ir.transform.PassContext,
+        record: instrument.FunctionRecord = None,
+    ) -> tvm.tir.PrimFunc:
+        # timed per sub-pass when instrumentation is on
+        step = record.step if record is not None else lambda *args: contextlib.nullcontext()
+
+        # one index of the function shared by all sub-passes, applied in a single sweep
+        with step("index"):
+            rewriter = pass_utils.BlockRewriter(func)
+        for (name, sub_pass) in [("conv2d", pass_conv2d.conv2d_pass),
+                                 ("dense", pass_dense.dense_pass),
+                                 ("requantize", pass_requantize.requantize_pass),
+                                 ("pool", pass_pool.pool_pass),
+                                 ("eltwise", pass_injective.eltwise_pass)]:
+            with step(name, rewriter):
+                sub_pass(rewriter, mod, ctx)
+        with step("rewrite"):
+            update_func = rewriter.apply()
+        with step("buffer"):
+            update_func = pass_buffer.add_device_buffer(update_func, mod, ctx)
+
+        names = [n for n in rewriter.index.names if n != "root"]
+        return update_func.with_attr(blocks_attr, {
+            "offloaded": [n for n in names if n in rewriter.claimed],
+            "host": [n for n in names if n not in rewriter.claimed],
+        })
@@ -16,18 +16,49 @@
 # under the License.
 """Relay graph patterns for the vanilla_accelerator accelerator"""
 
-from tvm.relay.dataflow_pattern import is_op, wildcard
+from functools import reduce
+from tvm.relay.dataflow_pattern import is_constant, is_op, wildcard
 
 
-def conv2d_pattern():
+def conv2d_pattern(data_layout="NCHW", kernel_layout="OIHW"):
     pattern = is_op("nn.conv2d")(wildcard(), wildcard())
-    pattern = pattern.has_attr({"strides": [1, 1], "groups": 1})
+    pattern = pattern.has_attr({"data_layout": data_layout, "kernel_layout": kernel_layout})
     return pattern
 
-def gzadd_pattern():
-    pattern = is_op("add")(wildcard(), wildcard())
+def conv2d_add_pattern(data_layout="NCHW", kernel_layout="OIHW"):
+    pattern = is_op("add")(conv2d_pattern(data_layout, kernel_layout), wildcard())
+    pattern = pattern.optional(lambda x: is_op("nn.relu")(x))
     return pattern
 
+def pool2d_pattern(op):
+    pattern = is_op(op)(wildcard())
+    pattern = pattern.has_attr({"layout": "NCHW"})
+    return pattern
+
+def conv2d_add_pool_pattern():
+    # conv -> bias -> relu -> max pool, the convolutional blocks of mnist-12
+    pattern = is_op("nn.max_pool2d")(conv2d_add_pattern())
+    pattern = pattern.has_attr({"layout": "NCHW"})
+    return pattern
+
+def eltwise_pattern(op, arity, dtypes):
+    # only the dtypes the elementwise kernels support, the others stay fused on the host
+    pattern = is_op(op)(*[wildcard() for _ in range(arity)])
+    return reduce(lambda x, y: x | y, [pattern.has_dtype(dtype) for dtype in dtypes])
+
 def dense_pattern():
     pattern = is_op("nn.dense")(wildcard(), wildcard())
     return pattern
+
+def dense_add_pattern():
+    pattern = is_op("add")(dense_pattern(), wildcard())
+    pattern = pattern.optional(lambda x: is_op("nn.relu")(x))
+    return pattern
+
+def requantize_pattern():
+    # per-tensor qnn.requantize after qnn.transform.CanonicalizeOps
+    pattern = is_op("fixed_point_multiply")(wildcard())
+    pattern = pattern.optional(lambda x: is_op("add")(x, is_constant()))
+    pattern = is_op("clip")(pattern)
+    pattern = is_op("cast")(pattern).has_attr({"dtype": "int8"})
+    return pattern
@@ -0,0 +1,228 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdlib.h>
+
+/* reductions of the pooling kernels */
+enum { VA_POOL_MAX, VA_POOL_SUM };
+
+/* initial value of a max window, the pad value TVM uses for max pooling */
+#define VA_POOL_MIN_VALUE -3.402823e+38f
+
+typedef struct {
+  int ow, oh, iw, ih, kh, kw, sh, sw, dh, dw, padh, padw;
+  int mode;
+} vanilla_accelerator_pool_window_t;
+
+/*!
+* \brief Max or sum over the kh x kw windows of one (ih x iw) plane into an (oh x ow) plane.
+* Taps in the (padh, padw) border are skipped, which is the same as padding with the lowest
+* float for max and with 0 for sum.
+*/
+static void vanilla_accelerator_pool_plane(const float* in, float* out,
+    const vanilla_accelerator_pool_window_t* p) {
+  for (int y = 0; y < p->oh; ++y) {
+    for (int x = 0; x < p->ow; ++x) {
+      float acc = p->mode == VA_POOL_MAX ? VA_POOL_MIN_VALUE : 0.000000e+00f;
+      for (int ky = 0; ky < p->kh; ++ky) {
+        int iy = y * p->sh + ky * p->dh - p->padh;
+        if (iy < 0 || iy >= p->ih) {
+          continue;
+        }
+        const float* row = in + iy * p->iw;
+        for (int kx = 0; kx < p->kw; ++kx) {
+          int ix = x * p->sw + kx * p->dw - p->padw;
+          if (ix < 0 || ix >= p->iw) {
+            continue;
+          }
+          if (p->mode == VA_POOL_MAX) {
+            acc = row[ix] > acc ? row[ix] : acc;
+          } else {
+            acc += row[ix];
+          }
+        }
+      }
+      out[y * p->ow + x] = acc;
+    }
+  }
+}
+
+typedef struct {
+  const float* ifmap;
+  float* result;
+  vanilla_accelerator_pool_window_t window;
+} vanilla_accelerator_pool_args_t;
+
+/* One task pools one channel plane. */
+static void vanilla_accelerator_pool_task(void* ctx, int task) {
+  const vanilla_accelerator_pool_args_t* a = (const vanilla_accelerator_pool_args_t*)ctx;
+  const vanilla_accelerator_pool_window_t* p = &a->window;
+  vanilla_accelerator_pool_plane(a->ifmap + (size_t)task * p->ih * p->iw,
+                                 a->result + (size_t)task * p->oh * p->ow, p);
+}
+
+static int vanilla_accelerator_pool2d(const float* ifmap, float* result, int n, int c, int ow,
+    int oh, int iw, int ih, int kh, int kw, int sh, int sw, int dh, int dw, int padh, int padw,
+    int mode, int nthreads) {
+  vanilla_accelerator_pool_args_t a;
+  vanilla_accelerator_pool_window_t p = {ow, oh, iw, ih, kh, kw, sh, sw, dh, dw, padh, padw,
+                                         mode};
+  a.ifmap = ifmap;
+  a.result = result;
+  a.window = p;
+  vanilla_accelerator_parallel_for(nthreads, n * c, vanilla_accelerator_pool_task, &a);
+  return 0;
+}
+
+typedef struct {
+  vanilla_accelerator_conv2d_args_t conv;
+  vanilla_accelerator_pool_window_t window;
+  int error;
+} vanilla_accelerator_conv2d_pool_args_t;
+
+/*!
+* \brief One task computes the conv2d output of one oc tile of one image into a scratch buffer
+* and max-pools it into the result, so only the pooled map is written back.
+*/
+static void vanilla_accelerator_conv2d_pool_task(void* ctx, int task) {
+  vanilla_accelerator_conv2d_pool_args_t* pa = (vanilla_accelerator_conv2d_pool_args_t*)ctx;
+  const vanilla_accelerator_conv2d_args_t* a = &pa->conv;
+  const vanilla_accelerator_pool_window_t* p = &pa->window;
+  int icg = a->ic / a->groups;
+  int ocg = a->oc / a->groups;
+  int tile = task % (a->groups * a->octiles);
+  int b = task / (a->groups * a->octiles);
+  int g = tile / a->octiles;
+  int oc0 = g * ocg + (tile % a->octiles) * a->oct;
+  int oc_tile = ((g + 1) * ocg - oc0 < a->oct) ? (g + 1) * ocg - oc0 : a->oct;
+
+  float* conv = (float*)malloc(sizeof(float) * oc_tile * a->oh * a->ow);
+  if (conv == NULL) {
+    pa->error = 1;
+    return;
+  }
+  // the tile function indexes weights, bias and output from oc0, offset them to write the
+  // scratch buffer from its first channel
+  const float* in = a->ifmap + (size_t)(b * a->ic + g * icg) * a->ih * a->iw;
+  const float* ws = a->weights + (size_t)oc0 * icg * a->kh * a->kw;
+  const float* bs = a->bias + b * a->bn + oc0 * a->bc;
+  for (int y = 0; y < a->oh; ++y) {
+    for (int x0 = 0; x0 < a->ow; x0 += a->owt) {
+      int ow_tile = (a->ow - x0 < a->owt) ? a->ow - x0 : a->owt;
+      a->tile_fn(in, ws, bs, conv, 0, oc_tile, y, x0, ow_tile, a->ow, a->oh, icg, a->kh, a->kw,
+                 a->iw, a->ih, a->padh, a->padw, a->sh, a->sw, a->dh, a->dw, a->bc, a->bh,
+                 a->bw, a->relu);
+    }
+  }
+  for (int o = 0; o < oc_tile; ++o) {
+    vanilla_accelerator_pool_plane(conv + (size_t)o * a->oh * a->ow,
+                                   a->result + ((size_t)b * a->oc + oc0 + o) * p->oh * p->ow, p);
+  }
+  free(conv);
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief MaxPool2D, datatype float, on n x c planes of (ih x iw) into (oh x ow). \param kh,
+* kw Window size. \param sh, sw Strides. \param dh, dw Dilations. \param padh, padw Top and
+* left padding, padded taps are skipped. \param nthreads Number of worker threads the planes
+* are spread over.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_maxpool2d(float* ifmap, float* result, int n, int c, int ow, int oh,
+    int iw, int ih, int kh, int kw, int sh, int sw, int dh, int dw, int padh, int padw,
+    int nthreads) {
+  return vanilla_accelerator_pool2d(ifmap, result, n, c, ow, oh, iw, ih, kh, kw, sh, sw, dh, dw,
+                                    padh, padw, VA_POOL_MAX, nthreads);
+}
+
+/*!
+* \brief Window sums with the parameters of vanilla_accelerator_maxpool2d, the reduction of
+* AvgPool2D before its division by the window size.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_sumpool2d(float* ifmap, float* result, int n, int c, int ow, int oh,
+    int iw, int ih, int kh, int kw, int sh, int sw, int dh, int dw, int padh, int padw,
+    int nthreads) {
+  return vanilla_accelerator_pool2d(ifmap, result, n, c, ow, oh, iw, ih, kh, kw, sh, sw, dh, dw,
+                                    padh, padw, VA_POOL_SUM, nthreads);
+}
+
+/*!
+* \brief Conv2D with bias/residual add and optional relu (see vanilla_accelerator_conv2dnchw_bias)
+* followed by MaxPool2D (see vanilla_accelerator_maxpool2d, with the pk*, ps*, pd* and ppad*
+* window parameters) over its (oh x ow) output, pooled to (pooled_h x pooled_w). The conv2d
+* output only lives in a per-task scratch buffer.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_conv2dnchw_bias_maxpool(float* ifmap, float* weights, float* bias,
+    float* result, int n, int oc, int ow, int oh, int ic, int kh, int kw, int iw, int ih, int padh,
+    int padw, int sh, int sw, int dh, int dw, int groups, int bn, int bc, int bh, int bw, int relu,
+    int pooled_w, int pooled_h, int pkh, int pkw, int psh, int psw, int pdh, int pdw, int ppadh,
+    int ppadw, int tile, int nthreads) {
+  vanilla_accelerator_conv2d_pool_args_t pa;
+  vanilla_accelerator_conv2d_args_t* a = &pa.conv;
+  vanilla_accelerator_pool_window_t p = {pooled_w, pooled_h, ow, oh, pkh, pkw, psh, psw, pdh,
+                                         pdw, ppadh, ppadw, VA_POOL_MAX};
+  a->ifmap = ifmap;
+  a->weights = weights;
+  a->bias = bias;
+  a->result = result;
+  a->n = n;
+  a->oc = oc;
+  a->ow = ow;
+  a->oh = oh;
+  a->ic = ic;
+  a->kh = kh;
+  a->kw = kw;
+  a->iw = iw;
+  a->ih = ih;
+  a->padh = padh;
+  a->padw = padw;
+  a->sh = sh;
+  a->sw = sw;
+  a->dh = dh;
+  a->dw = dw;
+  a->groups = groups;
+  a->bn = bn;
+  a->bc = bc;
+  a->bh = bh;
+  a->bw = bw;
+  a->relu = relu;
+  tile = (tile >= 0 && tile < VA_CONV_NUM_TILES) ? tile : 0;
+  a->oct = vanilla_accelerator_conv2d_tiles[tile].oc;
+  a->owt = vanilla_accelerator_conv2d_tiles[tile].ow;
+  a->tile_fn = vanilla_accelerator_conv2d_tiles[tile].fn;
+  a->octiles = (oc / groups + a->oct - 1) / a->oct;
+  a->bands = 1;
+  pa.window = p;
+  pa.error = 0;
+
+  vanilla_accelerator_parallel_for(nthreads, n * groups * a->octiles,
+                                   vanilla_accelerator_conv2d_pool_task, &pa);
+  return pa.error ? -1 : 0;
+}
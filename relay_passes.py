@@ -0,0 +1,241 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Relay passes of the vanilla_accelerator backend on the partitioned module"""
+
+import numpy as np
+import tvm
+from tvm import relay
+from tvm.relay.expr_functor import ExprMutator
+
+# G of Winograd F(2x2, 3x3), U = G g G^T; B^T and A^T are in strategies.py and the kernel
+winograd_g = np.array([[1.0, 0.0, 0.0], [0.5, 0.5, 0.5], [0.5, -0.5, 0.5], [0.0, 0.0, 1.0]])
+# fewer input channels than this use the direct kernel, whose cost the tile transforms exceed
+winograd_min_channels = 8
+# composite functions whose conv2d may run through the Winograd kernels; conv2d_add_pool keeps
+# the direct conv2d fused with its max pool
+winograd_composites = ["conv2d", "conv2d_add"]
+
+
+def winograd_weights(weights: np.ndarray) -> np.ndarray:
+    """
+    U = G g G^T of float (oc, ic, 3, 3) weights, laid out as (4, 4, oc, ic) for the
+    Winograd kernels
+    """
+    u = np.einsum("rk,oikl,cl->rcoi", winograd_g, weights.astype("float64"), winograd_g)
+    return np.ascontiguousarray(u.astype("float32"))
+
+
+def _external(mod: tvm.IRModule, compiler: str) -> list:
+    """
+    Global functions of `mod` partitioned for `compiler`
+    """
+    return [gv for (gv, func) in mod.functions.items()
+            if isinstance(func, relay.Function) and func.attrs is not None and
+            "Compiler" in func.attrs and func.attrs["Compiler"] == compiler]
+
+
+def _is_tensor_constant(expr) -> bool:
+    # scalars are inlined by the lowering to TE
+    return isinstance(expr, relay.Constant) and len(expr.data.shape) != 0
+
+
+class _CallRewriter(ExprMutator):
+    """
+    Rewrites the arguments of calls to the global functions in `args`: `args[gv](call args)`
+    returns the new arguments
+    """
+
+    def __init__(self, args):
+        super().__init__()
+        self.args = args
+
+    def visit_call(self, call):
+        new = super().visit_call(call)
+        if isinstance(call.op, relay.GlobalVar) and call.op in self.args:
+            return relay.Call(new.op, self.args[call.op](list(new.args)), new.attrs,
+                              new.type_args, new.span)
+        return new
+
+
+class _ConstantLifter(ExprMutator):
+    """
+    Replaces the tensor constants of a partitioned function, outside its composite functions,
+    by new parameters
+    """
+
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+        self.params = []
+        self.values = []
+
+    def visit_function(self, fn):
+        # composite bodies are matched and lowered as they are
+        return fn
+
+    def visit_constant(self, const):
+        if not _is_tensor_constant(const):
+            return const
+        var = relay.var(f"{self.prefix}_const_{len(self.params)}",
+                        shape=const.data.shape, dtype=const.data.dtype)
+        self.params.append(var)
+        self.values.append(const)
+        return var
+
+
+class _WinogradRewriter(ExprMutator):
+    """
+    Replaces the conv2d of eligible composite functions by
+    nn.contrib_conv2d_winograd_without_weight_transform of the transformed constant weights
+    """
+
+    def visit_call(self, call):
+        new = super().visit_call(call)
+        fn  = new.op
+        if not isinstance(fn, relay.Function) or fn.attrs is None or "Composite" not in fn.attrs:
+            return new
+        # UMA names the composites "<target>.<pattern>"
+        composite = str(fn.attrs["Composite"])
+        pattern   = composite.split(".", 1)[-1]
+        if pattern not in winograd_composites:
+            return new
+        convs = []
+        relay.analysis.post_order_visit(
+            fn.body, lambda e: convs.append(e) if isinstance(e, relay.Call) and
+            isinstance(e.op, tvm.ir.Op) and e.op.name == "nn.conv2d" else None
+        )
+        if len(convs) != 1 or not isinstance(convs[0].args[1], relay.Var):
+            return new
+        conv   = convs[0]
+        index  = [p.same_as(conv.args[1]) for p in fn.params].index(True)
+        weight = new.args[index]
+        if not self._eligible(conv, weight):
+            return new
+
+        u       = winograd_weights(weight.data.numpy())
+        u_param = relay.var(fn.params[index].name_hint, shape=u.shape, dtype="float32")
+        attrs   = conv.attrs
+        wino    = relay.nn.contrib_conv2d_winograd_without_weight_transform(
+            conv.args[0], u_param, tile_size=2, padding=attrs.padding, channels=u.shape[2],
+            kernel_size=(3, 3), out_dtype=attrs.out_dtype)
+        body    = _Replace(conv, wino).visit(fn.body)
+        params  = list(fn.params)
+        params[index] = u_param
+        # conv2d -> conv2d_winograd, conv2d_add -> conv2d_winograd_add
+        name    = composite[:-len(pattern)] + pattern.replace("conv2d", "conv2d_winograd")
+        func    = relay.Function(params, body, attrs=fn.attrs).with_attr("Composite", name)
+        args    = list(new.args)
+        args[index] = relay.const(u)
+        return relay.Call(func, args, new.attrs, new.type_args, new.span)
+
+    @staticmethod
+    def _eligible(conv, weight) -> bool:
+        """
+        Float 3x3 NCHW conv2d with constant weights, unit strides and dilations, no groups
+        """
+        attrs = conv.attrs
+        if not isinstance(weight, relay.Constant) or weight.data.dtype != "float32":
+            return False
+        (_, ic, kh, kw) = weight.data.shape
+        return str(attrs.data_layout) == "NCHW" and str(attrs.kernel_layout) == "OIHW" and \
+            str(attrs.out_dtype) in ("", "float32") and (kh, kw) == (3, 3) and \
+            [int(x) for x in attrs.strides] == [1, 1] and \
+            [int(x) for x in attrs.dilation] == [1, 1] and int(attrs.groups) == 1 and \
+            ic >= winograd_min_channels
+
+
+class _Replace(ExprMutator):
+    """
+    Replaces the call `old` by `new`
+    """
+
+    def __init__(self, old, new):
+        super().__init__()
+        self.old = old
+        self.new = new
+
+    def visit_call(self, call):
+        if call.same_as(self.old):
+            return self.new
+        return super().visit_call(call)
+
+
+@tvm.transform.module_pass(opt_level=0)
+class WinogradWeights:
+    """
+    Run the float 3x3 convs offloaded to `compiler` through the Winograd F(2x2, 3x3) kernels,
+    with their weights transformed once here from the bound constant parameters
+    """
+
+    def __init__(self, compiler: str):
+        self.compiler = compiler
+
+    def transform_module(self, mod: tvm.IRModule, ctx) -> tvm.IRModule:
+        external = _external(mod, self.compiler)
+        calls = {gv: 0 for gv in external}
+        relay.analysis.post_order_visit(
+            mod["main"], lambda e: calls.__setitem__(e.op, calls[e.op] + 1)
+            if isinstance(e, relay.Call) and e.op in calls else None
+        )
+        # partitions called once get their constant arguments bound, so the weights are seen
+        binds = {}
+        def _bind(gv, args):
+            binds[gv] = {param: arg for (param, arg) in zip(mod[gv].params, args)
+                         if _is_tensor_constant(arg)}
+            return [arg for arg in args if not _is_tensor_constant(arg)]
+        main = _CallRewriter(
+            {gv: (lambda args, gv=gv: _bind(gv, args)) for gv in external if calls[gv] == 1}
+        ).visit(mod["main"])
+
+        updates = {"main": main}
+        for gv in external:
+            func = mod[gv]
+            if binds.get(gv):
+                func = relay.bind(func, binds[gv])
+            updates[gv] = relay.Function(func.params, _WinogradRewriter().visit(func.body),
+                                         func.ret_type, func.type_params, func.attrs)
+        for (gv, func) in updates.items():
+            mod[gv] = func
+        return relay.transform.InferType()(mod)
+
+
+@tvm.transform.module_pass(opt_level=0)
+class LiftConstants:
+    """
+    Pass the tensor constants of the functions partitioned for `compiler` as arguments from
+    the calling function, as the TIR lowering of a partition expects all its tensors to be
+    parameters
+    """
+
+    def __init__(self, compiler: str):
+        self.compiler = compiler
+
+    def transform_module(self, mod: tvm.IRModule, ctx) -> tvm.IRModule:
+        lifted = {}
+        for gv in _external(mod, self.compiler):
+            func   = mod[gv]
+            lifter = _ConstantLifter(gv.name_hint)
+            body   = lifter.visit(func.body)
+            if lifter.params:
+                mod[gv] = relay.Function(list(func.params) + lifter.params, body,
+                                         func.ret_type, func.type_params, func.attrs)
+                lifted[gv] = lifter.values
+        if lifted:
+            mod["main"] = _CallRewriter(
+                {gv: (lambda args, gv=gv: args + lifted[gv]) for gv in lifted}
+            ).visit(mod["main"])
+        return relay.transform.InferType()(mod)
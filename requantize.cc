@@ -0,0 +1,83 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdint.h>
+#include <stdlib.h>
+
+typedef struct {
+  const int32_t* in;
+  int8_t* result;
+  int w;
+  int chunk;
+  int multiplier;
+  int shift;
+  int zero_point;
+  int lo;
+  int hi;
+} vanilla_accelerator_requantize_args_t;
+
+static void vanilla_accelerator_requantize_task(void* ctx, int task) {
+  const vanilla_accelerator_requantize_args_t* a =
+      (const vanilla_accelerator_requantize_args_t*)ctx;
+  // q_multiply_shift(x, multiplier, 31, shift), rounding half up
+  int left = a->shift > 0 ? a->shift : 0;
+  int right = 31 + (a->shift > 0 ? 0 : -a->shift);
+  int64_t rounding = (int64_t)1 << (right - 1);
+  int end = (task + 1) * a->chunk < a->w ? (task + 1) * a->chunk : a->w;
+  for ( int i = task * a->chunk; i < end; i++ ) {
+    int64_t x = ((int64_t)a->in[i] << left) * a->multiplier;
+    int32_t v = (int32_t)((x + rounding) >> right) + a->zero_point;
+    v = v < a->lo ? a->lo : v;
+    v = v > a->hi ? a->hi : v;
+    a->result[i] = (int8_t)v;
+  }
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Requantize int32 accumulators to int8:
+* result = clip(fixed_point_multiply(in, multiplier, shift) + zero_point, lo, hi), the
+* canonical form of a per-tensor qnn.requantize. Rounding matches tir.q_multiply_shift.
+* \param w Number of elements. \param nthreads Number of worker threads.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_requantize(int32_t* in, int8_t* result, int w, int multiplier, int shift,
+    int zero_point, int lo, int hi, int nthreads) {
+  vanilla_accelerator_requantize_args_t a;
+  a.in         = in;
+  a.result     = result;
+  a.w          = w;
+  a.multiplier = multiplier;
+  a.shift      = shift;
+  a.zero_point = zero_point;
+  a.lo         = lo;
+  a.hi         = hi;
+  a.chunk      = 16384;
+  if (nthreads <= 1 || w < 2 * a.chunk) {
+    a.chunk = w;
+  }
+
+  vanilla_accelerator_parallel_for(nthreads, (w + a.chunk - 1) / a.chunk,
+                                   vanilla_accelerator_requantize_task, &a);
+  return 0;
+}
@@ -15,6 +15,9 @@
 # specific language governing permissions and limitations
 # under the License.
 from tvm.micro.testing.aot_test_utils import AOT_DEFAULT_RUNNER
+import argparse
+import os
+import time
 import tvm
 from tvm import relay
 from backend import VanillaAcceleratorBackend
@@ -22,7 +25,12 @@ from tvm.relay import transform
 from collections import OrderedDict
 import numpy as np
 import onnx
+from onnx import numpy_helper
 from PIL import Image
+import deploy
+import instrument
+from cost_model import CostModel
+from passes import lowering_cache
 
 
 from tvm.testing.aot import (
@@ -60,31 +68,150 @@ from tvm.testing.aot import (
 #    return mod, inputs, output_list, runner
 
 
+def set_batch(onnx_model):
+    """
+    mnist-12 flattens the last pooling output with a constant (1, 256) reshape.
+    Let its leading dimension follow the batch size instead.
+    """
+    inits = {i.name: i for i in onnx_model.graph.initializer}
+    for node in onnx_model.graph.node:
+        if node.op_type != "Reshape" or node.input[0] in inits or node.input[1] not in inits:
+            continue
+        shape = numpy_helper.to_array(inits[node.input[1]]).copy()
+        if shape[0] == 1:
+            shape[0] = -1
+            inits[node.input[1]].CopyFrom(numpy_helper.from_array(shape, node.input[1]))
+
+
+def load_dataset(images_path, labels_path):
+    """
+    Memory-map the MNIST test set, (10000, 1, 28, 28) raw pixels and (10000,) labels. The .npy
+    files are written once from the original pickles if they do not exist yet.
+    """
+    if not os.path.exists(images_path) or not os.path.exists(labels_path):
+        import pickle
+        for npy, pkl, shape in [(images_path, "./data/test_images.pkl", (-1, 1, 28, 28)),
+                                (labels_path, "./data/test_label.pkl", (-1,))]:
+            with open(pkl, "rb") as f:
+                np.save(npy, np.reshape(np.asarray(pickle.load(f, encoding="latin1")), shape))
+    return np.load(images_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r")
+
+
+def normalize(pixels):
+    return np.asarray(pixels, dtype="float32") / 255
+
+
+def stream(executor, input_name, images, labels, batch):
+    """
+    Push the whole test set through `executor` batch by batch, reading each batch from the
+    memory-mapped images. Returns (correct predictions, latency of every batch in seconds);
+    only at batch 1 is that the latency of one image.
+    """
+    correct   = 0
+    latencies = []
+    for start in range(0, len(images), batch):
+        chunk = normalize(images[start:start + batch])
+        valid = len(chunk)
+        if valid < batch:
+            # the model is compiled for a fixed batch, pad the last one
+            pad   = np.zeros((batch - valid,) + chunk.shape[1:], dtype=chunk.dtype)
+            chunk = np.concatenate([chunk, pad])
+        tic = time.perf_counter()
+        executor.set_input(input_name, chunk)
+        executor.run()
+        out = executor.get_output(0).numpy()
+        latencies.append(time.perf_counter() - tic)
+        pred = out[:valid].argmax(axis=1)
+        correct += int((pred == labels[start:start + valid]).sum())
+    return correct, np.asarray(latencies)
+
+
+def make_backend(cost_model=None, layout=None):
+    """
+    Registered backend, with a CostModel for `--cost-model` ("analytic" or a bench_kernels.py
+    JSON to calibrate from) and the conv2d data layout of `--layout`
+    """
+    if cost_model is not None:
+        cost_model = CostModel() if cost_model == "analytic" else CostModel.calibrated(cost_model)
+    uma_backend = VanillaAcceleratorBackend(cost_model, layout)
+    uma_backend.register()
+    return uma_backend
+
+
+def evaluate(mod, params, input_name, images, labels, batch, cache_dir=None, cost_model=None,
+             layout=None):
+    """
+    Build the offloaded and the host-only model once each and stream the whole test set
+    through both
+    """
+    uma_backend = make_backend(cost_model, layout)
+    builds = [("vanilla_accelerator", uma_backend), ("host", None)]
+
+    rows = []
+    for name, backend in builds:
+        tic = time.perf_counter()
+        executor, hit = deploy.build_and_load(mod, params, backend, cache_dir)
+        print(f"{name}: {'cached' if hit else 'built'} in {time.perf_counter() - tic:.1f}s")
+        start = time.perf_counter()
+        correct, latencies = stream(executor, input_name, images, labels, batch)
+        elapsed = time.perf_counter() - start
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e3
+        rows.append(f"{name:<20} {correct / len(images):>7.4f} {p50:>13.3f} {p90:>13.3f} "
+                    f"{p99:>13.3f} {len(images) / elapsed:>9.1f}")
+
+    if uma_backend.cost_model is not None:
+        print(uma_backend.cost_model.report())
+    # percentiles of the time one executor run takes for a whole batch, img/s is the throughput
+    print(f"{'build':<20} {'top-1':>7} {'batch p50[ms]':>13} {'batch p90[ms]':>13} "
+          f"{'batch p99[ms]':>13} {'img/s':>9}")
+    print("\n".join(rows))
+    print(f"{len(images)} images, batch {batch}, latencies per batch of {batch} images")
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1,
+                        help="batch size, >1 implies --eval")
+    parser.add_argument("--eval", action="store_true",
+                        help="stream the whole test set through the offloaded and the host build")
+    parser.add_argument("--images", default="./data/test_images.npy")
+    parser.add_argument("--labels", default="./data/test_labels.npy")
+    parser.add_argument("--cache-dir", default=deploy.default_cache_dir,
+                        help="reuse models compiled by earlier runs from this directory")
+    parser.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None)
+    parser.add_argument("--cost-model", nargs="?", const="analytic", default=None,
+                        metavar="BENCH_JSON",
+                        help="only offload patterns predicted faster than the host, optionally "
+                             "calibrated with bench_kernels.py results")
+    parser.add_argument("--layout", choices=["NCHW", "NHWC"], default=None,
+                        help="convert every conv2d to this data layout before partitioning")
+    parser.add_argument("--instrument", metavar="DIR", default=None,
+                        help="record pass timings and offload decisions, dump the IR and "
+                             "a JSON report to DIR")
+    args = parser.parse_args()
+    if args.instrument:
+        instrument.recorder.enable(args.instrument)
+    try:
+        run(args)
+    finally:
+        if args.instrument:
+            report = f"{args.instrument}/report.json"
+            instrument.recorder.write(report, lowering_cache)
+            print(f"Instrumentation report in {report}")
+
+
+def run(args):
     runner = AOT_DEFAULT_RUNNER
 
-    # Load Cifar10 data
-    datafile  = r'./data/test_images.pkl'
-    labelfile = r'./data/test_label.pkl'
+    images, labels = load_dataset(args.images, args.labels)
 
-    def unpickle(file):
-        import pickle
-        with open(file,'rb') as fo:
-            dict = pickle.load(fo, encoding='latin1')
-        return dict
-    
-    data_batch_1  = unpickle(datafile)
-    label_batch_1 = unpickle(labelfile)
-    
-    images = data_batch_1.astype("float32")
-    labels = label_batch_1
-    images = np.reshape(images,(10000, 1, 28, 28)) / 255
-    
     # Load Model
     model_path = "./model/mnist-12.onnx"
     onnx_model = onnx.load(model_path)
     input_name = "Input3"
-    shape_dict = {input_name: images[0:1].shape}
+    shape_dict = {input_name: (args.batch,) + images.shape[1:]}
+    if args.batch > 1:
+        set_batch(onnx_model)
 
     # "freeze_param=False"を入れないと、
     #   "/home/ml/tvm/src/te/operation/create_primfunc.cc", line 491の
@@ -92,15 +219,19 @@ def main():
     mod, params = relay.frontend.from_onnx(onnx_model, shape_dict,freeze_params=False)
 
     mod = transform.InferType()(mod)
-    input_list = {input_name: images[0:1]}
+    if args.eval or args.batch > 1:
+        return evaluate(mod, params, input_name, images, labels, args.batch, args.cache_dir,
+                        args.cost_model, args.layout)
+
+    input_list = {input_name: normalize(images[0:1])}
     output_list = generate_ref_data(mod, input_list, params=params)
 
-    uma_backend = VanillaAcceleratorBackend()
-    uma_backend.register()
+    uma_backend = make_backend(args.cost_model, args.layout)
 
     mod = uma_backend.partition(mod)
-    with open("model.dump", "w") as f:
-        f.write(str(mod))
+    if uma_backend.cost_model is not None:
+        print(uma_backend.cost_model.report())
+    instrument.recorder.dump("model.relay", str(mod))
 
     target = tvm.target.Target("vanilla_accelerator", host=tvm.target.Target("c"))
     target_c = tvm.target.Target("c")
@@ -20,6 +20,7 @@ from tvm import relay
 from backend import VanillaAcceleratorBackend
 from tvm.relay import transform
 from collections import OrderedDict
+import pathlib
 import numpy as np
 
 from tvm.testing.aot import (
@@ -145,31 +146,136 @@ def create_conv2d(groups=1, runner=AOT_DEFAULT_RUNNER):
     return mod, inputs, output_list, runner
 
 
-def main():
-    mod, inputs, output_list, runner = create_conv2d()
-    with open("model_pre.dump", "w") as f:
-        f.write(str(mod))
+def create_conv2d_winograd(runner=AOT_DEFAULT_RUNNER):
+    # float 3x3 stride-1 conv with 16 input channels and its weights bound as deploy.build
+    # does, so relay_passes.WinogradWeights transforms them once while partitioning
+    dtype   = "float32"
+    ishape  = (1, 16, 14, 14)
+    wshape  = (32, 16, 3, 3)
+    bshape  = (1, 32, 1, 1)
+    data0   = relay.var("data", shape=ishape, dtype=dtype)
+    weight0 = relay.var("weight", shape=wshape, dtype=dtype)
+    bias0   = relay.var("bias", shape=bshape, dtype=dtype)
+    convdt  = relay.nn.conv2d(data0, weight0, kernel_size=(3, 3), padding=(1, 1))
+    out     = relay.nn.relu(relay.add(convdt, bias0))
+    main_f  = relay.Function([data0, weight0, bias0], out)
+    mod = tvm.IRModule()
+    mod["main"] = main_f
+    mod = transform.InferType()(mod)
+    i_data = np.random.uniform(0, 1, ishape).astype(dtype)
+    params = {
+        "weight" : np.random.uniform(-1, 1, wshape).astype(dtype),
+        "bias"   : np.random.uniform(-1, 1, bshape).astype(dtype),
+    }
+    inputs = OrderedDict([("data", i_data)])
+    output_list = generate_ref_data(mod, dict(inputs, **params))
+    mod = tvm.IRModule.from_expr(relay.build_module.bind_params_by_name(mod["main"], params))
+    mod = transform.InferType()(mod)
+    return mod, inputs, output_list, runner
+
+
+def create_conv2d_nhwc(runner=AOT_DEFAULT_RUNNER):
+    # NHWC data, HWIO weights, bias add and relu: the conv2d_nhwc_add pattern
+    dtype   = "float32"
+    ishape  = (1, 14, 14, 16)
+    wshape  = (3, 3, 16, 32)
+    bshape  = (1, 1, 1, 32)
+    data0   = relay.var("data", shape=ishape, dtype=dtype)
+    weight0 = relay.var("weight", shape=wshape, dtype=dtype)
+    bias0   = relay.var("bias", shape=bshape, dtype=dtype)
+    convdt  = relay.nn.conv2d(data0, weight0, kernel_size=(3, 3), padding=(1, 1),
+                              data_layout="NHWC", kernel_layout="HWIO")
+    out     = relay.nn.relu(relay.add(convdt, bias0))
+    main_f  = relay.Function([data0, weight0, bias0], out)
+    mod = tvm.IRModule()
+    mod["main"] = main_f
+    mod = transform.InferType()(mod)
+    inputs = OrderedDict([
+        ("data", np.random.uniform(0, 1, ishape).astype(dtype)),
+        ("weight", np.random.uniform(-1, 1, wshape).astype(dtype)),
+        ("bias", np.random.uniform(-1, 1, bshape).astype(dtype)),
+    ])
+    output_list = generate_ref_data(mod, inputs)
+    return mod, inputs, output_list, runner
+
 
+def create_conv2d_nchw_bias(runner=AOT_DEFAULT_RUNNER):
+    # an NCHW model, converted to NHWC by the backend's `layout`
+    dtype   = "float32"
+    ishape  = (1, 16, 14, 14)
+    wshape  = (32, 16, 3, 3)
+    bshape  = (1, 32, 1, 1)
+    data0   = relay.var("data", shape=ishape, dtype=dtype)
+    weight0 = relay.var("weight", shape=wshape, dtype=dtype)
+    bias0   = relay.var("bias", shape=bshape, dtype=dtype)
+    convdt  = relay.nn.conv2d(data0, weight0, kernel_size=(3, 3), padding=(1, 1))
+    out     = relay.nn.relu(relay.add(convdt, bias0))
+    main_f  = relay.Function([data0, weight0, bias0], out)
+    mod = tvm.IRModule()
+    mod["main"] = main_f
+    mod = transform.InferType()(mod)
+    inputs = OrderedDict([
+        ("data", np.random.uniform(0, 1, ishape).astype(dtype)),
+        ("weight", np.random.uniform(-1, 1, wshape).astype(dtype)),
+        ("bias", np.random.uniform(-1, 1, bshape).astype(dtype)),
+    ])
+    output_list = generate_ref_data(mod, inputs)
+    return mod, inputs, output_list, runner
+
+
+def calls(export_directory, symbol):
+    """
+    True if the C sources generated into `export_directory` call `symbol`
+    """
+    for path in pathlib.Path(export_directory).rglob("*.c"):
+        if f"{symbol}(" in path.read_text():
+            return True
+    return False
+
+
+# name -> (create, kernel the partition must call or None, backend arguments)
+cases = {
+    "conv2d"          : (create_conv2d, None, {}),
+    "conv2d_winograd" : (create_conv2d_winograd, "vanilla_accelerator_conv2dnchw_winograd_bias",
+                         {}),
+    "conv2d_nhwc"     : (create_conv2d_nhwc, "vanilla_accelerator_conv2dnhwc_bias", {}),
+    "conv2d_layout_nhwc" : (create_conv2d_nchw_bias, "vanilla_accelerator_conv2dnhwc_bias",
+                            {"layout": "NHWC"}),
+}
+
+
+def main():
     uma_backend = VanillaAcceleratorBackend()
     uma_backend.register()
-    mod = uma_backend.partition(mod)
     target = tvm.target.Target("vanilla_accelerator", host=tvm.target.Target("c"))
     target_c = tvm.target.Target("c")
 
-    with open("model_post.dump", "w") as f:
-        f.write(str(mod))
-
-    #export_directory = tvm.contrib.utils.tempdir(keep_for_debug=True).path
-    export_directory = "./result_conv2d"
-    print(f"Generated files are in {export_directory}")
-    compile_and_run(
-        AOTModel(module=mod, inputs=inputs, outputs=output_list),
-        runner,
-        interface_api="c",
-        use_unpacked_api=True,
-        target=[target_c, target],
-        test_dir=str(export_directory),
-    )
+    for name, (create, kernel, backend_args) in cases.items():
+        mod, inputs, output_list, runner = create()
+        with open(f"model_pre_{name}.dump", "w") as f:
+            f.write(str(mod))
+
+        # the other arguments only change the partitioning, the target registered above
+        # lowers the partitions the same way
+        partitioner = VanillaAcceleratorBackend(**backend_args) if backend_args else uma_backend
+        mod = partitioner.partition(mod)
+
+        with open(f"model_post_{name}.dump", "w") as f:
+            f.write(str(mod))
+
+        #export_directory = tvm.contrib.utils.tempdir(keep_for_debug=True).path
+        export_directory = f"./result_{name}"
+        print(f"Generated files are in {export_directory}")
+        compile_and_run(
+            AOTModel(module=mod, inputs=inputs, outputs=output_list),
+            runner,
+            interface_api="c",
+            use_unpacked_api=True,
+            target=[target_c, target],
+            test_dir=str(export_directory),
+        )
+        if kernel is not None:
+            assert calls(export_directory, kernel), f"{name} does not call {kernel}"
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Check that the cost model only charges a pattern for the nodes it matched"""
+
+import tvm
+from tvm import relay
+from tvm.relay import transform
+
+from backend import VanillaAcceleratorBackend
+from cost_model import CostModel, workload
+from patterns import conv2d_add_pattern
+
+
+def conv_layer(x, name, ic, oc):
+    weight = relay.var(f"{name}_weight", shape=(oc, ic, 3, 3), dtype="float32")
+    bias   = relay.var(f"{name}_bias", shape=(1, oc, 1, 1), dtype="float32")
+    conv   = relay.nn.conv2d(x, weight, kernel_size=(3, 3), padding=(1, 1))
+    return (relay.nn.relu(relay.add(conv, bias)), [weight, bias])
+
+
+def create_two_layers(shape=(1, 8, 14, 14), channels=(16, 32)):
+    data = relay.var("data", shape=shape, dtype="float32")
+    (x1, params1) = conv_layer(data, "conv1", shape[1], channels[0])
+    (x2, params2) = conv_layer(x1, "conv2", channels[0], channels[1])
+    mod = tvm.IRModule.from_expr(relay.Function([data] + params1 + params2, x2))
+    return transform.InferType()(mod)
+
+
+def main():
+    mod     = create_two_layers()
+    pattern = conv2d_add_pattern()
+    # relu(add(conv2d(x1, w), b)) of the second layer
+    root = mod["main"].body
+    assert pattern.match(root)
+
+    (flops, nbytes, shape) = workload(pattern, root)
+    (n, oc, oh, ow) = shape
+    ic   = 16
+    out  = n * oc * oh * ow
+    # its conv2d (multiply-adds twice), bias add and relu, nothing of the first layer
+    assert flops == 2 * out * ic * 3 * 3 + 2 * out, flops
+    # the first layer's output, its weights and bias in, its result out
+    inputs = (n * ic * oh * ow) + (oc * ic * 3 * 3) + oc
+    assert nbytes == 4 * (inputs + out), nbytes
+    print(f"second layer: {flops} flops, {nbytes} bytes")
+
+    cost_model  = CostModel()
+    uma_backend = VanillaAcceleratorBackend(cost_model=cost_model)
+    uma_backend.register()
+    uma_backend.partition(mod)
+    print(cost_model.report())
+    convs = [d for d in cost_model.decisions if d["pattern"] == "conv2d_add"]
+    assert len(convs) == 2
+    assert any(d["flops"] == flops and d["bytes"] == nbytes for d in convs)
+
+
+if __name__ == "__main__":
+    main()
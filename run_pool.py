@@ -0,0 +1,115 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+from tvm.micro.testing.aot_test_utils import AOT_DEFAULT_RUNNER
+import tvm
+from tvm import relay
+from backend import VanillaAcceleratorBackend
+from tvm.relay import transform
+from collections import OrderedDict
+import numpy as np
+
+from tvm.testing.aot import (
+    AOTTestModel as AOTModel,
+    generate_ref_data,
+    compile_and_run,
+)
+
+
+def create_pool(op, ishape=(1, 8, 15, 15), **attrs):
+    dtype   = "float32"
+    data0   = relay.var("data", shape=ishape, dtype=dtype)
+    out     = op(data0, **attrs)
+    main_f  = relay.Function([data0], out)
+    mod = tvm.IRModule()
+    mod["main"] = main_f
+    mod = transform.InferType()(mod)
+    i_data = np.random.uniform(-1, 1, ishape).astype(dtype)
+    inputs = OrderedDict([("data", i_data)])
+    output_list = generate_ref_data(mod, inputs)
+    return mod, inputs, output_list, AOT_DEFAULT_RUNNER
+
+
+def create_mnist_block():
+    # the two convolutional blocks of mnist-12: conv -> bias add -> relu -> max pool
+    dtype  = "float32"
+    ishape = (1, 1, 28, 28)
+    layers = [
+        # (output channels, input channels, pool size = pool stride)
+        (8, 1, 2),
+        (16, 8, 3),
+    ]
+    data0  = relay.var("data", shape=ishape, dtype=dtype)
+    x      = data0
+    params = [data0]
+    inputs = OrderedDict([("data", np.random.uniform(0, 1, ishape).astype(dtype))])
+    for i, (oc, ic, pool) in enumerate(layers):
+        weight = relay.var(f"weight{i}", shape=(oc, ic, 5, 5), dtype=dtype)
+        bias   = relay.var(f"bias{i}", shape=(1, oc, 1, 1), dtype=dtype)
+        x = relay.nn.conv2d(x, weight, kernel_size=(5, 5), padding=(2, 2))
+        x = relay.nn.relu(relay.add(x, bias))
+        x = relay.nn.max_pool2d(x, pool_size=(pool, pool), strides=(pool, pool))
+        params.extend([weight, bias])
+        inputs[f"weight{i}"] = np.random.uniform(-1, 1, (oc, ic, 5, 5)).astype(dtype)
+        inputs[f"bias{i}"]   = np.random.uniform(-1, 1, (1, oc, 1, 1)).astype(dtype)
+    main_f = relay.Function(params, x)
+    mod = tvm.IRModule()
+    mod["main"] = main_f
+    mod = transform.InferType()(mod)
+    output_list = generate_ref_data(mod, inputs)
+    return mod, inputs, output_list, AOT_DEFAULT_RUNNER
+
+
+cases = {
+    # padded taps are skipped by the max kernel
+    "max_pool2d" : lambda: create_pool(relay.nn.max_pool2d, pool_size=(3, 3), strides=(2, 2),
+                                       padding=(1, 1)),
+    # the pool_avg division stays in TIR, with and without the padded taps in the count
+    "avg_pool2d" : lambda: create_pool(relay.nn.avg_pool2d, pool_size=(3, 3), strides=(2, 2),
+                                       padding=(1, 1), count_include_pad=True),
+    "avg_pool2d_exclude_pad" : lambda: create_pool(relay.nn.avg_pool2d, pool_size=(2, 2),
+                                                   strides=(1, 1), padding=(1, 1, 0, 0)),
+    # conv2d_add_pool, lowered to the fused conv2d + max pool kernel
+    "mnist_block" : create_mnist_block,
+}
+
+
+def main():
+    uma_backend = VanillaAcceleratorBackend()
+    uma_backend.register()
+    target = tvm.target.Target("vanilla_accelerator", host=tvm.target.Target("c"))
+    target_c = tvm.target.Target("c")
+
+    for name, create in cases.items():
+        mod, inputs, output_list, runner = create()
+        mod = uma_backend.partition(mod)
+        if name == "mnist_block":
+            composite = f'Composite="{uma_backend.target_name}.conv2d_add_pool"'
+            assert str(mod).count(composite) == 2
+
+        export_directory = f"./result_{name}"
+        print(f"Generated files are in {export_directory}")
+        compile_and_run(
+            AOTModel(module=mod, inputs=inputs, outputs=output_list),
+            runner,
+            interface_api="c",
+            use_unpacked_api=True,
+            target=[target_c, target],
+            test_dir=str(export_directory),
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdint.h>
+#include <string.h>
+
+/*!
+* \brief DMA between host memory and the on-chip scratchpad. Transfers are issued on one of
+* four channels (0/1 load into scratchpad slot 0/1, 2/3 store out of slot 0/1) and are only
+* guaranteed complete after vanilla_accelerator_dma_wait on that channel, so the staging pass
+* can overlap the load of tile k+1 with the kernel on tile k. The host build has no DMA
+* engine and copies synchronously; waits are then no-ops.
+*/
+#define VA_DMA_CHANNELS 4
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Start copying `bytes` bytes from `src` to `dst` on `channel`.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_dma(void* dst, void* src, int bytes, int channel) {
+  if (channel < 0 || channel >= VA_DMA_CHANNELS) {
+    return -1;
+  }
+  memcpy(dst, src, (size_t)bytes);
+  return 0;
+}
+
+#ifdef __cplusplus
+extern "C"
+#endif
+
+/*!
+* \brief Wait for every transfer issued on `channel` to complete.
+*
+* \return error code
+*
+*/
+int vanilla_accelerator_dma_wait(int channel) {
+  return channel < 0 || channel >= VA_DMA_CHANNELS ? -1 : 0;
+}
@@ -16,17 +16,66 @@
 # under the License.
 """Strategies for the vanilla_accelerator accelerator"""
 
-# Example how to integrate a custom conv1d strategy:
-
-# @relay.op.strategy.override_native_generic_func("custom_conv1d_strategy")
-# def custom_conv1d_strategy(attrs, inputs, out_type, target):
-#     strategy = _op.OpStrategy()
-#     strategy.add_implementation(
-#         wrap_compute_conv1d(custom_conv1d_compute),
-#         wrap_topi_schedule(custom_conv1d_schedule),
-#         name="custom_conv1d.generic",
-#     return strategy
-#
+from tvm import te, tir, topi
+from tvm.relay.op import op as _op
+from tvm.relay.op.strategy.generic import naive_schedule
+
+# B^T and A^T of Winograd F(2x2, 3x3): V = B^T d B, Y = A^T M A, see conv2d_winograd.cc
+winograd_bt = [[1, 0, -1, 0], [0, 1, 1, 0], [0, -1, 1, 0], [0, 1, 0, -1]]
+winograd_at = [[1, 1, 1, 0], [0, 1, -1, -1]]
+
+
+def _entry(matrix, i, j, dtype):
+    # matrix[i][j] of index expressions i, j
+    expr = tir.const(0, dtype)
+    for (r, row) in enumerate(matrix):
+        for (c, value) in enumerate(row):
+            if value != 0:
+                expr = tir.Select(tir.all(i == r, j == c), tir.const(value, dtype), expr)
+    return expr
+
+
+def conv2d_winograd_nchw(data, u, padding, out_dtype):
+    """
+    NCHW conv2d of 3x3 weights transformed to u (4, 4, oc, ic) by
+    relay_passes.winograd_weights. The `conv2d_winograd` block computes each output pixel from
+    the 4x4 input patch of its 2x2 tile directly, it is replaced by the Winograd kernels in
+    pass_conv2d.
+    """
+    (n, ic, ih, iw) = [int(x) for x in data.shape]
+    oc = int(u.shape[2])
+    (pt, pl, pb, pr) = topi.nn.get_pad_tuple(padding, (3, 3))
+    oh = ih + pt + pb - 2
+    ow = iw + pl + pr - 2
+    # one more row and column for the last patch of an odd output extent
+    padded = topi.nn.pad(data, [0, 0, pt, pl], [0, 0, pb + 1, pr + 1], name="pad_temp")
+    rc = te.reduce_axis((0, ic), name="rc")
+    (r, c, p, q) = [te.reduce_axis((0, 4), name=name) for name in "rcpq"]
+
+    def _pixel(b, o, y, x):
+        coeff = _entry(winograd_at, y % 2, r, out_dtype) * \
+            _entry(winograd_at, x % 2, c, out_dtype) * \
+            _entry(winograd_bt, r, p, out_dtype) * _entry(winograd_bt, c, q, out_dtype)
+        return te.sum(padded[b, rc, y // 2 * 2 + p, x // 2 * 2 + q].astype(out_dtype) *
+                      u[r, c, o, rc].astype(out_dtype) * coeff, axis=[rc, r, c, p, q])
+
+    return te.compute((n, oc, oh, ow), _pixel, name="conv2d_winograd", tag="conv2d_winograd")
+
+
+def conv2d_winograd_strategy(attrs, inputs, out_type, target):
+    """
+    nn.contrib_conv2d_winograd_without_weight_transform as relay_passes.WinogradWeights emits it
+    """
+    strategy = _op.OpStrategy()
+    strategy.add_implementation(
+        lambda attrs, inputs, out_type: [
+            conv2d_winograd_nchw(inputs[0], inputs[1], attrs.padding, out_type.dtype)
+        ],
+        naive_schedule,
+        name="conv2d_winograd.vanilla_accelerator",
+    )
+    return strategy
+
 
 # For further details see:
 # - github.com/apache/tvm-rfcs/blob/main/rfcs/0060_UMA_Unified_Modular_Accelerator_Interface.md
@@ -0,0 +1,138 @@
+/*
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+*/
+#include <stdint.h>
+#include <stdlib.h>
+
+/*!
+* \brief Fixed-size worker pool shared by the kernels. Workers are started lazily on the first
+* call asking for more than one thread and are never torn down. Tasks are handed out one index
+* at a time and the calling thread works on them too. Define VANILLA_ACCELERATOR_NO_THREADS on
+* toolchains without pthreads; every parallel loop then runs serially.
+*/
+typedef void (*vanilla_accelerator_task_t)(void* ctx, int task);
+
+#ifndef VANILLA_ACCELERATOR_NO_THREADS
+#include <pthread.h>
+
+#define VA_MAX_THREADS 64
+
+typedef struct {
+  pthread_mutex_t lock;
+  pthread_cond_t work;
+  pthread_cond_t done;
+  pthread_t threads[VA_MAX_THREADS];
+  int nworkers;
+  int busy;
+  unsigned generation;
+  vanilla_accelerator_task_t fn;
+  void* ctx;
+  int ntasks;
+  int next;
+  int pending;
+  int active;
+} vanilla_accelerator_pool_t;
+
+static vanilla_accelerator_pool_t va_pool = {PTHREAD_MUTEX_INITIALIZER, PTHREAD_COND_INITIALIZER,
+                                             PTHREAD_COND_INITIALIZER};
+
+/* Run tasks of the current job until none are left, va_pool.lock held on entry and exit. */
+static void vanilla_accelerator_pool_drain(void) {
+  vanilla_accelerator_task_t fn = va_pool.fn;
+  void* ctx = va_pool.ctx;
+  while (va_pool.next < va_pool.ntasks) {
+    int task = va_pool.next++;
+    pthread_mutex_unlock(&va_pool.lock);
+    fn(ctx, task);
+    pthread_mutex_lock(&va_pool.lock);
+    if (--va_pool.pending == 0) {
+      pthread_cond_signal(&va_pool.done);
+    }
+  }
+}
+
+static void* vanilla_accelerator_pool_worker(void* arg) {
+  int id = (int)(intptr_t)arg;
+  pthread_mutex_lock(&va_pool.lock);
+  unsigned seen = va_pool.generation;
+  for (;;) {
+    while (va_pool.generation == seen) {
+      pthread_cond_wait(&va_pool.work, &va_pool.lock);
+    }
+    seen = va_pool.generation;
+    if (id < va_pool.active) {
+      vanilla_accelerator_pool_drain();
+    }
+  }
+  return NULL;
+}
+
+/*!
+* \brief Run fn(ctx, 0) .. fn(ctx, ntasks - 1) on up to nthreads threads and wait for all of
+* them. Nested or concurrent calls while the pool is busy run serially.
+*/
+static void vanilla_accelerator_parallel_for(int nthreads, int ntasks,
+                                             vanilla_accelerator_task_t fn, void* ctx) {
+  if (nthreads > VA_MAX_THREADS) {
+    nthreads = VA_MAX_THREADS;
+  }
+  if (nthreads > 1 && ntasks > 1) {
+    pthread_mutex_lock(&va_pool.lock);
+    if (!va_pool.busy) {
+      while (va_pool.nworkers < nthreads - 1) {
+        if (pthread_create(&va_pool.threads[va_pool.nworkers], NULL,
+                           vanilla_accelerator_pool_worker,
+                           (void*)(intptr_t)va_pool.nworkers) != 0) {
+          break;
+        }
+        va_pool.nworkers++;
+      }
+      va_pool.busy = 1;
+      va_pool.fn = fn;
+      va_pool.ctx = ctx;
+      va_pool.ntasks = ntasks;
+      va_pool.next = 0;
+      va_pool.pending = ntasks;
+      va_pool.active = nthreads - 1;
+      va_pool.generation++;
+      pthread_cond_broadcast(&va_pool.work);
+
+      vanilla_accelerator_pool_drain();
+      while (va_pool.pending > 0) {
+        pthread_cond_wait(&va_pool.done, &va_pool.lock);
+      }
+      va_pool.busy = 0;
+      pthread_mutex_unlock(&va_pool.lock);
+      return;
+    }
+    pthread_mutex_unlock(&va_pool.lock);
+  }
+
+  for (int task = 0; task < ntasks; ++task) {
+    fn(ctx, task);
+  }
+}
+#else
+static void vanilla_accelerator_parallel_for(int nthreads, int ntasks,
+                                             vanilla_accelerator_task_t fn, void* ctx) {
+  (void)nthreads;
+  for (int task = 0; task < ntasks; ++task) {
+    fn(ctx, task);
+  }
+}
+#endif